@@ -0,0 +1,2 @@
+PYTHONPATH=src python3 src/benchmarks/bench_htmlnode.py
+PYTHONPATH=src python3 src/benchmarks/bench_commonmark.py
@@ -1,3 +1,2 @@
 echo "main.sh is for local testing"
-python3 src/main.py
-cd docs && python3 -m http.server 8888
+python3 src/main.py --serve 8888
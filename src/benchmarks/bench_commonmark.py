@@ -0,0 +1,267 @@
+import argparse, json, os, re, timeit
+from html import escape
+from html.parser import HTMLParser
+
+from blocknode import builtin_registry, markdown_to_html_node
+
+# Spec examples in the format of the CommonMark spec.json: a list of
+# {"example", "section", "markdown", "html"}. The vendored file covers the
+# sections this parser implements; pass --spec to run the full set.
+SPEC_PATH = os.path.join(os.path.dirname(__file__), "commonmark_spec.json")
+
+# Tags this parser emits in place of the ones the spec uses
+EQUIVALENT_TAGS = {"b": "strong", "i": "em"}
+
+# Whitespace next to these tags is not significant
+BLOCK_TAGS = {
+    "blockquote", "div", "h1", "h2", "h3", "h4", "h5", "h6", "hr", "li",
+    "ol", "p", "pre", "ul",
+}
+
+VOID_TAGS = {"br", "hr", "img"}
+
+whitespace_regex = re.compile(r"\s+")
+
+# Made once, as a site's registry is, so timings leave out setting it up
+registry = builtin_registry()
+
+class HTMLNormalizer(HTMLParser):
+    """
+    Rewrites HTML into a canonical form, so output that differs only in
+    insignificant ways (whitespace between blocks, attribute order, "<br>"
+    against "<br />", entity spelling) compares equal.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.pre_depth = 0
+        # Whether the last thing written was a block tag
+        self.after_block = True
+
+    def strip_trailing_text(self):
+        if self.pre_depth or not self.parts or self.parts[-1].startswith("<"):
+            return
+        self.parts[-1] = self.parts[-1].rstrip()
+        if not self.parts[-1]:
+            self.parts.pop()
+
+    def handle_starttag(self, tag, attrs):
+        tag = EQUIVALENT_TAGS.get(tag, tag)
+        if tag in BLOCK_TAGS:
+            self.strip_trailing_text()
+        if tag == "pre":
+            self.pre_depth += 1
+        attribute_text = "".join(
+            f' {name}="{escape(value or "")}"' for name, value in sorted(attrs)
+        )
+        self.parts.append(f"<{tag}{attribute_text}>")
+        self.after_block = tag in BLOCK_TAGS
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        tag = EQUIVALENT_TAGS.get(tag, tag)
+        if tag in VOID_TAGS:
+            return
+        if tag == "code" and self.pre_depth and not self.parts[-1].startswith("<"):
+            # Whether a code block ends in a newline is not significant
+            self.parts[-1] = self.parts[-1].removesuffix("\n")
+        if tag == "pre":
+            self.pre_depth -= 1
+        if tag in BLOCK_TAGS:
+            self.strip_trailing_text()
+        self.parts.append(f"</{tag}>")
+        self.after_block = tag in BLOCK_TAGS
+
+    def handle_data(self, data):
+        if not self.pre_depth:
+            data = whitespace_regex.sub(" ", data)
+            if self.after_block:
+                data = data.lstrip()
+        if data:
+            self.parts.append(escape(data, quote=False))
+            self.after_block = False
+
+def normalize_html(html):
+    """
+    :param html: HTML fragment
+    :type html: str, required
+
+    :returns: html in canonical form
+    :rtype: str
+    """
+
+    normalizer = HTMLNormalizer()
+    normalizer.feed(html)
+    normalizer.close()
+    normalizer.strip_trailing_text()
+    return "".join(normalizer.parts)
+
+def load_examples(path=SPEC_PATH):
+    """
+    :param path: Spec examples in spec.json format
+    :type path: str, optional
+
+    :returns: The examples, in spec order
+    :rtype: list[dict]
+    """
+
+    with open(path) as spec_file:
+        return json.load(spec_file)
+
+def render(markdown):
+    """
+    :returns: markdown rendered without the <div> every page is wrapped in
+    :rtype: str
+    """
+
+    html = markdown_to_html_node(markdown, registry=registry).to_html()
+    if html.startswith("<div>") and html.endswith("</div>"):
+        html = html[len("<div>"):-len("</div>")]
+    return html
+
+def run_example(example, number):
+    """
+    Render an example, compare it with the expected HTML, and time it.
+
+    :param example: A spec example
+    :type example: dict, required
+
+    :param number: Renders per timing sample
+    :type number: int, required
+
+    :returns: The example's number, section, whether it passed, the error
+    it raised if any, and the best time to render it in seconds
+    :rtype: dict
+    """
+
+    markdown = example["markdown"]
+    result = {
+        "example": example["example"],
+        "section": example["section"],
+        "bytes": len(markdown.encode()),
+        "passed": False,
+        "error": None,
+        "html": None,
+    }
+    try:
+        result["html"] = render(markdown)
+        result["passed"] = (
+            normalize_html(result["html"]) == normalize_html(example["html"])
+        )
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    def attempt():
+        try:
+            render(markdown)
+        except Exception:
+            pass
+    result["seconds"] = min(timeit.repeat(attempt, number=number, repeat=3)) / number
+    return result
+
+def summarize(results):
+    """
+    :param results: run_example() results
+    :type results: list[dict], required
+
+    :returns: section -> passed, total, seconds and bytes, in spec order,
+    with a "total" entry for the whole run
+    :rtype: dict
+    """
+
+    sections = {}
+    for result in results + [dict(result, section="total") for result in results]:
+        section = sections.setdefault(
+            result["section"], {"passed": 0, "total": 0, "seconds": 0, "bytes": 0}
+        )
+        section["passed"] += result["passed"]
+        section["total"] += 1
+        section["seconds"] += result["seconds"]
+        section["bytes"] += result["bytes"]
+    return sections
+
+def print_report(results, baseline=None, show_failures=False):
+    """
+    Print conformance and throughput per section.
+
+    :param results: run_example() results
+    :type results: list[dict], required
+
+    :param baseline: A report written by an earlier run with --json, to
+    compare against
+    :type baseline: dict, optional
+
+    :param show_failures: Whether to print every failing example
+    :type show_failures: bool, optional
+    """
+
+    sections = summarize(results)
+    old_sections = baseline["sections"] if baseline else {}
+    print(f"{'section':<32} {'pass':>9} {'us':>9} {'MB/s':>7}")
+    for name, section in sections.items():
+        throughput = section["bytes"] / section["seconds"] / 1e6
+        line = (
+            f"{name:<32} {section['passed']:>4}/{section['total']:<4} "
+            f"{section['seconds'] * 1e6:>9.1f} {throughput:>7.2f}"
+        )
+        if name in old_sections:
+            old = old_sections[name]
+            line += (
+                f"  ({section['passed'] - old['passed']:+d} pass, "
+                f"{section['seconds'] / old['seconds']:.2f}x time)"
+            )
+        print(line)
+
+    if baseline:
+        old_passed = {
+            result["example"]: result["passed"] for result in baseline["examples"]
+        }
+        for result in results:
+            was_passing = old_passed.get(result["example"])
+            if was_passing is not None and was_passing != result["passed"]:
+                change = "now passes" if result["passed"] else "now fails"
+                print(f"example {result['example']} ({result['section']}) {change}")
+
+    if show_failures:
+        for result in results:
+            if not result["passed"]:
+                print(f"\nexample {result['example']} ({result['section']}):")
+                print(f"  got: {result['error'] or result['html']!r}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run CommonMark spec examples through the parser and "
+        "report conformance and throughput per section"
+    )
+    parser.add_argument("--spec", default=SPEC_PATH, help="spec.json to run")
+    parser.add_argument(
+        "--number", type=int, default=200, help="renders per timing sample"
+    )
+    parser.add_argument("--json", metavar="PATH", help="write the report to PATH")
+    parser.add_argument(
+        "--compare", metavar="PATH", help="compare against a report from --json"
+    )
+    parser.add_argument(
+        "--failures", action="store_true", help="print every failing example"
+    )
+    args = parser.parse_args()
+
+    examples = load_examples(args.spec)
+    results = [run_example(example, args.number) for example in examples]
+    baseline = None
+    if args.compare:
+        with open(args.compare) as report_file:
+            baseline = json.load(report_file)
+    print_report(results, baseline, args.failures)
+    if args.json:
+        with open(args.json, "w") as report_file:
+            json.dump(
+                {"spec": args.spec, "sections": summarize(results), "examples": results},
+                report_file, indent=2
+            )
+
+if __name__ == "__main__":
+    main()
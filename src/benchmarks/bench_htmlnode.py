@@ -0,0 +1,73 @@
+import os, timeit
+
+import htmlnode
+from blocknode import markdown_to_html_node
+
+def load_pages(content_root):
+    """
+    Parse every markdown file under content_root into an HTMLNode tree.
+
+    :param content_root: Directory containing markdown files
+    :type content_root: str, required
+
+    :returns: A list of HTMLNode trees
+    :rtype: list[HTMLNode]
+    """
+
+    trees = []
+    for dir_path, dir_names, file_names in os.walk(content_root):
+        for file_name in file_names:
+            if file_name.endswith(".md"):
+                with open(os.path.join(dir_path, file_name)) as md_file:
+                    trees.append(markdown_to_html_node(md_file.read()))
+    return trees
+
+def time_to_html(trees, number):
+    """
+    Return the best per-iteration time of rendering all trees.
+    """
+
+    def render():
+        for tree in trees:
+            tree.to_html()
+    return min(timeit.repeat(render, number=number, repeat=5)) / number
+
+def bench_escape(number=20000):
+    """
+    Time escape_text() on strings with and without special characters.
+    """
+
+    plain = "The quick brown fox jumps over the lazy dog " * 4
+    special = "if (a < b && b > c) { return \"x\"; } " * 4
+    for label, text in (("plain", plain), ("special", special)):
+        seconds = min(timeit.repeat(
+            lambda: htmlnode.escape_text(text), number=number, repeat=5
+        )) / number
+        print(f"escape_text ({label}, {len(text)} chars): {seconds * 1e9:.0f} ns")
+
+def bench_to_html(content_root="content", number=200):
+    """
+    Compare to_html() with escaping against to_html() with escaping
+    replaced by the identity function.
+    """
+
+    trees = load_pages(content_root)
+    escaped = time_to_html(trees, number)
+
+    escape_text = htmlnode.escape_text
+    escape_attribute = htmlnode.escape_attribute
+    htmlnode.escape_text = htmlnode.escape_attribute = lambda text: text
+    try:
+        unescaped = time_to_html(trees, number)
+    finally:
+        htmlnode.escape_text = escape_text
+        htmlnode.escape_attribute = escape_attribute
+
+    overhead = (escaped - unescaped) / unescaped * 100
+    print(f"to_html, {len(trees)} pages, no escaping: {unescaped * 1e6:.1f} us")
+    print(f"to_html, {len(trees)} pages, escaping:    {escaped * 1e6:.1f} us")
+    print(f"escaping overhead: {overhead:+.1f}%")
+
+if __name__ == "__main__":
+    bench_escape()
+    bench_to_html()
@@ -1,12 +1,21 @@
 from enum import Enum
-from htmlnode import ParentNode
+from htmlnode import LeafNode, ParentNode, RawNode
 from textnode import TextNode, TextType, text_node_to_html_node
-from inlinenode import text_to_textnodes
+from inlinenode import register_builtin_inlines, text_to_textnodes
+from diagnostics import Diagnostic, locate_syntax_error
+from extensions import ExtensionRegistry
+from highlight import highlight, normalize_language
 
 import re
 
 heading_regex = re.compile(r"^(#+) (.*)$")
 ordered_list_regex = re.compile(r"^(\d+)\. (.*)$")
+# A block made of one include directive, eg. "{{ include install.md }}"
+include_regex = re.compile(r"^\{\{ include (\S+) \}\}$")
+# Characters dropped from heading text to make its id
+slug_strip_regex = re.compile(r"[^\w\- ]")
+
+HEADING_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6")
 
 class BlockType(Enum):
     PARAGRAPH = 1
@@ -16,6 +25,183 @@ class BlockType(Enum):
     UNORDERED_LIST = 5
     ORDERED_LIST = 6
 
+class Block(str):
+    def __new__(cls, lines, line):
+        """
+        A block's text, as found by scan_blocks(). Being a str, it works
+        with any detector or renderer; it also carries the block's lines,
+        already split, so they are not split again.
+
+        :param lines: The block's lines
+        :type lines: list[str], required
+
+        :param line: 1-based line number the block starts on
+        :type line: int, required
+        """
+
+        block = super().__new__(cls, "\n".join(lines))
+        block.lines = lines
+        block.line = line
+        # Parsed list item text, filled in by detect_ordered_list()
+        block.items = None
+        return block
+
+def slugify(text):
+    """
+    :param text: Plain text of a heading
+    :type text: str, required
+
+    :returns: text as an id, eg. "Getting started!" -> "getting-started"
+    :rtype: str
+    """
+
+    slug = slug_strip_regex.sub("", text.strip().lower()).replace(" ", "-")
+    return slug or "section"
+
+def node_text(node):
+    """
+    :param node: An HTMLNode tree
+    :type node: HTMLNode, required
+
+    :returns: The text of node's leaves, unescaped; raw markup is left
+    out
+    :rtype: str
+    """
+
+    if node.children:
+        return "".join(node_text(child) for child in node.children)
+    if isinstance(node, RawNode):
+        return ""
+    return node.value or ""
+
+class Outline:
+    def __init__(self):
+        """
+        Headings of a page, collected by markdown_to_html_node() in the
+        pass that renders them. Each heading gets an id from its text,
+        with "-1", "-2", ... added to repeats, so the same page always
+        gets the same ids.
+        """
+
+        # {"level", "text", "id"} of each heading, in document order
+        self.headings = []
+        self.ids = set()
+
+    def add(self, level, text):
+        """
+        :param level: 1 for <h1> through 6 for <h6>
+        :type level: int, required
+
+        :param text: Plain text of the heading
+        :type text: str, required
+
+        :returns: The heading's id
+        :rtype: str
+        """
+
+        base = slugify(text)
+        heading_id = base
+        count = 0
+        while heading_id in self.ids:
+            count += 1
+            heading_id = f"{base}-{count}"
+        self.ids.add(heading_id)
+        self.headings.append({"level": level, "text": text, "id": heading_id})
+        return heading_id
+
+    def title(self):
+        """
+        :returns: Text of the first <h1>, or None if there is none
+        :rtype: str
+        """
+
+        for heading in self.headings:
+            if heading["level"] == 1:
+                return heading["text"]
+        return None
+
+def block_lines(block):
+    """
+    :param block: A block, as a Block or a plain string
+    :type block: str, required
+
+    :returns: The block's lines
+    :rtype: list[str]
+    """
+
+    if isinstance(block, Block):
+        return block.lines
+    return block.split("\n")
+
+def is_fence(line):
+    """
+    :returns: Whether line opens a fenced code block that does not also
+    close on the same line
+    :rtype: bool
+    """
+
+    stripped = line.strip()
+    return stripped.startswith("```") and stripped.find("```", 3) == -1
+
+def scan_blocks(markdown):
+    """
+    Split markdown into blocks in a single pass over its lines. Blocks
+    are separated by blank lines, except inside a fenced code block,
+    which runs to its closing ``` line and may contain blank lines. A
+    fence that is never closed ends at the next blank line, like any
+    other block, so the error is reported there.
+
+    :param markdown: Raw markdown string
+    :type markdown: str, required
+
+    :returns: The blocks, without their leading and trailing whitespace
+    :rtype: list[Block]
+    """
+
+    blocks = []
+    lines = markdown.split("\n")
+    block_start = None
+    in_fence = False
+    # Set once a fence runs off the end of the document; after that no
+    # later fence can be closed either
+    fences_closed = True
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        index += 1
+        if in_fence:
+            if line.rstrip().endswith("```"):
+                in_fence = False
+                blocks.append(make_block(lines, block_start, index))
+                block_start = None
+        elif not line.strip():
+            if block_start is not None:
+                blocks.append(make_block(lines, block_start, index - 1))
+                block_start = None
+        elif block_start is None:
+            block_start = index - 1
+            in_fence = fences_closed and is_fence(line)
+        if in_fence and index == len(lines):
+            # Unclosed fence: scan it again as an ordinary block
+            in_fence = False
+            fences_closed = False
+            index = block_start + 1
+    if block_start is not None:
+        blocks.append(make_block(lines, block_start, len(lines)))
+    return blocks
+
+def make_block(lines, start, end):
+    """
+    :returns: A Block of lines[start:end], with leading and trailing
+    whitespace removed
+    :rtype: Block
+    """
+
+    span = lines[start:end]
+    span[0] = span[0].lstrip()
+    span[-1] = span[-1].rstrip()
+    return Block(span, start + 1)
+
 def markdown_to_blocks(markdown):
     """
     Converts a string of raw markdown text to a list of strings.
@@ -27,91 +213,142 @@ def markdown_to_blocks(markdown):
     :rtype: list[str]
     """
 
-    blocks = markdown.split("\n\n")
-    new_blocks = []
-    for block in blocks:
-        # strip leading/trailing whitespace
-        block = block.strip()
-        if block != "":
-            new_blocks.append(block)
-    return new_blocks
+    return [str(block) for block in scan_blocks(markdown)]
+
+def markdown_to_located_blocks(markdown):
+    """
+    Like markdown_to_blocks(), but also return the line each block
+    starts on.
+
+    :param markdown: Raw markdown string
+    :type markdown: str, required
+
+    :returns: A list of (block, line) tuples, line being 1-based
+    :rtype: list[(str, int)]
+    """
+
+    return [(str(block), block.line) for block in scan_blocks(markdown)]
+
+def block_syntax_error(message, line_list, line_index, column=1):
+    """
+    Build a SyntaxError pointing at a position within a block.
+
+    :param message: Error message
+    :type message: str, required
+
+    :param line_list: The block's lines
+    :type line_list: list[str], required
+
+    :param line_index: 0-based index of the offending line
+    :type line_index: int, required
+
+    :param column: 1-based column in the offending line
+    :type column: int, optional
+
+    :returns: A SyntaxError carrying the offending line and column
+    :rtype: SyntaxError
+    """
+
+    return SyntaxError(
+        message, (None, line_index + 1, column, line_list[line_index])
+    )
+
+def detect_heading(block, line_list):
+    """
+    Block detector for headings; see ExtensionRegistry.register_block().
+    """
+
+    hash_count = len(line_list[0]) - len(line_list[0].lstrip("#"))
+    if hash_count > 6:
+        raise block_syntax_error("Invalid Markdown Syntax: more than six # characters in a heading", line_list, 0, 7)
+    elif not heading_regex.match(line_list[0]):
+        raise block_syntax_error("Invalid Markdown Syntax: First character after string of #'s in a heading must be a space", line_list, 0, hash_count + 1)
+    else:
+        return BlockType.HEADING
+
+def detect_code(block, line_list):
+    """
+    Block detector for code blocks; see ExtensionRegistry.register_block().
+    """
+
+    # Confirm that this is a code block: three "`" characters
+    if block.find("```") == 0:
+        # Confirm the presence of closing tags
+        if block.find("```", 3) > -1:
+            return BlockType.CODE
+        else:
+            raise block_syntax_error('Invalid Markdown Syntax: no closing code tags ("```")', line_list, 0)
+    # Not a code block: doesn't have three "`" characters
+    else:
+        return BlockType.PARAGRAPH
+
+def detect_quote(block, line_list):
+    """
+    Block detector for quotes; see ExtensionRegistry.register_block().
+    """
+
+    for i, line in enumerate(line_list):
+        if line[:1] != ">":
+            raise block_syntax_error('Invalid Markdown Syntax: all lines in a quote block must begin with a ">" character', line_list, i)
+    return BlockType.QUOTE
+
+def detect_unordered_list(block, line_list):
+    """
+    Block detector for unordered lists; see ExtensionRegistry.register_block().
+    """
+
+    for i, line in enumerate(line_list):
+        if line[:1] != "-":
+            raise block_syntax_error('Invalid Markdown Syntax: all lines in an unordered list block must begin with a "-" character', line_list, i)
+        elif not line[1:2].isspace():
+            raise block_syntax_error('Invalid Markdown Syntax: all lines in an unordered list block must have a space after the "-" character', line_list, i, 2)
+    return BlockType.UNORDERED_LIST
 
-def block_to_block_type(block):
+def detect_ordered_list(block, line_list):
     """
-    Provided a block, return the BlockType.
+    Block detector for ordered lists; see ExtensionRegistry.register_block().
+    """
+
+    items = []
+    for i, line in enumerate(line_list):
+        _match = ordered_list_regex.match(line)
+        if not _match:
+            raise block_syntax_error('Invalid Markdown Syntax: invalid ordered list syntax', line_list, i)
+        elif (int(_match[1]) != i + 1):
+            raise block_syntax_error("Invalid Markdown Syntax: Ordered list ordinal must increment by precisely 1 on each line", line_list, i)
+        items.append(_match[2])
+    if isinstance(block, Block):
+        # Saves the renderer matching every line again
+        block.items = items
+    return BlockType.ORDERED_LIST
+
+def block_to_block_type(block, registry=None):
+    """
+    Provided a block, return the BlockType. The detectors registered for
+    the block's first character are looked up in registry; blocks no
+    detector claims are paragraphs.
 
     :param block: A string representing a block
     :type block: str, required
 
-    :returns: A BlockType
+    :param registry: Registry to look detectors up in; defaults to
+    builtin_registry()
+    :type registry: ExtensionRegistry, optional
+
+    :returns: A BlockType, or the key of a block type added by an extension
     :rtype: BlockType
 
     :raises SyntaxError: If Markdown syntax is invalid
     """
     
-    line_list = block.split("\n")
-    first_char = line_list[0][0]
-
-    match first_char:
-        # Heading
-        case "#":
-            hashes_string = heading_regex.match(block)[1]
-            hash_count = hashes_string.count("#")
-            if hash_count > 6:
-                raise SyntaxError("Invalid Markdown Syntax: more than six # characters in a heading")
-            elif not block[hash_count].isspace():
-                raise SyntaxError("Invalid Markdown Syntax: First character after string of #'s in a heading must be a space")
-            else:
-                return BlockType.HEADING
-        
-        # Code
-        case "`":
-            # Confirm that this is a code block: three "`" characters
-            if block.find("```") == 0:
-                # Confirm the presence of closing tags
-                if block.find("```", 3) > -1:
-                    return BlockType.CODE
-                else:
-                    raise SyntaxError('Invalid Markdown Syntax: no closing code tags ("```")')
-            # Not a code block: doesn't have three "`" characters
-            else:
-                return BlockType.PARAGRAPH
-    
-        # Quote
-        case ">":
-            for line in line_list:
-                if line[0] != ">":
-                    raise SyntaxError('Invalid Markdown Syntax: all lines in a quote block must begin with a ">" character')
-            return BlockType.QUOTE
-        
-        # Unordered List
-        case "-":
-            for line in line_list:
-                if line[0] != "-":
-                    raise SyntaxError('Invalid Markdown Syntax: all lines in an unordered list block must begin with a "-" character')
-                elif not line[1].isspace():
-                    raise SyntaxError('Invalid Markdown Syntax: all lines in an unordered list block must have a space after the "-" character')
-            return BlockType.UNORDERED_LIST
-        
-        case _:
-            # Ordered List
-            if first_char == "1":
-                line_int = 1
-                for line in line_list:
-                    _match = ordered_list_regex.match(line)
-                    if not _match:
-                        raise SyntaxError('Invalid Markdown Syntax: invalid ordered list syntax')
-                    elif (int(_match[1]) != line_int):
-                        raise SyntaxError("Invalid Markdown Syntax: Ordered list ordinal must increment by precisely 1 on each line")
-                    else:
-                        line_int += 1
-                return BlockType.ORDERED_LIST
-                    
-            # Paragraph
-            else:
-                return BlockType.PARAGRAPH
-
-def text_to_children(text):
+    if registry is None:
+        registry = builtin_registry()
+    block_type = registry.detect_block(block, block_lines(block))
+    if block_type is None:
+        return BlockType.PARAGRAPH
+    return block_type
+
+def text_to_children(text, registry=None):
     """
     Given a text block, first parse for TextNodes, then convert
     each TextNode to a LeafNode(HTMLNode). Return the list of HTMLNodes.
@@ -119,95 +356,252 @@ def text_to_children(text):
     :param text: A text string block
     :type: str, required
 
+    :param registry: Registry of inline syntax; defaults to the
+    built-in syntax
+    :type registry: ExtensionRegistry, optional
+
     :returns: A list of child LeafNodes
     :rtype: list[LeafNode]
     """
 
     text = text.replace("\n", " ")
     child_list = []
-    text_node_list = text_to_textnodes(text)
+    text_node_list = text_to_textnodes(text, registry)
     for text_node in text_node_list:
-        child_html_node = text_node_to_html_node(text_node)
+        child_html_node = text_node_to_html_node(text_node, registry)
         child_list.append(child_html_node)
     return child_list
 
-def markdown_to_html_node(text):
+def paragraph_to_html_node(block, registry=None):
+    """
+    Block renderer for paragraphs; see ExtensionRegistry.register_block().
+    """
+
+    child_nodes = text_to_children(block, registry)
+    return ParentNode("p", child_nodes)
+
+def heading_to_html_node(block, registry=None):
+    """
+    Block renderer for headings; see ExtensionRegistry.register_block().
+    """
+
+    text = block.lstrip("#")
+    tag = f"h{len(block) - len(text)}"
+    child_nodes = text_to_children(text.lstrip(), registry)
+    return ParentNode(tag, child_nodes)
+
+def code_to_html_node(block, registry=None):
+    """
+    Block renderer for code blocks; see ExtensionRegistry.register_block().
+    The info string after the opening ``` selects a highlighter; code in
+    languages highlight.py does not know is rendered plain.
+    """
+
+    info_string = ""
+    first_line, newline, rest = block.partition("\n")
+    if newline and first_line.rstrip("`").strip():
+        # "```lang" on its own line: the rest is the code
+        info_string = first_line.lstrip("`").strip()
+        lstripped = rest
+    else:
+        lstripped = block.lstrip("`").lstrip()
+    text = lstripped.rstrip("`").rstrip()
+
+    highlighted = None
+    if info_string:
+        cache = registry.highlight_cache if registry is not None else None
+        highlighted = highlight(text, info_string, cache)
+    if highlighted is None:
+        code_text_node = TextNode(text, TextType.CODE_TEXT)
+        code_node = text_node_to_html_node(code_text_node, registry)
+    else:
+        language = normalize_language(info_string)
+        code_node = ParentNode(
+            "code", [RawNode(highlighted)], {"class": f"language-{language}"}
+        )
+    return ParentNode("pre", [code_node])
+
+def quote_to_html_node(block, registry=None):
+    """
+    Block renderer for quotes; see ExtensionRegistry.register_block().
+    """
+
+    child_nodes = []
+    line_list = block_lines(block)
+    for i in range(0, len(line_list)):
+        line = line_list[i]
+        line_text = line.lstrip(">").lstrip()
+        child_nodes.extend(text_to_children(line_text, registry))
+        # Add line breaks between all lines
+        # (except after the last line)
+        if i <= len(line_list)-2:
+            child_nodes.append(LeafNode("br", ""))
+    return ParentNode("blockquote", child_nodes)
+
+def unordered_list_to_html_node(block, registry=None):
+    """
+    Block renderer for unordered lists; see ExtensionRegistry.register_block().
+    """
+
+    li_node_list = []
+    for line in block_lines(block):
+        line_text = line.lstrip("-").lstrip()
+        line_nodes = text_to_children(line_text, registry)
+        li_node = ParentNode("li", line_nodes)
+        li_node_list.append(li_node)
+    return ParentNode("ul", li_node_list)
+
+def ordered_list_to_html_node(block, registry=None):
+    """
+    Block renderer for ordered lists; see ExtensionRegistry.register_block().
+    """
+
+    li_node_list = []
+    items = getattr(block, "items", None)
+    if items is None:
+        items = [ordered_list_regex.match(line)[2] for line in block_lines(block)]
+    for text in items:
+        line_nodes = text_to_children(text, registry)
+        li_node = ParentNode("li", line_nodes)
+        li_node_list.append(li_node)
+    return ParentNode("ol", li_node_list)
+
+def block_to_html_node(block, block_type, registry=None):
+    """
+    Convert a single block to an HTMLNode using the renderer registered
+    for block_type.
+
+    :param block: A string representing a block
+    :type block: str, required
+
+    :param block_type: The block's type, from block_to_block_type()
+    :type block_type: BlockType, required
+
+    :param registry: Registry to look the renderer up in; defaults to
+    builtin_registry()
+    :type registry: ExtensionRegistry, optional
+
+    :returns: An HTMLNode for the block
+    :rtype: HTMLNode
+
+    :raises SyntaxError: If the block's inline Markdown syntax is invalid
+    """
+
+    if registry is None:
+        registry = builtin_registry()
+    return registry.block_renderer(block_type)(block, registry)
+
+def error_block_to_html_node(block):
+    """
+    Fallback rendering for a block that failed to parse: the raw
+    source, escaped, in a <pre class="parse-error">.
+
+    :param block: A string representing a block
+    :type block: str, required
+
+    :returns: An HTMLNode for the block
+    :rtype: HTMLNode
+    """
+
+    code_node = LeafNode("code", block)
+    return ParentNode("pre", [code_node], {"class": "parse-error"})
+
+def markdown_to_html_node(text, diagnostics=None, first_line=1, registry=None,
+                          outline=None, includes=None):
     """
     Given text from a markdown file, generate an HTMLNode tree.
 
     :param text: A full markdown file
     :type text: str, required
 
+    :param diagnostics: If given, syntax errors are appended to this
+    list as Diagnostics and the offending block is rendered with
+    error_block_to_html_node(), instead of raising
+    :type diagnostics: list[Diagnostic], optional
+
+    :param first_line: Line number of text's first line in its file
+    :type first_line: int, optional
+
+    :param registry: Registry of block and inline syntax; defaults to
+    builtin_registry()
+    :type registry: ExtensionRegistry, optional
+
+    :param outline: If given, headings are added to it and given its ids
+    :type outline: Outline, optional
+
+    :param includes: Resolves include directives, see
+    includes.PageIncludes; without it they are rendered as text
+    :type includes: PageIncludes, optional
+
     :returns: An HTMLNode tree
     :rtype: HTMLNode
+
+    :raises SyntaxError: If Markdown syntax is invalid and diagnostics
+    is not given
     """
 
+    if registry is None:
+        registry = builtin_registry()
     block_node_list = []
-    blocks = markdown_to_blocks(text)
-    for block in blocks:
-        block_type = block_to_block_type(block)
-
-        match block_type:
-            case BlockType.PARAGRAPH:
-                child_nodes = text_to_children(block)
-                paragraph_node = ParentNode("p", child_nodes)
-                block_node_list.append(paragraph_node)
-
-            case BlockType.HEADING:
-                text_list = block.split()
-                hashes = text_list[0]
-                hash_num = len(hashes)
-                tag = f"h{hash_num}"
-                block = block.lstrip("#").lstrip()
-                child_nodes = text_to_children(block)
-                heading_node = ParentNode(tag, child_nodes)
-                block_node_list.append(heading_node)
-            
-            case BlockType.CODE:
-                lstripped = block.lstrip("`").lstrip()
-                text = lstripped.rstrip("`").rstrip()
-                code_text_node = TextNode(text, TextType.CODE_TEXT)
-                code_node = text_node_to_html_node(code_text_node)
-                pre_node = ParentNode("pre", [code_node])
-                block_node_list.append(pre_node)
-
-            case BlockType.QUOTE:
-                quote_text = ""
-                line_list = block.split("\n")
-                for i in range(0, len(line_list)):
-                    line = line_list[i]
-                    line_text = line.lstrip(">").lstrip()
-                    quote_text += line_text
-                    # Add line breaks between all lines
-                    # (except after the last line)
-                    if i <= len(line_list)-2:
-                        quote_text += "<br>"
-                child_nodes = text_to_children(quote_text)
-                quote_node = ParentNode("blockquote", child_nodes)
-                block_node_list.append(quote_node)
-
-            case BlockType.UNORDERED_LIST:
-                li_node_list = []
-                line_list = block.split("\n")
-                for line in line_list:
-                    line_text = line.lstrip("-").lstrip()
-                    line_nodes = text_to_children(line_text)
-                    li_node = ParentNode("li", line_nodes)
-                    li_node_list.append(li_node)
-                ul_node = ParentNode("ul", li_node_list)
-                block_node_list.append(ul_node)
-
-            case BlockType.ORDERED_LIST:
-                li_node_list = []
-                line_list = block.split("\n")
-                for line in line_list:
-                    text = ordered_list_regex.match(line)[2]
-                    line_nodes = text_to_children(text)
-                    li_node = ParentNode("li", line_nodes)
-                    li_node_list.append(li_node)
-                ol_node = ParentNode("ol", li_node_list)
-                block_node_list.append(ol_node)
-                
+    for block in scan_blocks(text):
+        try:
+            include_match = None
+            if includes is not None and block.startswith("{{"):
+                include_match = include_regex.match(block)
+            if include_match:
+                block_node_list.append(
+                    includes.include(include_match[1], outline)
+                )
+                continue
+            block_type = block_to_block_type(block, registry)
+            block_node = block_to_html_node(block, block_type, registry)
+            if outline is not None and block_node.tag in HEADING_TAGS:
+                heading_id = outline.add(
+                    int(block_node.tag[1]), node_text(block_node).strip()
+                )
+                block_node.props = dict(block_node.props or {}, id=heading_id)
+        except SyntaxError as error:
+            if diagnostics is None:
+                raise
+            error_line, column = locate_syntax_error(
+                error, block, first_line + block.line - 1
+            )
+            diagnostics.append(Diagnostic(error.msg, error_line, column))
+            block_node = error_block_to_html_node(block)
+        block_node_list.append(block_node)
+
+    if not block_node_list:
+        # Empty document; ParentNode needs children
+        return LeafNode("div", "")
     top_level_node = ParentNode("div", block_node_list)
     return top_level_node
 
+def register_builtin_blocks(registry):
+    """
+    Register the built-in block types.
+
+    :param registry: Registry to register with
+    :type registry: ExtensionRegistry, required
+    """
+
+    registry.register_block("#", detect_heading, BlockType.HEADING, heading_to_html_node)
+    registry.register_block("`", detect_code, BlockType.CODE, code_to_html_node)
+    registry.register_block(">", detect_quote, BlockType.QUOTE, quote_to_html_node)
+    registry.register_block("-", detect_unordered_list, BlockType.UNORDERED_LIST, unordered_list_to_html_node)
+    registry.register_block("1", detect_ordered_list, BlockType.ORDERED_LIST, ordered_list_to_html_node)
+    registry.register_renderer(BlockType.PARAGRAPH, paragraph_to_html_node)
+
+def builtin_registry():
+    """
+    Make a registry of the built-in block and inline syntax, used when
+    none is passed in. A site renders with render.new_registry(), which
+    adds its plugins and caches.
+
+    :returns: A new registry
+    :rtype: ExtensionRegistry
+    """
+
+    registry = ExtensionRegistry()
+    register_builtin_blocks(registry)
+    register_builtin_inlines(registry)
+    return registry
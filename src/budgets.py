@@ -0,0 +1,223 @@
+import fnmatch, json, os, re
+
+from diagnostics import Diagnostic
+
+# Budget file read from the directory the site is built in
+BUDGETS_FILE = "budgets.json"
+
+# Metrics a budget can limit
+BUDGET_METRICS = (
+    "html_bytes", "nodes", "depth",
+    "images", "image_bytes", "stylesheets", "stylesheet_bytes",
+)
+
+stylesheet_regex = re.compile(
+    r"""<link\b[^>]*\bhref=["']([^"']+\.css)(?:[?#][^"']*)?["']""", re.IGNORECASE
+)
+
+def tree_stats(node):
+    """
+    Count the nodes of an HTMLNode tree and measure how deeply it nests.
+
+    :param node: Root of the tree
+    :type node: HTMLNode, required
+
+    :returns: Number of nodes and the maximum depth (the root is 1)
+    :rtype: (int, int)
+    """
+
+    count = 0
+    max_depth = 0
+    stack = [(node, 1)]
+    while stack:
+        _node, depth = stack.pop()
+        count += 1
+        if depth > max_depth:
+            max_depth = depth
+        if _node.children:
+            for child in _node.children:
+                stack.append((child, depth + 1))
+    return count, max_depth
+
+def page_stats(node, html, references, template_text):
+    """
+    Measure a rendered page, for budgets.
+
+    :param node: Root of the page's content
+    :type node: HTMLNode, required
+
+    :param html: The full HTML page
+    :type html: str, required
+
+    :param references: (tag, url) tuples from collect_references()
+    :type references: list[(str, str)], required
+
+    :param template_text: Text of template.html, searched for stylesheets
+    :type template_text: str, required
+
+    :returns: "html_bytes", "nodes" and "depth" (of the content tree,
+    not counting the template), and the URLs of "images" and
+    "stylesheets"
+    :rtype: dict
+    """
+
+    nodes, depth = tree_stats(node)
+    return {
+        "html_bytes": len(html.encode()),
+        "nodes": nodes,
+        "depth": depth,
+        "images": [url for tag, url in references if tag == "img"],
+        "stylesheets": stylesheet_regex.findall(template_text),
+    }
+
+def load_budgets(budgets_path=BUDGETS_FILE):
+    """
+    Read a budget file. It is a JSON object with:
+
+    - "default": limits applied to every page, eg. {"html_bytes": 100000}
+    - "paths": a map of glob, matched against the markdown path relative
+      to the content directory (eg. "blog/*"), to limits overriding the
+      default; later globs win
+    - "severity": "warning" (default) or "error", which fails the build
+
+    :param budgets_path: Path to the budget file
+    :type budgets_path: str, optional
+
+    :returns: The budgets, or None if the file does not exist
+    :rtype: dict
+
+    :raises ValueError: If the file is not valid or names an unknown
+    metric
+    """
+
+    try:
+        with open(budgets_path) as budgets_file:
+            budgets = json.load(budgets_file)
+    except FileNotFoundError:
+        return None
+    if not isinstance(budgets, dict):
+        raise ValueError(f"{budgets_path}: expected a JSON object")
+    limit_sets = [budgets.get("default", {})]
+    limit_sets.extend(budgets.get("paths", {}).values())
+    for limits in limit_sets:
+        for metric in limits:
+            if metric not in BUDGET_METRICS:
+                raise ValueError(f"{budgets_path}: unknown metric {metric}")
+    if budgets.get("severity", "warning") not in ("warning", "error"):
+        raise ValueError(f"{budgets_path}: severity must be warning or error")
+    return budgets
+
+class BudgetReport:
+    def __init__(self, budgets=None, static_root="static", src_tree_root="content"):
+        """
+        Collects each page's metrics and checks them against budgets.
+
+        :param budgets: Budgets from load_budgets(); pages are only
+        measured if None
+        :type budgets: dict, optional
+
+        :param static_root: Directory referenced images and stylesheets
+        are resolved against
+        :type static_root: str, optional
+
+        :param src_tree_root: Content directory, for matching path globs
+        :type src_tree_root: str, optional
+        """
+
+        self.budgets = budgets or {}
+        self.static_root = static_root
+        self.src_tree_root = src_tree_root
+        self.severity = self.budgets.get("severity", "warning")
+        # site URL -> metrics
+        self.pages = {}
+        self._asset_sizes = {}
+
+    def limits(self, src_path):
+        """
+        :returns: The limits that apply to src_path
+        :rtype: dict{str: int}
+        """
+
+        limits = dict(self.budgets.get("default", {}))
+        rel_path = os.path.relpath(src_path, self.src_tree_root).replace(os.sep, "/")
+        for glob, path_limits in self.budgets.get("paths", {}).items():
+            if fnmatch.fnmatchcase(rel_path, glob):
+                limits.update(path_limits)
+        return limits
+
+    def asset_size(self, url):
+        """
+        :param url: Site URL of a static file, eg. "/images/tom.png"
+        :type url: str, required
+
+        :returns: Size of the file, or 0 if it is not in static_root
+        :rtype: int
+        """
+
+        size = self._asset_sizes.get(url)
+        if size is None:
+            try:
+                size = os.path.getsize(self.static_root + url)
+            except OSError:
+                size = 0
+            self._asset_sizes[url] = size
+        return size
+
+    def check(self, result, link_graph):
+        """
+        Record a page's metrics and add a diagnostic to result for each
+        budget it exceeds.
+
+        :param result: A rendered page
+        :type result: PageResult, required
+
+        :param link_graph: Resolves image and stylesheet URLs
+        :type link_graph: LinkGraph, required
+        """
+
+        stats = result.stats
+        if stats is None:
+            return
+        metrics = {
+            "html_bytes": stats["html_bytes"],
+            "nodes": stats["nodes"],
+            "depth": stats["depth"],
+        }
+        for kind in ("images", "stylesheets"):
+            targets = set()
+            for url in stats[kind]:
+                target, fragment = link_graph.resolve(result.url, url)
+                if target:
+                    targets.add(target)
+            metrics[kind] = len(targets)
+            metrics[kind[:-1] + "_bytes"] = sum(
+                self.asset_size(target) for target in targets
+            )
+        self.pages[result.url] = metrics
+
+        for metric, limit in self.limits(result.src_path).items():
+            if metrics[metric] > limit:
+                result.diagnostics.append(Diagnostic(
+                    f"Page exceeds the {metric} budget: "
+                    f"{metrics[metric]} > {limit}",
+                    path=result.src_path, severity=self.severity
+                ))
+
+    def to_dict(self):
+        """
+        :returns: The budgets and every page's metrics
+        :rtype: dict
+        """
+
+        return {
+            "budgets": self.budgets,
+            "pages": dict(sorted(self.pages.items())),
+        }
+
+    def write(self, report_path):
+        """
+        Write the report to report_path as JSON.
+        """
+
+        with open(report_path, "w") as report_file:
+            json.dump(self.to_dict(), report_file, indent=2)
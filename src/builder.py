@@ -0,0 +1,1048 @@
+import json, os, re, shutil
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from blocknode import Outline, markdown_to_html_node
+from budgets import BudgetReport
+from discovery import (
+    DirectorySnapshot, IgnoreRules, PathSelector, load_ignore_patterns
+)
+from linkcheck import LinkGraph, page_url
+from memory import MemoryBudget, render_bounded
+from metadata import MetadataIndex
+from feeds import FEED_LIMIT, SiteFeeds
+from headers import HEADERS_NAME, build_headers
+from includes import INCLUDE_DIR, IncludeIndex
+from images import IMAGE_EXTENSIONS, Image, ImageCache, variant_name
+from output import DirectoryBackend, OutputTarget, open_backend
+from render import (
+    add_prefetch_hints, apply_template, init_worker, new_registry,
+    prefix_urls, render_in_worker, render_page, toc_html
+)
+from scheduler import IO_WORKERS, Scheduler
+
+# Directory holding state persisted between builds
+CACHE_DIR = ".ssg_cache"
+
+# Site-wide outline: page URL -> title and headings, written to the
+# root of each target
+TOC_FILE = "toc.json"
+
+# Root-relative URLs in a template, eg. its stylesheets and scripts
+template_url_regex = re.compile(r'(?:href|src)="(/[^"]*)"')
+
+class BuildContext:
+    def __init__(self, keep_going=False, jobs=1, plugins=None,
+                 highlight_cache_dir=None, backend=None, snapshot=None,
+                 max_memory=None, image_variants=None, budget_report=None,
+                 prefetch=0, feeds=None, page_timeout=None, targets=None,
+                 only=None, include_root=None, registry=None,
+                 template_text=None):
+        """
+        Options and site-wide state shared by every page of a build.
+
+        :param keep_going: Collect errors as diagnostics instead of
+        stopping at the first one
+        :type keep_going: bool, optional
+
+        :param jobs: Number of worker processes to render pages with
+        :type jobs: int, optional
+
+        :param plugins: Names of extension modules, loaded into each worker
+        :type plugins: list[str], optional
+
+        :param highlight_cache_dir: Directory of the code highlight cache
+        :type highlight_cache_dir: str, optional
+
+        :param backend: Where generated files are written; by default
+        they are written straight to the filesystem
+        :type backend: OutputBackend, optional
+
+        :param snapshot: Lists the content and static trees
+        :type snapshot: DirectorySnapshot, optional
+
+        :param max_memory: Bytes that pages rendering at once may
+        allocate; when set, each page's peak is measured and concurrency
+        is limited to fit
+        :type max_memory: int, optional
+
+        :param image_variants: Images with width variants, passed to
+        each worker; see copy_static_tree()
+        :type image_variants: dict, optional
+
+        :param budget_report: Measures each page against its budgets
+        :type budget_report: BudgetReport, optional
+
+        :param prefetch: Number of prefetch hints to add to each page.
+        Hints need the whole link graph, so pages are held in memory
+        and written by write_deferred_pages().
+        :type prefetch: int, optional
+
+        :param feeds: Writes sitemap.xml and the Atom feed as pages are
+        recorded
+        :type feeds: SiteFeeds, optional
+
+        :param page_timeout: Seconds a page may take to render before it
+        is reported (or, without keep_going, fails the build)
+        :type page_timeout: float, optional
+
+        :param targets: Copies of the site to write. When given, pages
+        are rendered once with root-relative URLs, and each target gets
+        them prefixed with its own basepath; the basepath and output
+        directory passed to generate_html_tree() are not used, and
+        backend is ignored.
+        :type targets: list[OutputTarget], optional
+
+        :param only: Paths of the content files to build; the rest of
+        the content tree is skipped
+        :type only: set[str], optional
+
+        :param include_root: Directory of included snippets, passed to
+        each worker
+        :type include_root: str, optional
+
+        :param registry: What pages rendered in this process render
+        with, see render.new_registry(); worker processes make their
+        own from plugins, highlight_cache_dir, image_variants and
+        include_root, see render.init_worker()
+        :type registry: ExtensionRegistry, optional
+
+        :param template_text: Text of the template, if it is already
+        read; generate_html_tree() reads template_path otherwise
+        :type template_text: str, optional
+        """
+
+        self.keep_going = keep_going
+        self.jobs = jobs
+        self.plugins = plugins or []
+        self.highlight_cache_dir = highlight_cache_dir
+        self.backend = backend
+        self.snapshot = snapshot or DirectorySnapshot()
+        self.image_variants = image_variants or {}
+        self.budget_report = budget_report
+        self.prefetch = prefetch
+        # (result, dest_path) of pages waiting for write_deferred_pages()
+        self.deferred_pages = []
+        self.feeds = feeds
+        self.page_timeout = page_timeout
+        self.targets = targets or []
+        self.only = only
+        self.include_root = include_root
+        self.registry = registry
+        self.template_text = template_text
+        self.memory_budget = None
+        if max_memory:
+            self.memory_budget = MemoryBudget(max_memory, jobs)
+        self.link_graph = LinkGraph()
+        self.diagnostics = []
+        # Page URL -> {"title", "headings"}, for TOC_FILE
+        self.outlines = {}
+        self.include_index = IncludeIndex()
+        # Scheduler that ran the build, for its critical path report
+        self.schedule = None
+
+    def add_page(self, result):
+        """
+        Record a rendered page's links and diagnostics.
+
+        :param result: A rendered page
+        :type result: PageResult, required
+        """
+
+        if self.budget_report is not None:
+            self.budget_report.check(result, self.link_graph)
+        self.diagnostics.extend(result.diagnostics)
+        if self.feeds is not None:
+            self.feeds.add_page(result)
+        if result.html is not None:
+            self.link_graph.add_page(
+                result.url, result.references, result.anchors
+            )
+            self.outlines[result.url] = {
+                "title": result.title, "headings": result.outline
+            }
+            self.include_index.add_page(result.src_path, result.includes)
+
+def copy_static_tree(src_path, dest_path, backend=None, snapshot=None,
+                     image_cache=None):
+    """
+    Recursively copy a directory tree.
+
+    :param src_path: Directory to copy from
+    :type src_path: str, required
+
+    :param dest_path: Directory to copy to
+    :type dest_path: str, required
+
+    :param backend: Backend to copy files into; by default files are
+    copied on the filesystem
+    :type backend: OutputBackend, optional
+
+    :param snapshot: Lists src_path, leaving out ignored files
+    :type snapshot: DirectorySnapshot, optional
+
+    :param image_cache: Runs images through the image stage, which
+    optimizes them and writes their width variants alongside
+    :type image_cache: ImageCache, optional
+
+    :returns: Site URL of each image with variants -> (width, variant
+    widths), see ExtensionRegistry.image_variants
+    :rtype: dict{str: (int, list[int])}
+    """
+
+    image_variants = {}
+    if not os.path.exists(src_path):
+        return image_variants
+    if snapshot is None:
+        snapshot = DirectorySnapshot()
+    if backend is None:
+        backend = DirectoryBackend(dest_path)
+        os.makedirs(dest_path, exist_ok=True)
+    for rel_path in snapshot.list_files(src_path):
+        copy_static_file(
+            src_path, dest_path, rel_path, backend, image_cache, image_variants
+        )
+    return image_variants
+
+def copy_static_file(src_path, dest_path, rel_path, backend, image_cache=None,
+                     image_variants=None):
+    """
+    Copy one file of a static tree; see copy_static_tree().
+
+    :param src_path: Directory to copy from
+    :type src_path: str, required
+
+    :param dest_path: Directory to copy to
+    :type dest_path: str, required
+
+    :param rel_path: Path of the file under src_path
+    :type rel_path: str, required
+
+    :param backend: Backend to copy the file into
+    :type backend: OutputBackend, required
+
+    :param image_cache: Runs images through the image stage
+    :type image_cache: ImageCache, optional
+
+    :param image_variants: Receives the image's variants, if it has any
+    :type image_variants: dict, optional
+    """
+
+    _src_path = src_path + "/" + rel_path
+    _dest_path = dest_path + "/" + rel_path
+    if image_cache is None or not rel_path.lower().endswith(IMAGE_EXTENSIONS):
+        backend.copy_file(_src_path, _dest_path)
+        return
+    processed = image_cache.process(_src_path)
+    backend.write_bytes(_dest_path, processed.data)
+    for width, variant_data in processed.variants.items():
+        backend.write_bytes(variant_name(_dest_path, width), variant_data)
+    if processed.variants and image_variants is not None:
+        image_variants["/" + rel_path] = (
+            processed.width, sorted(processed.variants)
+        )
+
+def write_page(result, dest_path, context=None):
+    """
+    Write a rendered page to dest_path and record it in context.
+
+    :param result: A rendered page
+    :type result: PageResult, required
+
+    :param dest_path: Path to write resulting html file to; see
+    write_html()
+    :type dest_path: str, required
+
+    :param context: Build state to record the page in; its backend, if
+    set, receives the file
+    :type context: BuildContext, optional
+    """
+
+    if context is not None:
+        context.add_page(result)
+    if result.html is None:
+        return
+    if context is not None and context.prefetch:
+        context.deferred_pages.append((result, dest_path))
+        return
+    write_html(result.html, dest_path, context)
+
+def write_html(html, dest_path, context=None):
+    """
+    Write an HTML file through context's backend, or to the filesystem.
+
+    :param html: Contents of the file
+    :type html: str, required
+
+    :param dest_path: Path to write the file to. With context.targets
+    it is relative to each target's output directory, eg.
+    "/blog/index.html", and each target gets html with its basepath.
+    :type dest_path: str, required
+
+    :param context: Build state whose targets or backend, if set,
+    receive the file
+    :type context: BuildContext, optional
+    """
+
+    if context is not None and context.targets:
+        for target in context.targets:
+            target.backend.write_text(
+                target.path(dest_path), prefix_urls(html, target.basepath)
+            )
+        return
+    if context is not None and context.backend is not None:
+        context.backend.write_text(dest_path, html)
+        return
+    os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+    with open(dest_path, "w") as dest_file:
+        dest_file.write(html)
+
+def write_deferred_pages(context, basepath):
+    """
+    Add prefetch hints, chosen from the finished link graph, to the
+    pages held back by write_page() and write them.
+
+    :param context: Build state holding the pages
+    :type context: BuildContext, required
+
+    :param basepath: URL prefix the site is served under
+    :type basepath: str, required
+    """
+
+    if context.targets:
+        # Prefixed per target by write_html()
+        basepath = ""
+    targets = context.link_graph.prefetch_targets(context.prefetch)
+    for result, dest_path in context.deferred_pages:
+        html = add_prefetch_hints(
+            result.html, targets.get(result.url, []), basepath
+        )
+        write_html(html, dest_path, context)
+    context.deferred_pages = []
+
+# Extension -> how files in the content tree are handled: "page" files
+# are rendered, "html" files are written out with their root-relative
+# URLs prefixed, and files of any other type are copied as assets
+CONTENT_ROUTES = {".md": "page", ".html": "html", ".htm": "html"}
+
+def route_content(src_tree_root, dest_tree_root, snapshot=None):
+    """
+    Sort every file under src_tree_root by its route in CONTENT_ROUTES,
+    with the path it is written to under dest_tree_root.
+
+    :param src_tree_root: Content directory
+    :type src_tree_root: str, required
+
+    :param dest_tree_root: Destination directory
+    :type dest_tree_root: str, required
+
+    :param snapshot: Lists src_tree_root, leaving out ignored files
+    :type snapshot: DirectorySnapshot, optional
+
+    :returns: "page", "html" and "asset" -> list of (src_path, dest_path)
+    :rtype: dict{str: list[(str, str)]}
+    """
+
+    if snapshot is None:
+        snapshot = DirectorySnapshot()
+    routes = {"page": [], "html": [], "asset": []}
+    for rel_path in snapshot.list_files(src_tree_root):
+        stem, ext = os.path.splitext(rel_path)
+        route = CONTENT_ROUTES.get(ext.lower(), "asset")
+        dest_rel_path = stem + ".html" if route == "page" else rel_path
+        routes[route].append((
+            src_tree_root + "/" + rel_path, dest_tree_root + "/" + dest_rel_path
+        ))
+    return routes
+
+def copy_asset(src_path, dest_path, context=None):
+    """
+    Copy a file through context's targets or backend, or on the
+    filesystem. Backends writing to a directory skip files that are
+    already up to date.
+
+    :param src_path: File to copy
+    :type src_path: str, required
+
+    :param dest_path: Path to copy to; see write_html()
+    :type dest_path: str, required
+
+    :param context: Build state whose targets or backend, if set,
+    receive the file
+    :type context: BuildContext, optional
+    """
+
+    if context is not None and context.targets:
+        for target in context.targets:
+            target.backend.copy_file(src_path, target.path(dest_path))
+        return
+    if context is not None and context.backend is not None:
+        context.backend.copy_file(src_path, dest_path)
+        return
+    os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+    shutil.copyfile(src_path, dest_path)
+
+def copy_content_files(routes, src_tree_root, basepath, context=None):
+    """
+    Write the raw HTML files and assets of the content tree, so pages
+    can keep their images and data next to them.
+
+    :param routes: Files of the content tree, from route_content()
+    :type routes: dict{str: list[(str, str)]}, required
+
+    :param src_tree_root: Content directory
+    :type src_tree_root: str, required
+
+    :param basepath: URL prefix the site is served under
+    :type basepath: str, required
+
+    :param context: Build state the files are written through and
+    recorded in, so links to them are not reported as broken
+    :type context: BuildContext, optional
+    """
+
+    for src_path, dest_path in routes["html"]:
+        with open(src_path) as src_file:
+            html = src_file.read()
+        write_html(prefix_urls(html, basepath), dest_path, context)
+    for src_path, dest_path in routes["asset"]:
+        copy_asset(src_path, dest_path, context)
+    if context is not None:
+        context.link_graph.add_static_tree(src_tree_root, [
+            src_path[len(src_tree_root) + 1:]
+            for src_path, dest_path in routes["html"] + routes["asset"]
+        ])
+
+def generate_html_tree(
+    src_tree_root, template_path, dest_tree_root, basepath, context=None
+):
+    """
+    Given the root of a tree of markdown file, iterate over all markdown files in the root, and generate html pages from them in the dest_tree_root.
+    Other files in the tree are routed by copy_content_files().
+
+    :param src_tree_root: Source directory to search for markdown files in
+    :type src_tree_root: str, required
+
+    :param template_path: Path to template.html
+    :type template_path: str, required
+
+    :param dest_tree_root: Destination directory to place converted html files
+    :type dest_tree_root: str, required
+
+    :param context: Build options and state to record each page in. With
+    context.jobs above 1, pages are rendered in worker processes.
+    :type context: BuildContext, optional
+    """
+
+    if context is None:
+        context = BuildContext()
+    if context.targets:
+        # Each page is rendered once and written to every target by
+        # write_html()
+        basepath = dest_tree_root = ""
+    routes = route_content(src_tree_root, dest_tree_root, context.snapshot)
+    if context.only is not None:
+        routes = {
+            route: [item for item in items if item[0] in context.only]
+            for route, items in routes.items()
+        }
+    copy_content_files(routes, src_tree_root, basepath, context)
+    page_list = routes["page"]
+
+    template_text = context.template_text
+    if template_text is None:
+        with open(template_path) as template_file:
+            template_text = template_file.read()
+    render_args = (template_text, basepath, src_tree_root, context.keep_going)
+    for src_path, dest_path, result in render_page_list(
+        page_list, render_args, context
+    ):
+        print(
+            f"Generating page from {src_path} to {dest_path} using {template_path}"
+        )
+        write_page(result, dest_path, context)
+
+def render_page_list(page_list, render_args, context):
+    """
+    Render pages the way context asks: in worker processes with
+    context.jobs above 1, as many at once as its memory budget allows if
+    it has one, otherwise one at a time in this process.
+
+    :param page_list: (src_path, dest_path) tuples
+    :type page_list: list[(str, str)], required
+
+    :param render_args: Arguments passed to render_page() after src_path:
+    template_text, basepath, src_tree_root and keep_going
+    :type render_args: tuple, required
+
+    :param context: Build options
+    :type context: BuildContext, required
+
+    :returns: An iterator of (src_path, dest_path, result)
+    :rtype: iterator[(str, str, PageResult)]
+    """
+
+    budget = context.memory_budget
+    timeout = context.page_timeout
+    # Only the feed's posts need their content HTML
+    content_paths = frozenset(
+        context.feeds.feed_posts if context.feeds is not None else ()
+    )
+    if context.jobs <= 1 or len(page_list) <= 1:
+        for src_path, dest_path in page_list:
+            result = render_page(
+                src_path, *render_args, track_memory=budget is not None,
+                timeout=timeout, content_paths=content_paths,
+                registry=context.registry
+            )
+            if budget is not None:
+                budget.record(result, os.path.getsize(src_path))
+            yield src_path, dest_path, result
+        return
+
+    initargs = (
+        context.plugins, context.highlight_cache_dir,
+        context.image_variants, context.include_root
+    )
+    with ProcessPoolExecutor(
+        context.jobs, initializer=init_worker, initargs=initargs
+    ) as executor:
+        if budget is not None:
+            yield from render_bounded(
+                executor, page_list, budget, render_args, timeout,
+                content_paths, context.registry
+            )
+            return
+        results = executor.map(
+            render_in_worker, [src_path for src_path, dest_path in page_list],
+            *(repeat(arg) for arg in render_args), repeat(False),
+            repeat(timeout), repeat(content_paths)
+        )
+        for (src_path, dest_path), result in zip(page_list, results):
+            yield src_path, dest_path, result
+
+class Builder:
+    def __init__(self, content_root="content", static_root="static",
+                 template_path="template.html", targets=None, archive=None,
+                 cache_dir=CACHE_DIR, plugins=None, keep_going=False, jobs=1,
+                 max_memory=None, budgets=None, measure_budgets=False,
+                 prefetch=0, site_url=None, feed_limit=FEED_LIMIT,
+                 page_timeout=None, io_workers=IO_WORKERS,
+                 include_root=INCLUDE_DIR, headers=None, site_author=None):
+        """
+        Builds a site in-process, for embedding in another program. The
+        directory snapshot, metadata index, image cache, loaded plugins
+        and template are kept between calls, so a long-lived Builder
+        rebuilds or re-renders at in-memory speed instead of paying for
+        a fresh start each time.
+
+        :param content_root: Directory of markdown files
+        :type content_root: str, optional
+
+        :param static_root: Directory of static files
+        :type static_root: str, optional
+
+        :param template_path: Path to template.html
+        :type template_path: str, optional
+
+        :param targets: (name, basepath, output directory) of each copy
+        of the site to write; defaults to one copy in docs/ served from /
+        :type targets: list[(str, str, str)], optional
+
+        :param archive: Write the (single) target to this .zip or .tar
+        archive instead of its directory
+        :type archive: str, optional
+
+        :param cache_dir: Directory holding state persisted between
+        builds
+        :type cache_dir: str, optional
+
+        :param plugins: Names of extension modules
+        :type plugins: list[str], optional
+
+        :param keep_going: Collect errors as diagnostics instead of
+        stopping at the first one
+        :type keep_going: bool, optional
+
+        :param jobs: Number of worker processes to render pages with
+        :type jobs: int, optional
+
+        :param max_memory: Bytes that pages rendering at once may allocate
+        :type max_memory: int, optional
+
+        :param budgets: Performance budgets, see budgets.load_budgets()
+        :type budgets: dict, optional
+
+        :param measure_budgets: Measure every page even without budgets,
+        for BudgetReport.write()
+        :type measure_budgets: bool, optional
+
+        :param prefetch: Number of prefetch hints to add to each page
+        :type prefetch: int, optional
+
+        :param site_url: Scheme and host the site is published at;
+        enables sitemap.xml and the Atom feed
+        :type site_url: str, optional
+
+        :param feed_limit: Number of posts in the Atom feed
+        :type feed_limit: int, optional
+
+        :param page_timeout: Seconds a page may take to render
+        :type page_timeout: float, optional
+
+        :param io_workers: Number of threads copying static files and
+        processing images while pages render
+        :type io_workers: int, optional
+
+        :param include_root: Directory of the snippets pages include
+        :type include_root: str, optional
+
+        :param headers: Settings for a _headers file, see
+        headers.load_headers(); none is written without them
+        :type headers: dict, optional
+
+        :param site_author: Author named in the Atom feed
+        :type site_author: str, optional
+
+        :raises ValueError: If archive is given with several targets
+        """
+
+        self.content_root = content_root
+        self.static_root = static_root
+        self.template_path = template_path
+        self.targets = targets or [("default", "/", "docs")]
+        if archive and len(self.targets) > 1:
+            raise ValueError("An archive can only hold a single target")
+        self.archive = archive
+        self.cache_dir = cache_dir
+        self.plugins = plugins or []
+        self.keep_going = keep_going
+        self.jobs = jobs
+        self.max_memory = max_memory
+        self.budgets = budgets
+        self.measure_budgets = measure_budgets
+        self.prefetch = prefetch
+        self.site_url = site_url
+        self.feed_limit = feed_limit
+        self.page_timeout = page_timeout
+        self.io_workers = io_workers
+        self.include_root = include_root
+        self.headers = headers
+        self.site_author = site_author
+
+        self.highlight_cache_dir = cache_dir + "/highlight"
+        # Held by this Builder rather than set module-wide, so Builders
+        # with different settings can coexist in one process
+        self.registry = new_registry(
+            self.plugins, self.highlight_cache_dir, include_root
+        )
+        self.snapshot = DirectorySnapshot(
+            IgnoreRules(load_ignore_patterns()), cache_dir + "/snapshot.json"
+        )
+        self.snapshot.load()
+        self.metadata_index = MetadataIndex(cache_dir + "/metadata.json")
+        self.image_cache = ImageCache(cache_dir + "/images")
+        # Pages that include each snippet, from earlier builds
+        self.include_index = IncludeIndex(cache_dir + "/includes.json")
+        self.include_index.load()
+        # Images with width variants, from the last full build; partial
+        # builds need them for srcset but do not process every image
+        self.image_variants = {}
+        try:
+            with open(cache_dir + "/image_variants.json") as variants_file:
+                self.image_variants = json.load(variants_file)
+        except (OSError, ValueError):
+            pass
+        # (mtime_ns, size) of the template when it was read, and its text
+        self._template_key = None
+        self._template_text = None
+
+    def template_text(self):
+        """
+        :returns: Text of the template, read again only when it changes
+        :rtype: str
+        """
+
+        stat = os.stat(self.template_path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        if key != self._template_key:
+            with open(self.template_path) as template_file:
+                self._template_text = template_file.read()
+            self._template_key = key
+        return self._template_text
+
+    def open_targets(self, clear=True):
+        """
+        Open each target's backend.
+
+        :param clear: Delete each target's output directory first
+        :type clear: bool, optional
+
+        :returns: The targets
+        :rtype: list[OutputTarget]
+        """
+
+        targets = []
+        for name, basepath, dest_tree_root in self.targets:
+            if clear and not self.archive:
+                try:
+                    shutil.rmtree(dest_tree_root)
+                except FileNotFoundError:
+                    pass
+            backend = open_backend(dest_tree_root, self.archive)
+            targets.append(OutputTarget(name, basepath, backend))
+        return targets
+
+    def select_sources(self, only, link_graph, backlinks=False):
+        """
+        Find the content files a partial build renders: the ones only
+        selects, and the pages including a snippet that changed since
+        they were last built.
+
+        :param only: Paths or globs under content_root, see PathSelector.
+        Snippets under include_root select the pages that include them.
+        :type only: list[str], required
+
+        :param link_graph: The previous build's link graph
+        :type link_graph: LinkGraph, required
+
+        :param backlinks: Also select pages linking to the selected files
+        :type backlinks: bool, optional
+
+        :returns: Paths of the selected files
+        :rtype: set[str]
+        """
+
+        selector = PathSelector(only, self.content_root)
+        # site URL -> content file
+        sources = {}
+        selected = set()
+        for rel_path in self.snapshot.list_files(self.content_root):
+            src_path = self.content_root + "/" + rel_path
+            if rel_path.endswith(".md"):
+                url = page_url(src_path, self.content_root)
+            else:
+                url = "/" + rel_path
+            sources[url] = src_path
+            if selector.matches(rel_path):
+                selected.add(url)
+        if backlinks:
+            selected |= link_graph.backlinks(selected)
+        include_selector = PathSelector(only, self.include_root)
+        snippets = {
+            name for name in self.include_index.snippets()
+            if include_selector.matches(name)
+        }
+        stale = self.include_index.stale(self.registry.include_resolver)
+        return (
+            {sources[url] for url in selected if url in sources}
+            | self.include_index.dependents(snippets)
+            | (stale & set(sources.values()))
+        )
+
+    def copy_static(self, targets, rel_path):
+        """
+        Copy a file of the static tree into every target. Images are
+        processed once, for the first target; the rest hit the image
+        cache. Their variants are known beforehand, see plan_images().
+
+        :param targets: Targets to copy into
+        :type targets: list[OutputTarget], required
+
+        :param rel_path: Path of the file under static_root
+        :type rel_path: str, required
+        """
+
+        for target in targets:
+            copy_static_file(
+                self.static_root, target.backend.root, rel_path,
+                target.backend, self.image_cache
+            )
+
+    def copy_referenced_assets(self, context, targets, src_paths=None):
+        """
+        Copy the static files that the pages of a partial build, or
+        the template, link to or embed.
+
+        :param context: The partial build's state
+        :type context: BuildContext, required
+
+        :param targets: Targets to copy into
+        :type targets: list[OutputTarget], required
+
+        :param src_paths: Content files the build rendered; defaults to
+        context.only
+        :type src_paths: set[str], optional
+        """
+
+        if src_paths is None:
+            src_paths = context.only
+        static_files = set(self.snapshot.list_files(self.static_root))
+        link_graph = context.link_graph
+        # (page url, reference) pairs
+        references = [
+            ("/index.html", url)
+            for url in template_url_regex.findall(self.template_text())
+        ]
+        for src_path in src_paths:
+            if src_path.endswith(".md"):
+                url = page_url(src_path, self.content_root)
+                references.extend(
+                    (url, reference)
+                    for tag, reference in link_graph.pages.get(url, [])
+                )
+        copied = set()
+        for url, reference in references:
+            target_url = link_graph.resolve(url, reference)[0]
+            if not target_url or target_url in copied:
+                continue
+            copied.add(target_url)
+            if target_url[1:] in static_files:
+                self.copy_static(targets, target_url[1:])
+
+    def discover(self, context, only, backlinks):
+        """
+        Index the content tree's metadata and start the feeds, which
+        pick their posts from it, or for a partial build select the
+        content files to build. The first task of a build.
+        """
+
+        self.metadata_index.update(
+            self.content_root, self.snapshot.list_files(self.content_root)
+        )
+        self.metadata_index.save()
+        if self.site_url and not only:
+            # Feeds carry absolute URLs, so they are written for the
+            # first target only
+            target = context.targets[0]
+            context.feeds = SiteFeeds(
+                target.backend, target.backend.root, self.site_url,
+                target.basepath, self.metadata_index, self.content_root,
+                limit=self.feed_limit, author=self.site_author
+            )
+        if only:
+            context.link_graph.load(self.cache_dir + "/links.json")
+            try:
+                with open(self.cache_dir + "/" + TOC_FILE) as toc_file:
+                    context.outlines = json.load(toc_file)
+            except (OSError, ValueError):
+                pass
+            context.only = self.select_sources(
+                only, context.link_graph, backlinks
+            )
+            print(f"Partial build: {len(context.only)} content files selected")
+
+    def plan_images(self, rel_paths):
+        """
+        Find the width variants of the static tree's images without
+        processing them, so pages embedding them can render meanwhile.
+
+        :param rel_paths: Paths of the images under static_root
+        :type rel_paths: list[str], required
+        """
+
+        image_variants = {}
+        for rel_path in rel_paths:
+            width, variant_widths = self.image_cache.plan(
+                self.static_root + "/" + rel_path
+            )
+            if variant_widths:
+                image_variants["/" + rel_path] = (width, variant_widths)
+        self.image_variants = image_variants
+
+    def render_pages(self, context):
+        """
+        Render the content tree into context's targets. Runs once the
+        images' variants are planned, since pages embed them.
+        """
+
+        context.image_variants = self.image_variants
+        self.registry.image_variants = self.image_variants
+        context.template_text = self.template_text()
+        generate_html_tree(
+            self.content_root, self.template_path, "", "", context
+        )
+
+    def write_headers(self, context, targets):
+        """
+        Write each target's _headers file from the finished link graph.
+        """
+
+        for target in targets:
+            target.backend.write_text(
+                target.path("/" + HEADERS_NAME),
+                build_headers(
+                    context.link_graph, self.template_text(), self.headers,
+                    target.basepath, self.image_variants
+                )
+            )
+
+    def write_index(self, context, targets, partial):
+        """
+        Finish a build: close the feeds, write the site's outline and
+        close the targets, and save the state the next build starts
+        from. The last task of a build.
+        """
+
+        if context.feeds is not None:
+            context.feeds.close()
+        toc_text = json.dumps(context.outlines, sort_keys=True)
+        for target in targets:
+            target.backend.write_text(target.path("/" + TOC_FILE), toc_text)
+            target.backend.close()
+        context.link_graph.save(self.cache_dir + "/links.json")
+        self.include_index.save()
+        with open(self.cache_dir + "/" + TOC_FILE, "w") as toc_file:
+            toc_file.write(toc_text)
+        if not partial:
+            with open(self.cache_dir + "/image_variants.json", "w") as variants_file:
+                json.dump(self.image_variants, variants_file)
+        self.snapshot.save()
+
+    def build(self, only=None, backlinks=False):
+        """
+        Build the site into every target. The build runs as a graph of
+        tasks: static files are copied and images processed on
+        io_workers threads while pages render. Rendering waits only for
+        the images' variants to be planned, see plan_images().
+
+        :param only: Paths or globs of content files to build; see
+        PathSelector. Only those pages, and any including a snippet
+        edited since the last build, are rendered; only the static
+        files they reference are copied, and nothing else in the output
+        is touched. Links are checked against the previous build.
+        sitemap.xml and the feed are left as they are.
+        :type only: list[str], optional
+
+        :param backlinks: With only, also rebuild the pages that link to
+        the selected ones
+        :type backlinks: bool, optional
+
+        :returns: The finished build's state: diagnostics, link graph,
+        memory, budget and schedule reports
+        :rtype: BuildContext
+
+        :raises ValueError: If only is given when building an archive
+        """
+
+        partial = bool(only)
+        if partial and self.archive:
+            raise ValueError("A partial build cannot update an archive")
+        snapshot = self.snapshot
+
+        budget_report = None
+        if self.budgets is not None or self.measure_budgets:
+            budget_report = BudgetReport(
+                self.budgets, self.static_root, self.content_root
+            )
+
+        targets = self.open_targets(clear=not partial)
+        context = BuildContext(
+            self.keep_going, self.jobs, self.plugins, self.highlight_cache_dir,
+            snapshot=snapshot, max_memory=self.max_memory,
+            budget_report=budget_report, prefetch=self.prefetch,
+            page_timeout=self.page_timeout, targets=targets,
+            include_root=self.include_root, registry=self.registry
+        )
+        if not partial:
+            self.include_index.pages = {}
+        context.include_index = self.include_index
+        static_files = snapshot.list_files(self.static_root)
+        context.link_graph.add_static_tree(self.static_root, static_files)
+
+        scheduler = Scheduler(self.io_workers)
+        context.schedule = scheduler
+        discover = scheduler.add(
+            "discover", self.discover, context, only, backlinks, pool="cpu"
+        )
+        render_deps = [discover]
+        if not partial:
+            images = [
+                rel_path for rel_path in static_files
+                if rel_path.lower().endswith(IMAGE_EXTENSIONS)
+            ]
+            self.image_variants = {}
+            if images and Image is not None and self.image_cache.widths:
+                render_deps.append(scheduler.add(
+                    "plan images", self.plan_images, images
+                ))
+            for rel_path in static_files:
+                if rel_path.lower().endswith(IMAGE_EXTENSIONS):
+                    name = f"process {rel_path}"
+                else:
+                    name = f"copy {rel_path}"
+                scheduler.add(name, self.copy_static, targets, rel_path)
+        render = scheduler.add(
+            "render pages", self.render_pages, context, deps=render_deps,
+            pool="cpu"
+        )
+        if self.prefetch:
+            scheduler.add(
+                "write prefetch hints", write_deferred_pages, context, "",
+                deps=[render], pool="cpu"
+            )
+        if partial:
+            scheduler.add(
+                "copy referenced assets", self.copy_referenced_assets,
+                context, targets, deps=[render]
+            )
+        if self.headers is not None:
+            scheduler.add(
+                "write headers", self.write_headers, context, targets,
+                deps=[render], pool="cpu"
+            )
+        scheduler.add(
+            "write index", self.write_index, context, targets, partial,
+            deps=list(scheduler.tasks), pool="cpu"
+        )
+        scheduler.run()
+        return context
+
+    def render_page(self, src_path):
+        """
+        Render one markdown file as it would appear in the first target,
+        without writing it.
+
+        :param src_path: Path of a markdown file under content_root
+        :type src_path: str, required
+
+        :returns: The rendered page
+        :rtype: PageResult
+        """
+
+        return render_page(
+            src_path, self.template_text(), self.targets[0][1].rstrip("/"),
+            self.content_root, self.keep_going, timeout=self.page_timeout,
+            registry=self.registry
+        )
+
+    def render_string(self, markdown, full_page=False):
+        """
+        Render markdown that is not part of the site, eg. a preview.
+
+        :param markdown: Markdown text
+        :type markdown: str, required
+
+        :param full_page: Fill the template in, with the markdown's H1
+        as the title
+        :type full_page: bool, optional
+
+        :returns: The rendered HTML
+        :rtype: str
+
+        :raises SyntaxError: If Markdown syntax is invalid
+        """
+
+        outline = Outline()
+        html = markdown_to_html_node(
+            markdown, registry=self.registry, outline=outline
+        ).to_html()
+        if not full_page:
+            return html
+        title = outline.title()
+        if title is None:
+            raise SyntaxError("Invalid Markdown Syntax: No H1 Markdown tag")
+        return apply_template(
+            self.template_text(), title, html, self.targets[0][1].rstrip("/"),
+            toc_html(outline.headings)
+        )
@@ -0,0 +1,136 @@
+import json
+
+class Diagnostic:
+    def __init__(self, message, line=None, column=None, path=None, severity="error"):
+        """
+        A problem found while building, with its location.
+
+        :param message: Description of the problem
+        :type message: str, required
+
+        :param line: 1-based line number in the source file
+        :type line: int, optional
+
+        :param column: 1-based column number in the source file
+        :type column: int, optional
+
+        :param path: Path of the source file
+        :type path: str, optional
+
+        :param severity: "error" or "warning"
+        :type severity: str, optional
+        """
+
+        self.message = message
+        self.line = line
+        self.column = column
+        self.path = path
+        self.severity = severity
+
+    def __eq__(self, other):
+        if not isinstance(other, Diagnostic):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"Diagnostic({self.to_dict()})"
+
+    def __str__(self):
+        location = self.path or "<string>"
+        if self.line is not None:
+            location += f":{self.line}"
+            if self.column is not None:
+                location += f":{self.column}"
+        return f"{location}: {self.severity}: {self.message}"
+
+    def to_dict(self):
+        """
+        :returns: The diagnostic as a JSON-serializable dictionary
+        :rtype: dict
+        """
+
+        return {
+            "path": self.path,
+            "line": self.line,
+            "column": self.column,
+            "severity": self.severity,
+            "message": self.message,
+        }
+
+def locate_syntax_error(error, block, first_line):
+    """
+    Find the line and column of a SyntaxError raised while parsing block.
+    Parser errors carry the offending text and an offset into it; that
+    text is located in the block to get an absolute position.
+
+    :param error: The error raised while parsing block
+    :type error: SyntaxError, required
+
+    :param block: The markdown block being parsed
+    :type block: str, required
+
+    :param first_line: 1-based line number of the block's first line
+    :type first_line: int, required
+
+    :returns: 1-based line and column
+    :rtype: (int, int)
+    """
+
+    text = getattr(error, "text", None)
+    offset = getattr(error, "offset", None) or 1
+    if text:
+        # Inline parsing sees newlines as spaces; do the same so the
+        # offending text can be found
+        position = block.replace("\n", " ").find(text)
+        if position > -1:
+            position += offset - 1
+            line = first_line + block.count("\n", 0, position)
+            column = position - (block.rfind("\n", 0, position) + 1) + 1
+            return line, column
+    return first_line, 1
+
+def format_report(diagnostics):
+    """
+    Format diagnostics as a human-readable report, grouped by file.
+
+    :param diagnostics: Diagnostics collected during the build
+    :type diagnostics: list[Diagnostic], required
+
+    :returns: The report text
+    :rtype: str
+    """
+
+    diagnostics = sorted(
+        diagnostics,
+        key=lambda d: (d.path or "", d.line or 0, d.column or 0)
+    )
+    lines = [str(diagnostic) for diagnostic in diagnostics]
+    errors = sum(1 for d in diagnostics if d.severity == "error")
+    files = len({d.path for d in diagnostics})
+    lines.append(
+        f"{errors} error(s), {len(diagnostics) - errors} warning(s) in {files} file(s)"
+    )
+    return "\n".join(lines)
+
+def write_json_report(diagnostics, report_path, extra=None):
+    """
+    Write diagnostics to report_path as JSON.
+
+    :param diagnostics: Diagnostics collected during the build
+    :type diagnostics: list[Diagnostic], required
+
+    :param report_path: File to write
+    :type report_path: str, required
+
+    :param extra: Further sections of the build report, eg. "memory"
+    :type extra: dict, optional
+    """
+
+    report = {
+        "errors": sum(1 for d in diagnostics if d.severity == "error"),
+        "warnings": sum(1 for d in diagnostics if d.severity == "warning"),
+        "diagnostics": [diagnostic.to_dict() for diagnostic in diagnostics],
+    }
+    report.update(extra or {})
+    with open(report_path, "w") as report_file:
+        json.dump(report, report_file, indent=2)
@@ -0,0 +1,266 @@
+import fnmatch, json, os
+
+# Ignore file read from the directory the site is built in
+IGNORE_FILE = ".ssgignore"
+
+# Editor and OS litter that is never part of a site
+DEFAULT_IGNORE_PATTERNS = [
+    "*~", ".*.swp", ".*.swo", ".#*", "#*#", ".DS_Store", IGNORE_FILE,
+]
+
+# Bump when the snapshot layout changes
+SNAPSHOT_VERSION = 1
+
+def load_ignore_patterns(ignore_path=IGNORE_FILE):
+    """
+    Read glob patterns from an ignore file, one per line. Blank lines
+    and lines starting with "#" are skipped.
+
+    :param ignore_path: Path to the ignore file
+    :type ignore_path: str, optional
+
+    :returns: The patterns, or [] if the file does not exist
+    :rtype: list[str]
+    """
+
+    try:
+        with open(ignore_path) as ignore_file:
+            lines = ignore_file.read().split("\n")
+    except FileNotFoundError:
+        return []
+    patterns = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            patterns.append(line)
+    return patterns
+
+class IgnoreRules:
+    def __init__(self, patterns=None):
+        """
+        Glob patterns, gitignore style: a pattern containing "/" is
+        matched against the path relative to the tree root, other
+        patterns against the file or directory name, and a trailing "/"
+        only matches directories. An ignored directory is not descended
+        into.
+
+        :param patterns: Patterns to add to DEFAULT_IGNORE_PATTERNS
+        :type patterns: list[str], optional
+        """
+
+        self.patterns = DEFAULT_IGNORE_PATTERNS + list(patterns or [])
+        self._name_patterns = []
+        self._path_patterns = []
+        for pattern in self.patterns:
+            dir_only = pattern.endswith("/")
+            pattern = pattern.rstrip("/")
+            if "/" in pattern:
+                self._path_patterns.append((pattern.lstrip("/"), dir_only))
+            else:
+                self._name_patterns.append((pattern, dir_only))
+
+    def matches(self, rel_path, is_dir=False):
+        """
+        :param rel_path: Path relative to the tree root, "/" separated
+        :type rel_path: str, required
+
+        :param is_dir: Whether rel_path is a directory
+        :type is_dir: bool, optional
+
+        :returns: True if rel_path is ignored
+        :rtype: bool
+        """
+
+        name = rel_path.rsplit("/", 1)[-1]
+        for pattern, dir_only in self._name_patterns:
+            if (is_dir or not dir_only) and fnmatch.fnmatchcase(name, pattern):
+                return True
+        for pattern, dir_only in self._path_patterns:
+            if (is_dir or not dir_only) and fnmatch.fnmatchcase(rel_path, pattern):
+                return True
+        return False
+
+class PathSelector:
+    def __init__(self, patterns, src_tree_root="content"):
+        """
+        Picks files of a tree by path or glob, for partial builds. A
+        pattern is relative to src_tree_root, or may start with it, and
+        matches files by path or directories and everything under them,
+        eg. "blog/tom/index.md", "content/blog/tom" or "blog/*/index.md".
+
+        :param patterns: Paths or glob patterns
+        :type patterns: list[str], required
+
+        :param src_tree_root: Root of the tree
+        :type src_tree_root: str, optional
+        """
+
+        prefix = src_tree_root.rstrip("/") + "/"
+        self.patterns = []
+        for pattern in patterns:
+            pattern = pattern.replace(os.sep, "/").removeprefix("./")
+            pattern = pattern.removeprefix(prefix).strip("/")
+            self.patterns.append(pattern)
+
+    def matches(self, rel_path):
+        """
+        :param rel_path: Path relative to the tree root, "/" separated
+        :type rel_path: str, required
+
+        :returns: True if rel_path or one of its directories is selected
+        :rtype: bool
+        """
+
+        for pattern in self.patterns:
+            if fnmatch.fnmatchcase(rel_path, pattern):
+                return True
+            slash = rel_path.find("/")
+            while slash != -1:
+                if fnmatch.fnmatchcase(rel_path[:slash], pattern):
+                    return True
+                slash = rel_path.find("/", slash + 1)
+        return False
+
+class DirectorySnapshot:
+    def __init__(self, ignore_rules=None, cache_path=None):
+        """
+        Lists the files of a directory tree. Each directory's listing is
+        remembered with the directory's mtime, which changes whenever an
+        entry is added, removed or renamed, so a directory whose mtime
+        is unchanged is not listed again. Files are told apart from
+        directories by os.scandir() without a stat() call; only
+        directories are stat()ed.
+
+        Only names are cached. A file edited in place does not change
+        its directory's mtime, so callers that care about contents must
+        still check the file itself.
+
+        :param ignore_rules: Files and directories to leave out
+        :type ignore_rules: IgnoreRules, optional
+
+        :param cache_path: JSON file to persist the snapshot in
+        :type cache_path: str, optional
+        """
+
+        self.ignore_rules = ignore_rules or IgnoreRules()
+        self.cache_path = cache_path
+        # directory path -> {"mtime": int, "files": [str], "dirs": [str]}
+        self.dirs = {}
+        self.scanned = 0
+        self.reused = 0
+
+    def load(self):
+        """
+        Load the snapshot from self.cache_path. A missing, unreadable or
+        outdated snapshot, or one taken with other ignore patterns, is
+        discarded.
+        """
+
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path) as cache_file:
+                data = json.load(cache_file)
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict):
+            return
+        if data.get("version") != SNAPSHOT_VERSION:
+            return
+        if data.get("patterns") != self.ignore_rules.patterns:
+            return
+        self.dirs = data.get("dirs", {})
+
+    def save(self):
+        """
+        Write the snapshot to self.cache_path, if set.
+        """
+
+        if not self.cache_path:
+            return
+        cache_dir = os.path.dirname(self.cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "patterns": self.ignore_rules.patterns,
+            "dirs": self.dirs,
+        }
+        with open(self.cache_path, "w") as cache_file:
+            json.dump(data, cache_file)
+
+    def list_files(self, root):
+        """
+        List the files under root that are not ignored.
+
+        :param root: Directory to list
+        :type root: str, required
+
+        :returns: Paths relative to root, "/" separated, sorted
+        :rtype: list[str]
+        """
+
+        try:
+            root_mtime = os.stat(root).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        files = []
+        # Prune snapshot entries of directories that no longer exist
+        seen = set()
+        stack = [(root, "", root_mtime)]
+        while stack:
+            dir_path, rel_dir, mtime = stack.pop()
+            seen.add(dir_path)
+            listing = self.dirs.get(dir_path)
+            if listing is not None and listing["mtime"] == mtime:
+                self.reused += 1
+                sub_dirs = []
+                for name in listing["dirs"]:
+                    sub_path = dir_path + "/" + name
+                    try:
+                        sub_dirs.append((name, os.stat(sub_path).st_mtime_ns))
+                    except FileNotFoundError:
+                        pass
+                file_names = listing["files"]
+            else:
+                self.scanned += 1
+                sub_dirs, file_names = self.scan(dir_path, rel_dir)
+                self.dirs[dir_path] = {
+                    "mtime": mtime,
+                    "files": file_names,
+                    "dirs": [name for name, sub_mtime in sub_dirs],
+                }
+            for name in file_names:
+                files.append(rel_dir + name)
+            for name, sub_mtime in sub_dirs:
+                stack.append((dir_path + "/" + name, rel_dir + name + "/", sub_mtime))
+
+        prefix = root + "/"
+        for dir_path in list(self.dirs):
+            if (dir_path == root or dir_path.startswith(prefix)) and dir_path not in seen:
+                del self.dirs[dir_path]
+        files.sort()
+        return files
+
+    def scan(self, dir_path, rel_dir):
+        """
+        List one directory with os.scandir().
+
+        :returns: (name, mtime) of each subdirectory and the names of the
+        files, leaving out ignored entries
+        :rtype: (list[(str, int)], list[str])
+        """
+
+        sub_dirs = []
+        file_names = []
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    if not self.ignore_rules.matches(rel_dir + entry.name, True):
+                        sub_dirs.append((entry.name, entry.stat().st_mtime_ns))
+                elif entry.is_file():
+                    if not self.ignore_rules.matches(rel_dir + entry.name):
+                        file_names.append(entry.name)
+        sub_dirs.sort()
+        file_names.sort()
+        return sub_dirs, file_names
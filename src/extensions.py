@@ -0,0 +1,159 @@
+import importlib
+
+class ExtensionRegistry:
+    def __init__(self):
+        """
+        Registry of block and inline syntax. The built-in Markdown syntax
+        is registered by blocknode.builtin_registry() or
+        render.new_registry(), and plugins add their own.
+
+        Lookups go through tables rebuilt on each registration, so
+        adding extensions does not make dispatch any slower.
+
+        The registry is passed to every renderer, so it also carries the
+        caches and site data the built-in syntax renders with. Those
+        left as None are not used: code is highlighted without a cache,
+        images get no srcset and include directives are not resolved.
+        """
+
+        # leading character -> tuple of (detector, block_type)
+        self._block_detectors = {}
+        # block_type -> renderer
+        self._block_renderers = {}
+        # delimiter -> text_type
+        self._inline_delimiters = {}
+        # text_type -> tag, for text types added by extensions
+        self._text_type_tags = {}
+        self._delimiter_table = ()
+        # names of plugin modules loaded by load_plugins()
+        self.plugins = []
+        # HighlightCache for code blocks
+        self.highlight_cache = None
+        # Images with width variants, see images.srcset()
+        self.image_variants = None
+        # IncludeResolver for include directives, see render_page()
+        self.include_resolver = None
+
+    def register_block(self, leading_chars, detector, block_type, renderer):
+        """
+        Register a block type.
+
+        :param leading_chars: Characters a block of this type can start with
+        :type leading_chars: str, required
+
+        :param detector: Called as detector(block, line_list). Returns
+        block_type (or another block type) if the block matches, None
+        if it does not, and raises SyntaxError if it is malformed.
+        Detectors registered later are tried first.
+        :type detector: callable, required
+
+        :param block_type: Key identifying the block type, eg. a BlockType
+        or a string such as "admonition"
+        :type block_type: hashable, required
+
+        :param renderer: See register_renderer()
+        :type renderer: callable, required
+        """
+
+        for char in leading_chars:
+            detectors = self._block_detectors.get(char, ())
+            self._block_detectors[char] = ((detector, block_type),) + detectors
+        self.register_renderer(block_type, renderer)
+
+    def register_renderer(self, block_type, renderer):
+        """
+        Register (or replace) the renderer for a block type.
+
+        :param block_type: Key identifying the block type
+        :type block_type: hashable, required
+
+        :param renderer: Called as renderer(block, registry); returns an
+        HTMLNode. registry is passed on to text_to_children() so inline
+        extensions apply inside the block.
+        :type renderer: callable, required
+        """
+
+        self._block_renderers[block_type] = renderer
+
+    def register_inline(self, delimiter, text_type, tag=None):
+        """
+        Register an inline delimiter, eg. "~~" for strikethrough.
+        Delimiters are applied in registration order.
+
+        :param delimiter: String that opens and closes the span
+        :type delimiter: str, required
+
+        :param text_type: TextType (or another key) of the span's TextNode
+        :type text_type: hashable, required
+
+        :param tag: HTML tag to render text_type with; required for text
+        types that text_node_to_html_node() does not already know
+        :type tag: str, optional
+        """
+
+        self._inline_delimiters[delimiter] = text_type
+        if tag is not None:
+            self._text_type_tags[text_type] = tag
+        self._delimiter_table = tuple(self._inline_delimiters.items())
+
+    def detect_block(self, block, line_list):
+        """
+        Find the type of block using the detectors registered for its
+        first character.
+
+        :returns: The block type, or None if no detector matched
+        :rtype: hashable
+        """
+
+        for detector, block_type in self._block_detectors.get(block[0], ()):
+            result = detector(block, line_list)
+            if result is not None:
+                return result
+        return None
+
+    def block_renderer(self, block_type):
+        """
+        :returns: The renderer registered for block_type
+        :rtype: callable
+
+        :raises KeyError: If nothing is registered for block_type
+        """
+
+        return self._block_renderers[block_type]
+
+    def inline_delimiters(self):
+        """
+        :returns: (delimiter, text_type) tuples in registration order
+        :rtype: tuple[(str, hashable)]
+        """
+
+        return self._delimiter_table
+
+    def text_type_tag(self, text_type):
+        """
+        :returns: The tag registered for text_type, or None
+        :rtype: str
+        """
+
+        return self._text_type_tags.get(text_type)
+
+def load_plugins(module_names, registry):
+    """
+    Import plugin modules and call their register(registry) function.
+    Modules already loaded into registry are skipped.
+
+    :param module_names: Importable module names
+    :type module_names: list[str], required
+
+    :param registry: Registry to register with
+    :type registry: ExtensionRegistry, required
+
+    :raises AttributeError: If a module has no register() function
+    """
+
+    for module_name in module_names:
+        if module_name in registry.plugins:
+            continue
+        module = importlib.import_module(module_name)
+        module.register(registry)
+        registry.plugins.append(module_name)
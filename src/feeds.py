@@ -0,0 +1,348 @@
+import re, time
+from urllib.parse import urlsplit
+
+from htmlnode import escape_attribute, escape_text
+
+# Section of content/ whose pages make up the Atom feed
+FEED_SECTION = "blog"
+
+# Number of posts in the feed
+FEED_LIMIT = 20
+
+date_only_regex = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+class XMLWriter:
+    def __init__(self, stream):
+        """
+        Writes XML to stream as it is produced, so memory use does not
+        grow with the size of the document.
+
+        :param stream: Binary file to write UTF-8 encoded XML to
+        :type stream: file, required
+        """
+
+        self.stream = stream
+        self.open_tags = []
+        self.stream.write(b'<?xml version="1.0" encoding="utf-8"?>\n')
+
+    def write(self, text):
+        self.stream.write(text.encode())
+
+    def start_tag(self, tag, attributes=None):
+        """
+        :returns: Markup opening tag, with attributes escaped
+        :rtype: str
+        """
+
+        attribute_text = "".join(
+            f' {name}="{escape_attribute(str(value))}"'
+            for name, value in (attributes or {}).items()
+        )
+        return f"<{tag}{attribute_text}"
+
+    def start(self, tag, attributes=None):
+        """
+        Open an element; close it with end().
+        """
+
+        self.write("  " * len(self.open_tags) + self.start_tag(tag, attributes) + ">\n")
+        self.open_tags.append(tag)
+
+    def end(self):
+        """
+        Close the most recently opened element.
+        """
+
+        tag = self.open_tags.pop()
+        self.write("  " * len(self.open_tags) + f"</{tag}>\n")
+
+    def element(self, tag, text=None, attributes=None):
+        """
+        Write a complete element, with text escaped.
+        """
+
+        indent = "  " * len(self.open_tags)
+        start_tag = self.start_tag(tag, attributes)
+        if text is None:
+            self.write(f"{indent}{start_tag}/>\n")
+        else:
+            self.write(f"{indent}{start_tag}>{escape_text(str(text))}</{tag}>\n")
+
+def absolute_url(site_url, basepath, url):
+    """
+    :param site_url: Scheme and host, eg. "https://example.com"
+    :type site_url: str, required
+
+    :param basepath: URL prefix the site is served under
+    :type basepath: str, required
+
+    :param url: Site URL of a page, eg. "/blog/tom/index.html"
+    :type url: str, required
+
+    :returns: The page's absolute URL, with "index.html" dropped
+    :rtype: str
+    """
+
+    if url.endswith("/index.html"):
+        url = url[:-len("index.html")]
+    return site_url.rstrip("/") + basepath.rstrip("/") + url
+
+def absolutize_links(html, base_url):
+    """
+    Prefix root-relative href and src URLs in html with base_url, so
+    they work when the HTML is shown outside the site, eg. in a feed.
+
+    :param html: Rendered HTML
+    :type html: str, required
+
+    :param base_url: Site URL including the basepath, without a
+    trailing "/"
+    :type base_url: str, required
+
+    :returns: The HTML with absolute URLs
+    :rtype: str
+    """
+
+    html = html.replace('href="/', f'href="{base_url}/')
+    return html.replace('src="/', f'src="{base_url}/')
+
+def w3c_datetime(mtime_ns):
+    """
+    :returns: A file mtime in nanoseconds as a W3C/RFC 3339 UTC datetime
+    :rtype: str
+    """
+
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(mtime_ns / 1e9))
+
+def entry_updated(entry):
+    """
+    :param entry: A MetadataIndex entry
+    :type entry: dict, required
+
+    :returns: When the page was last updated: its front matter date if
+    it has one, otherwise the file's mtime
+    :rtype: str
+    """
+
+    date = entry.get("date")
+    if date:
+        date = str(date)
+        if date_only_regex.match(date):
+            return date + "T00:00:00Z"
+        return date
+    return w3c_datetime(entry["mtime"])
+
+class SitemapWriter:
+    def __init__(self, stream, site_url, basepath):
+        """
+        Streams a sitemap.xml; call add() for each page, then close().
+
+        :param stream: Binary file to write to
+        :type stream: file, required
+
+        :param site_url: Scheme and host, eg. "https://example.com"
+        :type site_url: str, required
+
+        :param basepath: URL prefix the site is served under
+        :type basepath: str, required
+        """
+
+        self.stream = stream
+        self.site_url = site_url
+        self.basepath = basepath
+        self.count = 0
+        self.xml = XMLWriter(stream)
+        self.xml.start(
+            "urlset", {"xmlns": "http://www.sitemaps.org/schemas/sitemap/0.9"}
+        )
+
+    def add(self, url, lastmod=None):
+        """
+        :param url: Site URL of the page
+        :type url: str, required
+
+        :param lastmod: W3C datetime the page last changed
+        :type lastmod: str, optional
+        """
+
+        self.xml.start("url")
+        self.xml.element("loc", absolute_url(self.site_url, self.basepath, url))
+        if lastmod:
+            self.xml.element("lastmod", lastmod)
+        self.xml.end()
+        self.count += 1
+
+    def close(self):
+        self.xml.end()
+        self.stream.close()
+
+def write_author(xml, name):
+    """
+    Write an Atom person element naming the author.
+    """
+
+    xml.start("author")
+    xml.element("name", name)
+    xml.end()
+
+def write_atom_feed(stream, site_url, basepath, section, posts, author=None):
+    """
+    Write an Atom feed of posts.
+
+    :param stream: Binary file to write to; closed when done
+    :type stream: file, required
+
+    :param site_url: Scheme and host, eg. "https://example.com"
+    :type site_url: str, required
+
+    :param basepath: URL prefix the site is served under
+    :type basepath: str, required
+
+    :param section: Directory of content/ the feed covers, eg. "blog"
+    :type section: str, required
+
+    :param posts: Dicts with url, title, updated and content_html,
+    newest first, and optionally author
+    :type posts: list[dict], required
+
+    :param author: Name of the site's author. Atom requires one, so the
+    site's host name is used when none is given.
+    :type author: str, optional
+    """
+
+    base_url = site_url.rstrip("/") + basepath.rstrip("/")
+    section_url = absolute_url(site_url, basepath, f"/{section}/index.html")
+    xml = XMLWriter(stream)
+    xml.start("feed", {"xmlns": "http://www.w3.org/2005/Atom"})
+    xml.element("title", section.title())
+    xml.element("id", section_url)
+    xml.element("link", attributes={"href": section_url})
+    xml.element("link", attributes={
+        "rel": "self", "href": section_url + "atom.xml",
+    })
+    updated = max((post["updated"] for post in posts), default=None)
+    xml.element("updated", updated or w3c_datetime(time.time_ns()))
+    write_author(xml, author or urlsplit(site_url).hostname or site_url)
+    for post in posts:
+        url = absolute_url(site_url, basepath, post["url"])
+        xml.start("entry")
+        xml.element("title", post["title"])
+        xml.element("id", url)
+        xml.element("link", attributes={"href": url})
+        xml.element("updated", post["updated"])
+        if post.get("author"):
+            write_author(xml, post["author"])
+        # Relative links in the content resolve against the post
+        xml.element(
+            "content", absolutize_links(post["content_html"], base_url),
+            {"type": "html", "xml:base": url}
+        )
+        xml.end()
+    xml.end()
+    stream.close()
+
+class SiteFeeds:
+    def __init__(self, backend, dest_tree_root, site_url, basepath,
+                 metadata_index, src_tree_root="content",
+                 section=FEED_SECTION, limit=FEED_LIMIT, author=None):
+        """
+        Produces sitemap.xml and an Atom feed from data the build
+        already has: sitemap entries are streamed out as pages are
+        recorded, dates come from the metadata index, and the feed's
+        posts are the content HTML of pages as they are rendered, kept
+        only for the newest posts.
+
+        :param backend: Backend the files are written through
+        :type backend: OutputBackend, required
+
+        :param dest_tree_root: Output directory, eg. "docs"
+        :type dest_tree_root: str, required
+
+        :param site_url: Scheme and host, eg. "https://example.com"
+        :type site_url: str, required
+
+        :param basepath: URL prefix the site is served under
+        :type basepath: str, required
+
+        :param metadata_index: Index of every page's metadata
+        :type metadata_index: MetadataIndex, required
+
+        :param src_tree_root: Content directory
+        :type src_tree_root: str, optional
+
+        :param section: Directory of src_tree_root the feed covers
+        :type section: str, optional
+
+        :param limit: Number of posts in the feed
+        :type limit: int, optional
+
+        :param author: Name of the site's author; a post's own author
+        comes from the author key of its front matter
+        :type author: str, optional
+        """
+
+        self.backend = backend
+        self.dest_tree_root = dest_tree_root
+        self.site_url = site_url
+        self.basepath = basepath
+        self.metadata_index = metadata_index
+        self.section = section
+        self.author = author
+        self.sitemap = SitemapWriter(
+            backend.open_binary(dest_tree_root + "/sitemap.xml"),
+            site_url, basepath
+        )
+
+        prefix = f"{src_tree_root}/{section}/"
+        posts = [
+            entry for entry in metadata_index.pages_by_date()
+            if entry["path"].startswith(prefix)
+        ]
+        posts.sort(key=entry_updated, reverse=True)
+        # src_path -> updated, for the posts that make the feed
+        self.feed_posts = {
+            entry["path"]: entry_updated(entry) for entry in posts[:limit]
+        }
+        # src_path -> post dict, filled in as pages are rendered
+        self.posts = {}
+
+    def add_page(self, result):
+        """
+        Record a rendered page.
+
+        :param result: A rendered page
+        :type result: PageResult, required
+        """
+
+        if result.html is None:
+            return
+        entry = self.metadata_index.get(result.src_path)
+        if entry is not None and entry["draft"]:
+            return
+        lastmod = w3c_datetime(entry["mtime"]) if entry else None
+        self.sitemap.add(result.url, lastmod)
+        if result.src_path in self.feed_posts:
+            self.posts[result.src_path] = {
+                "url": result.url,
+                "title": result.title,
+                "updated": self.feed_posts[result.src_path],
+                "content_html": result.content_html,
+                "author": entry.get("author") if entry else None,
+            }
+
+    def close(self):
+        """
+        Finish sitemap.xml and write the feed.
+        """
+
+        self.sitemap.close()
+        posts = sorted(
+            self.posts.values(), key=lambda post: post["updated"], reverse=True
+        )
+        stream = self.backend.open_binary(
+            f"{self.dest_tree_root}/{self.section}/atom.xml"
+        )
+        write_atom_feed(
+            stream, self.site_url, self.basepath, self.section, posts,
+            self.author
+        )
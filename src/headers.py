@@ -0,0 +1,185 @@
+import json, re
+
+from budgets import stylesheet_regex
+from images import srcset, variant_name
+
+# Header settings read from the directory the site is built in
+HEADERS_FILE = "headers.json"
+
+# File written to the root of each target, in the format Netlify and
+# Cloudflare Pages read
+HEADERS_NAME = "_headers"
+
+# Assets are only cached long and immutable by default when their name is
+# fingerprinted: static/ is copied with its file names unchanged, so an
+# edited /index.css keeps its URL and an immutable copy would go stale.
+# A directory whose files are never edited in place can be given the
+# long policy in "assets".
+DEFAULT_HEADERS = {
+    # Cache-Control of pages and other HTML
+    "html": "public, max-age=300",
+    # Directory -> Cache-Control of the assets under it; the longest
+    # matching directory wins
+    "assets": {"/": "public, max-age=3600"},
+    # Cache-Control of fingerprinted assets, whose file name carries a
+    # hash of their content and so changes whenever they do
+    "fingerprinted": "public, max-age=31536000, immutable",
+    # Number of each page's first images to preload
+    "preload_images": 1,
+}
+
+# A content hash of at least 8 hex digits just before the extension,
+# eg. "app.3f2a9c1e.css" or "logo-3f2a9c1e8b.png"
+fingerprint_regex = re.compile(r"[.-][0-9a-f]{8,}\.[^./]+$")
+
+def load_headers(headers_path=HEADERS_FILE):
+    """
+    Read the header settings. The file is a JSON object overriding any
+    of DEFAULT_HEADERS, eg. to cache everything under /fonts/ for a
+    year:
+    {"assets": {"/": "public, max-age=3600", "/fonts/": "public, max-age=31536000, immutable"}}
+
+    :param headers_path: Path to the settings file
+    :type headers_path: str, optional
+
+    :returns: The settings, with defaults for anything not given
+    :rtype: dict
+
+    :raises ValueError: If the file is not valid
+    """
+
+    config = dict(DEFAULT_HEADERS)
+    try:
+        with open(headers_path) as headers_file:
+            overrides = json.load(headers_file)
+    except FileNotFoundError:
+        return config
+    if not isinstance(overrides, dict):
+        raise ValueError(f"{headers_path}: expected a JSON object")
+    for key in overrides:
+        if key not in DEFAULT_HEADERS:
+            raise ValueError(f"{headers_path}: unknown setting {key}")
+    config.update(overrides)
+    for key in ("html", "fingerprinted"):
+        if not isinstance(config[key], str):
+            raise ValueError(f"{headers_path}: {key} must be a string")
+    if not isinstance(config["assets"], dict) or not all(
+        isinstance(value, str) for value in config["assets"].values()
+    ):
+        raise ValueError(f"{headers_path}: assets must map directories to strings")
+    if not isinstance(config["preload_images"], int):
+        raise ValueError(f"{headers_path}: preload_images must be a number")
+    return config
+
+def asset_cache_control(url, assets):
+    """
+    :param url: Site URL of an asset, eg. "/images/tom.png"
+    :type url: str, required
+
+    :param assets: Directory -> Cache-Control, see DEFAULT_HEADERS
+    :type assets: dict{str: str}, required
+
+    :returns: The Cache-Control of the longest directory holding url, or
+    None if no directory does
+    :rtype: str
+    """
+
+    best = None
+    best_length = -1
+    for directory, cache_control in assets.items():
+        prefix = "/" + directory.strip("/") + "/" if directory.strip("/") else "/"
+        if url.startswith(prefix) and len(prefix) > best_length:
+            best = cache_control
+            best_length = len(prefix)
+    return best
+
+def page_paths(url):
+    """
+    :returns: The request paths url is served at, eg. "/blog/" and
+    "/blog/index.html" for "/blog/index.html"
+    :rtype: list[str]
+    """
+
+    if url.endswith("/index.html"):
+        return [url[:-len("index.html")], url]
+    return [url]
+
+def build_headers(link_graph, template_text, config, basepath="",
+                  image_variants=None):
+    """
+    Make a _headers file in one pass over a finished build's link graph:
+    a short Cache-Control for each page, with Link preloads for the
+    template's stylesheets and the page's first images, and one for
+    each asset: long and immutable only if its name is fingerprinted.
+
+    :param link_graph: Pages and assets of the whole site
+    :type link_graph: LinkGraph, required
+
+    :param template_text: Text of template.html, searched for stylesheets
+    :type template_text: str, required
+
+    :param config: Settings from load_headers()
+    :type config: dict, required
+
+    :param basepath: URL prefix the site is served under
+    :type basepath: str, optional
+
+    :param image_variants: Images with width variants, see
+    copy_static_tree(); their variants are listed as assets and
+    preloaded with imagesrcset
+    :type image_variants: dict, optional
+
+    :returns: The file's text
+    :rtype: str
+    """
+
+    image_variants = image_variants or {}
+    stylesheet_links = [
+        f"<{basepath}{url}>; rel=preload; as=style"
+        for url in stylesheet_regex.findall(template_text)
+        if url.startswith("/")
+    ]
+    lines = []
+
+    def add_rule(path, headers):
+        lines.append(basepath + path)
+        lines.extend("  " + header for header in headers)
+
+    for page in sorted(link_graph.pages):
+        links = list(stylesheet_links)
+        images = []
+        for tag, reference in link_graph.pages[page]:
+            if len(images) >= config["preload_images"]:
+                break
+            if tag != "img":
+                continue
+            url = link_graph.resolve(page, reference)[0]
+            if not url or url in images:
+                continue
+            images.append(url)
+            link = f"<{basepath}{url}>; rel=preload; as=image"
+            candidates = srcset(url, image_variants)
+            if candidates:
+                candidates = ", ".join(
+                    basepath + candidate for candidate in candidates.split(", ")
+                )
+                link += f'; imagesrcset="{candidates}"'
+            links.append(link)
+        headers = [f"Cache-Control: {config['html']}"]
+        headers.extend(f"Link: {link}" for link in links)
+        for path in page_paths(page):
+            add_rule(path, headers)
+
+    assets = set(link_graph.assets)
+    for url, (width, variant_widths) in image_variants.items():
+        assets.update(variant_name(url, variant_width) for variant_width in variant_widths)
+    for url in sorted(assets - set(link_graph.pages)):
+        if url.endswith((".html", ".htm")):
+            cache_control = config["html"]
+        elif fingerprint_regex.search(url):
+            cache_control = config["fingerprinted"]
+        else:
+            cache_control = asset_cache_control(url, config["assets"])
+        if cache_control:
+            add_rule(url, [f"Cache-Control: {cache_control}"])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,250 @@
+import hashlib, os, re
+
+from htmlnode import escape_text
+
+# Bump when lexer output changes so stale cache entries are not reused
+HIGHLIGHT_VERSION = 1
+
+def keywords(words):
+    """
+    :returns: A regex matching any of words as a whole word
+    :rtype: str
+    """
+
+    return r"\b(?:" + "|".join(words.split()) + r")\b"
+
+def build_lexer(rules):
+    """
+    Combine (token_class, regex) rules into one compiled regex. Each rule
+    becomes a named group, so a single finditer() pass tokenizes the
+    whole snippet; earlier rules win.
+
+    :param rules: List of (token_class, regex) tuples
+    :type rules: list[(str, str)], required
+
+    :returns: The compiled regex and a map of group name to token class
+    :rtype: (re.Pattern, dict{str: str})
+    """
+
+    groups = {}
+    patterns = []
+    for i, (token_class, regex) in enumerate(rules):
+        group = f"g{i}"
+        groups[group] = token_class
+        patterns.append(f"(?P<{group}>{regex})")
+    return re.compile("|".join(patterns), re.MULTILINE), groups
+
+_string_rules = [
+    ("s", r'"(?:[^"\\\n]|\\.)*"'),
+    ("s", r"'(?:[^'\\\n]|\\.)*'"),
+]
+_number_rule = ("m", r"\b(?:0[xXoObB][0-9a-fA-F_]+|\d[\d_]*\.?\d*(?:[eE][+-]?\d+)?)\b")
+
+LEXERS = {
+    "python": build_lexer([
+        ("c", r"#.*$"),
+        ("s", r'[rRbBfFuU]{0,2}"""[\s\S]*?"""'),
+        ("s", r"[rRbBfFuU]{0,2}'''[\s\S]*?'''"),
+        ("s", r'[rRbBfFuU]{0,2}"(?:[^"\\\n]|\\.)*"'),
+        ("s", r"[rRbBfFuU]{0,2}'(?:[^'\\\n]|\\.)*'"),
+        ("d", r"^\s*@[\w.]+"),
+        ("k", keywords(
+            "and as assert async await break class continue def del elif "
+            "else except finally for from global if import in is lambda "
+            "nonlocal not or pass raise return try while with yield match "
+            "case None True False"
+        )),
+        ("nb", keywords(
+            "print len range open str int float list dict set tuple bool "
+            "isinstance super enumerate zip map filter sorted min max sum "
+            "type object Exception"
+        )),
+        _number_rule,
+    ]),
+    "javascript": build_lexer([
+        ("c", r"//.*$"),
+        ("c", r"/\*[\s\S]*?\*/"),
+        ("s", r"`(?:[^`\\]|\\.)*`"),
+        *_string_rules,
+        ("k", keywords(
+            "async await break case catch class const continue debugger "
+            "default delete do else export extends finally for function if "
+            "import in instanceof let new of return static super switch "
+            "this throw try typeof var void while yield null undefined true "
+            "false"
+        )),
+        ("nb", keywords("console document window Math JSON Promise Array Object")),
+        _number_rule,
+    ]),
+    "shell": build_lexer([
+        ("c", r"(?<![\w$])#.*$"),
+        *_string_rules,
+        ("v", r"\$\{[^}\n]*\}|\$\w+|\$[@*#?$!0-9]"),
+        ("k", keywords(
+            "if then else elif fi for while until do done case esac in "
+            "function return local export"
+        )),
+        ("nb", keywords("echo cd ls cat grep sed awk python3 pip git sudo")),
+    ]),
+    "json": build_lexer([
+        ("p", r'"(?:[^"\\\n]|\\.)*"(?=\s*:)'),
+        _string_rules[0],
+        ("k", keywords("true false null")),
+        ("m", r"-?\b\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b"),
+    ]),
+}
+
+# Info strings accepted for each lexer
+LANGUAGE_ALIASES = {
+    "py": "python",
+    "python3": "python",
+    "js": "javascript",
+    "mjs": "javascript",
+    "sh": "shell",
+    "bash": "shell",
+    "zsh": "shell",
+    "console": "shell",
+}
+
+def normalize_language(info_string):
+    """
+    Map a fence info string (eg. "py", "Python title=x") to a lexer name.
+
+    :param info_string: Text after the opening ``` of a code block
+    :type info_string: str, required
+
+    :returns: A key of LEXERS, or None if no lexer handles the language
+    :rtype: str
+    """
+
+    words = info_string.split()
+    if not words:
+        return None
+    language = words[0].lower()
+    language = LANGUAGE_ALIASES.get(language, language)
+    if language in LEXERS:
+        return language
+    return None
+
+def tokenize(code, language):
+    """
+    Render code as escaped HTML with <span class="..."> around tokens.
+
+    :param code: Source code
+    :type code: str, required
+
+    :param language: A key of LEXERS
+    :type language: str, required
+
+    :returns: HTML for the highlighted code
+    :rtype: str
+    """
+
+    regex, groups = LEXERS[language]
+    parts = []
+    position = 0
+    for _match in regex.finditer(code):
+        start, end = _match.span()
+        if start == end:
+            continue
+        if start > position:
+            parts.append(escape_text(code[position:start]))
+        token_class = groups[_match.lastgroup]
+        parts.append(
+            f'<span class="{token_class}">{escape_text(_match.group())}</span>'
+        )
+        position = end
+    parts.append(escape_text(code[position:]))
+    return "".join(parts)
+
+class HighlightCache:
+    def __init__(self, cache_dir=None):
+        """
+        Memo of highlighted snippets keyed by (language, code hash). With
+        cache_dir, entries are also stored on disk, one file per snippet,
+        so each unique snippet is tokenized once per site rather than
+        once per page or per build.
+
+        :param cache_dir: Directory to persist entries in
+        :type cache_dir: str, optional
+        """
+
+        self.cache_dir = cache_dir
+        self.memory = {}
+        self.hits = 0
+        self.misses = 0
+
+    def highlight(self, code, language):
+        """
+        :param code: Source code
+        :type code: str, required
+
+        :param language: A key of LEXERS
+        :type language: str, required
+
+        :returns: HTML for the highlighted code
+        :rtype: str
+        """
+
+        digest = hashlib.sha256(code.encode()).hexdigest()
+        key = f"{language}-{HIGHLIGHT_VERSION}-{digest}"
+        html = self.memory.get(key)
+        if html is not None:
+            self.hits += 1
+            return html
+
+        cache_path = None
+        if self.cache_dir:
+            cache_path = os.path.join(self.cache_dir, key + ".html")
+            try:
+                with open(cache_path) as cache_file:
+                    html = cache_file.read()
+            except OSError:
+                pass
+        if html is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            html = tokenize(code, language)
+            if cache_path:
+                self.store(cache_path, html)
+        self.memory[key] = html
+        return html
+
+    def store(self, cache_path, html):
+        """
+        Write an entry, via a temporary file so concurrent builds never
+        read a partial entry.
+        """
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as tmp_file:
+            tmp_file.write(html)
+        os.replace(tmp_path, cache_path)
+
+def highlight(code, info_string, cache=None):
+    """
+    Highlight code for the language named by a fence info string.
+
+    :param code: Source code
+    :type code: str, required
+
+    :param info_string: Text after the opening ``` of a code block
+    :type info_string: str, required
+
+    :param cache: Cache to look the result up in and store it to;
+    without one, code is tokenized every time
+    :type cache: HighlightCache, optional
+
+    :returns: HTML for the highlighted code, or None if the language is
+    not supported
+    :rtype: str
+    """
+
+    language = normalize_language(info_string)
+    if language is None:
+        return None
+    if cache is None:
+        return tokenize(code, language)
+    return cache.highlight(code, language)
@@ -1,3 +1,50 @@
+# Elements that never have a closing tag
+VOID_TAGS = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "source", "track", "wbr",
+})
+
+def escape_text(text):
+    """
+    Escape a string for use as HTML text content.
+
+    :param text: Text to escape
+    :type text: str, required
+
+    :returns: text with "&", "<" and ">" replaced by character references
+    :rtype: str
+    """
+
+    # Fast path: most text contains nothing to escape. Otherwise chained
+    # str.replace() calls are several times faster than str.translate()
+    # with multi-character replacements. "&" goes first so the
+    # references added after it are not escaped again.
+    if "&" not in text and "<" not in text and ">" not in text:
+        return text
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def escape_attribute(value):
+    """
+    Escape a string for use as a double-quoted HTML attribute value.
+
+    :param value: Attribute value to escape
+    :type value: str, required
+
+    :returns: value with "&", "<", ">" and '"' replaced by character references
+    :rtype: str
+    """
+
+    # Fast path: most attribute values contain nothing to escape
+    if (
+        "&" not in value and "<" not in value and
+        ">" not in value and '"' not in value
+    ):
+        return value
+    return (
+        value.replace("&", "&amp;").replace("<", "&lt;")
+        .replace(">", "&gt;").replace('"', "&quot;")
+    )
+
 class HTMLNode:
     def __init__(self, tag=None, value=None, children=None, props=None):
         """
@@ -49,6 +96,7 @@ class HTMLNode:
             for i in range(0, len(item_list)):
                 item = item_list[i]
                 attribute, value = item
+                value = escape_attribute(str(value))
                 if i == len(self.props.items())-1:
                     # last item in list; no space after item
                     item_string = f'{attribute}="{value}"'
@@ -102,19 +150,27 @@ class LeafNode(HTMLNode):
 
     def to_html(self):
         """
-        Convert node to HTML code.
+        Convert node to HTML code. The value is escaped as text and
+        prop values are escaped as attributes.
 
         :returns: A string representing the node in HTML
         :rtype: str
         """
 
+        value = escape_text(self.value)
         if not self.tag:
-            html_string = self.value
+            html_string = value
+        elif self.tag in VOID_TAGS:
+            # Void elements have no content and no closing tag
+            if self.props:
+                html_string = f'<{self.tag} {self.props_to_html()}>'
+            else:
+                html_string = f'<{self.tag}>'
         elif self.props:
             props_string = self.props_to_html()
-            html_string = f'<{self.tag} {props_string}>{self.value}</{self.tag}>'
+            html_string = f'<{self.tag} {props_string}>{value}</{self.tag}>'
         else:
-            html_string = f'<{self.tag}>{self.value}</{self.tag}>'
+            html_string = f'<{self.tag}>{value}</{self.tag}>'
         return html_string
 
 class ParentNode(HTMLNode):
@@ -169,3 +225,23 @@ class ParentNode(HTMLNode):
                 html_string += child.to_html()
             html_string += f'</{self.tag}>'
         return html_string
+
+class RawNode(HTMLNode):
+    def __init__(self, value):
+        """
+        Represents markup that is inserted into the document as-is. The
+        creator is responsible for escaping any text within value.
+
+        :param value: HTML markup
+        :type value: str, required
+        """
+
+        super().__init__(None, value, None, None)
+
+    def to_html(self):
+        """
+        :returns: self.value, unescaped
+        :rtype: str
+        """
+
+        return self.value
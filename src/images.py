@@ -0,0 +1,496 @@
+import hashlib, io, json, os, struct, zlib
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    # Width variants need Pillow; without it images are only recompressed
+    Image = None
+
+# Errors from decoding an image that is broken, unsupported or too large
+if Image is not None:
+    DECODE_ERRORS = (OSError, ValueError, Image.DecompressionBombError)
+else:
+    DECODE_ERRORS = (OSError, ValueError)
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Files handled by the image stage; other static files are copied as-is
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+# Widths of the downscaled variants, in pixels
+IMAGE_WIDTHS = (480, 960, 1600)
+
+# Bump when the output of the image stage changes so cached images are
+# regenerated
+IMAGE_VERSION = 2
+
+# Chunks that affect how a PNG looks. The rest (text, EXIF, timestamps,
+# physical size, Apple's iDOT) are dropped.
+KEPT_PNG_CHUNKS = {
+    b"IHDR", b"PLTE", b"IDAT", b"IEND",
+    b"tRNS", b"gAMA", b"cHRM", b"sRGB", b"iCCP", b"sBIT",
+}
+
+# Animated PNGs are left untouched
+APNG_CHUNKS = {b"acTL", b"fcTL", b"fdAT"}
+
+# JPEG segments that don't affect how the image looks: APP1 (EXIF,
+# including GPS position, and XMP), APP13 (Photoshop and IPTC) and
+# comments. EXIF orientation is kept; see strip_jpeg_metadata().
+DROPPED_JPEG_MARKERS = {0xE1, 0xED, 0xFE}
+
+# EXIF tag of the orientation
+EXIF_ORIENTATION = 0x0112
+
+def read_png_chunks(data):
+    """
+    :param data: Contents of a PNG file
+    :type data: bytes, required
+
+    :returns: (chunk type, chunk data) tuples
+    :rtype: list[(bytes, bytes)]
+
+    :raises ValueError: If data is not a well-formed PNG
+    """
+
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("Not a PNG file")
+    chunks = []
+    position = len(PNG_SIGNATURE)
+    while position < len(data):
+        if position + 8 > len(data):
+            raise ValueError("Truncated PNG chunk header")
+        length, chunk_type = struct.unpack(">I4s", data[position:position + 8])
+        end = position + 12 + length
+        if end > len(data):
+            raise ValueError("Truncated PNG chunk")
+        chunks.append((chunk_type, data[position + 8:end - 4]))
+        position = end
+        if chunk_type == b"IEND":
+            break
+    if not chunks or chunks[0][0] != b"IHDR" or chunks[-1][0] != b"IEND":
+        raise ValueError("PNG is missing IHDR or IEND")
+    return chunks
+
+def write_png_chunks(chunks):
+    """
+    :param chunks: (chunk type, chunk data) tuples
+    :type chunks: list[(bytes, bytes)], required
+
+    :returns: A PNG file
+    :rtype: bytes
+    """
+
+    parts = [PNG_SIGNATURE]
+    for chunk_type, chunk_data in chunks:
+        parts.append(struct.pack(">I", len(chunk_data)))
+        parts.append(chunk_type)
+        parts.append(chunk_data)
+        crc = zlib.crc32(chunk_data, zlib.crc32(chunk_type))
+        parts.append(struct.pack(">I", crc))
+    return b"".join(parts)
+
+def png_width(data):
+    """
+    :returns: Width in pixels of a PNG file
+    :rtype: int
+
+    :raises ValueError: If data is not a PNG
+    """
+
+    if not data.startswith(PNG_SIGNATURE) or data[12:16] != b"IHDR":
+        raise ValueError("Not a PNG file")
+    return struct.unpack(">I", data[16:20])[0]
+
+def optimize_png(data):
+    """
+    Losslessly shrink a PNG: drop chunks that do not affect how it
+    looks, and recompress the image data at the highest zlib level.
+    The pixel data is not touched.
+
+    :param data: Contents of a PNG file
+    :type data: bytes, required
+
+    :returns: The smaller PNG, or data if nothing was gained
+    :rtype: bytes
+
+    :raises ValueError: If data is not a well-formed PNG
+    """
+
+    chunks = read_png_chunks(data)
+    if any(chunk_type in APNG_CHUNKS for chunk_type, _ in chunks):
+        return data
+
+    image_data = b"".join(
+        chunk_data for chunk_type, chunk_data in chunks if chunk_type == b"IDAT"
+    )
+    compressed = zlib.compress(zlib.decompress(image_data), 9)
+    if len(compressed) >= len(image_data):
+        compressed = image_data
+
+    kept = []
+    for chunk_type, chunk_data in chunks:
+        if chunk_type == b"IDAT":
+            # All IDAT chunks are consecutive; replace them with one
+            if compressed is not None:
+                kept.append((b"IDAT", compressed))
+                compressed = None
+        elif chunk_type in KEPT_PNG_CHUNKS:
+            kept.append((chunk_type, chunk_data))
+    optimized = write_png_chunks(kept)
+    if len(optimized) >= len(data):
+        return data
+    return optimized
+
+def exif_orientation(tiff):
+    """
+    :param tiff: EXIF data after its "Exif" identifier
+    :type tiff: bytes, required
+
+    :returns: The orientation tag of the first IFD, or None if there is
+    none or the data is malformed
+    :rtype: int
+    """
+
+    byte_order = {b"II": "<", b"MM": ">"}.get(tiff[:2])
+    if byte_order is None:
+        return None
+    try:
+        ifd_offset = struct.unpack(byte_order + "I", tiff[4:8])[0]
+        count = struct.unpack(byte_order + "H", tiff[ifd_offset:ifd_offset + 2])[0]
+        for i in range(count):
+            entry = ifd_offset + 2 + 12 * i
+            tag = struct.unpack(byte_order + "H", tiff[entry:entry + 2])[0]
+            if tag == EXIF_ORIENTATION:
+                return struct.unpack(byte_order + "H", tiff[entry + 8:entry + 10])[0]
+    except struct.error:
+        return None
+    return None
+
+def orientation_segment(orientation):
+    """
+    :returns: An APP1 segment holding an EXIF block with only the
+    orientation tag
+    :rtype: bytes
+    """
+
+    tiff = (
+        b"MM\x00\x2a" + struct.pack(">IH", 8, 1) +
+        struct.pack(">HHIHH", EXIF_ORIENTATION, 3, 1, orientation, 0) +
+        struct.pack(">I", 0)
+    )
+    payload = b"Exif\x00\x00" + tiff
+    return b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload
+
+def strip_jpeg_metadata(data):
+    """
+    Losslessly drop the metadata segments of a JPEG, see
+    DROPPED_JPEG_MARKERS. The compressed image data is not touched. A
+    rotated photo keeps an EXIF block with just its orientation, so it
+    is still displayed upright.
+
+    :param data: Contents of a JPEG file
+    :type data: bytes, required
+
+    :returns: The JPEG without metadata, or data if it had none
+    :rtype: bytes
+
+    :raises ValueError: If data is not a well-formed JPEG
+    """
+
+    if not data.startswith(b"\xff\xd8"):
+        raise ValueError("Not a JPEG file")
+    parts = [data[:2]]
+    position = 2
+    orientation = None
+    exif_index = None
+    while True:
+        if position + 2 > len(data) or data[position] != 0xFF:
+            raise ValueError("Invalid JPEG segment")
+        marker = data[position + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            position += 1
+            continue
+        if marker in (0xDA, 0xD9):
+            # Start of scan or end of image: the rest is image data
+            parts.append(data[position:])
+            break
+        if position + 4 > len(data):
+            raise ValueError("Truncated JPEG segment header")
+        length = struct.unpack(">H", data[position + 2:position + 4])[0]
+        end = position + 2 + length
+        if length < 2 or end > len(data):
+            raise ValueError("Truncated JPEG segment")
+        segment = data[position:end]
+        if marker == 0xE1 and segment[4:10] == b"Exif\x00\x00":
+            orientation = exif_orientation(segment[10:])
+            exif_index = len(parts)
+        if marker not in DROPPED_JPEG_MARKERS:
+            parts.append(segment)
+        position = end
+    if orientation not in (None, 1):
+        parts.insert(exif_index, orientation_segment(orientation))
+    stripped = b"".join(parts)
+    if len(stripped) >= len(data):
+        return data
+    return stripped
+
+def resize_variants(src_path, widths):
+    """
+    Downscale an image to each of widths narrower than it, keeping its
+    aspect ratio and colour profile but no other metadata. Pixels are
+    turned upright first, since the variants have no EXIF orientation.
+
+    :param src_path: Image file
+    :type src_path: str, required
+
+    :param widths: Widths in pixels
+    :type widths: list[int], required
+
+    :returns: Map of width to encoded image, and the image's width as
+    displayed; no variants without Pillow
+    :rtype: (dict{int: bytes}, int)
+
+    :raises OSError: If the image can't be read
+    :raises ValueError: If the image is malformed
+    :raises Image.DecompressionBombError: If the image is too large to
+    decode safely
+    """
+
+    if Image is None:
+        return {}, None
+    variants = {}
+    with Image.open(src_path) as source:
+        image_format = source.format
+        icc_profile = source.info.get("icc_profile")
+        image = ImageOps.exif_transpose(source)
+        width, height = image.size
+        for variant_width in widths:
+            if variant_width >= width:
+                continue
+            variant_height = max(1, round(height * variant_width / width))
+            variant = image.resize(
+                (variant_width, variant_height), Image.Resampling.LANCZOS
+            )
+            buffer = io.BytesIO()
+            save_args = {"optimize": True}
+            if icc_profile:
+                save_args["icc_profile"] = icc_profile
+            if image_format == "JPEG":
+                save_args["quality"] = 85
+            variant.save(buffer, image_format, **save_args)
+            variants[variant_width] = buffer.getvalue()
+    return variants, width
+
+def variant_name(path, width):
+    """
+    :returns: Path of a width variant of path, eg. "images/tom-480w.png"
+    :rtype: str
+    """
+
+    stem, ext = os.path.splitext(path)
+    return f"{stem}-{width}w{ext}"
+
+class ProcessedImage:
+    def __init__(self, data, width=None, variants=None):
+        """
+        Output of the image stage.
+
+        :param data: The optimized image
+        :type data: bytes, required
+
+        :param width: Width in pixels, if known
+        :type width: int, optional
+
+        :param variants: Map of width to downscaled image
+        :type variants: dict{int: bytes}, optional
+        """
+
+        self.data = data
+        self.width = width
+        self.variants = variants or {}
+
+class ImageCache:
+    def __init__(self, cache_dir=None, widths=IMAGE_WIDTHS):
+        """
+        Runs the image stage and keeps its output keyed by the hash of
+        the source image and the settings, so each image is only
+        processed again when it changes.
+
+        :param cache_dir: Directory to persist processed images in
+        :type cache_dir: str, optional
+
+        :param widths: Widths of the variants to generate
+        :type widths: list[int], optional
+        """
+
+        self.cache_dir = cache_dir
+        self.widths = tuple(widths)
+        self.hits = 0
+        self.misses = 0
+
+    def settings_key(self):
+        """
+        :returns: The settings that affect the stage's output
+        :rtype: str
+        """
+
+        return json.dumps({
+            "version": IMAGE_VERSION,
+            "widths": self.widths if Image is not None else [],
+        })
+
+    def plan(self, src_path):
+        """
+        Find the variants process() makes of an image without decoding
+        it: from the cache, or else from the image's header. Pages can
+        then render, with srcset, while the image is being processed.
+
+        :param src_path: Image file
+        :type src_path: str, required
+
+        :returns: The image's width as displayed, and the widths of its
+        variants; no variants without Pillow or if the header can't be
+        read
+        :rtype: (int, list[int])
+        """
+
+        if Image is None:
+            return None, []
+        with open(src_path, "rb") as src_file:
+            data = src_file.read()
+        digest = hashlib.sha256(data)
+        digest.update(self.settings_key().encode())
+        if self.cache_dir:
+            meta_path = os.path.join(self.cache_dir, digest.hexdigest() + ".json")
+            try:
+                with open(meta_path) as meta_file:
+                    meta = json.load(meta_file)
+                return meta["width"], meta["variants"]
+            except (OSError, ValueError, KeyError):
+                pass
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                width, height = image.size
+                # Rotated a quarter turn, see ImageOps.exif_transpose()
+                if image.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8):
+                    width = height
+        except DECODE_ERRORS:
+            return None, []
+        return width, [
+            variant_width for variant_width in self.widths if variant_width < width
+        ]
+
+    def process(self, src_path):
+        """
+        :param src_path: Image file
+        :type src_path: str, required
+
+        :returns: The optimized image and its variants
+        :rtype: ProcessedImage
+        """
+
+        with open(src_path, "rb") as src_file:
+            data = src_file.read()
+        digest = hashlib.sha256(data)
+        digest.update(self.settings_key().encode())
+        ext = os.path.splitext(src_path)[1].lower()
+        key = digest.hexdigest()
+
+        processed = self.load(key, ext)
+        if processed is not None:
+            self.hits += 1
+            return processed
+        self.misses += 1
+
+        width = None
+        if ext == ".png":
+            try:
+                width = png_width(data)
+                data = optimize_png(data)
+            except (ValueError, zlib.error):
+                # Not a valid PNG; ship it as it is
+                pass
+        else:
+            try:
+                data = strip_jpeg_metadata(data)
+            except ValueError:
+                # Not a valid JPEG; ship it as it is
+                pass
+        try:
+            variants, variant_source_width = resize_variants(src_path, self.widths)
+        except DECODE_ERRORS:
+            variants, variant_source_width = {}, None
+        processed = ProcessedImage(data, width or variant_source_width, variants)
+        self.store(key, ext, processed)
+        return processed
+
+    def load(self, key, ext):
+        """
+        :returns: The cached output for key, or None
+        :rtype: ProcessedImage
+        """
+
+        if not self.cache_dir:
+            return None
+        base_path = os.path.join(self.cache_dir, key)
+        try:
+            with open(base_path + ".json") as meta_file:
+                meta = json.load(meta_file)
+            with open(base_path + ext, "rb") as image_file:
+                data = image_file.read()
+            variants = {}
+            for width in meta["variants"]:
+                with open(variant_name(base_path + ext, width), "rb") as image_file:
+                    variants[width] = image_file.read()
+        except (OSError, ValueError, KeyError):
+            return None
+        return ProcessedImage(data, meta.get("width"), variants)
+
+    def store(self, key, ext, processed):
+        """
+        Write processed to the cache. The .json file is written last, so
+        an entry is only used once all of its images are in place.
+        """
+
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        base_path = os.path.join(self.cache_dir, key)
+        self.write_atomic(base_path + ext, processed.data)
+        for width, variant_data in processed.variants.items():
+            self.write_atomic(variant_name(base_path + ext, width), variant_data)
+        meta = {"width": processed.width, "variants": sorted(processed.variants)}
+        self.write_atomic(base_path + ".json", json.dumps(meta).encode())
+
+    def write_atomic(self, path, data):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+
+def srcset(url, variants=None):
+    """
+    :param url: src of an image, eg. "/images/tom.png"
+    :type url: str, required
+
+    :param variants: Site URL of each image with variants -> (width,
+    variant widths); none have variants if it is not given
+    :type variants: dict{str: (int, list[int])}, optional
+
+    :returns: A srcset listing url's variants and url itself, or None
+    if it has no variants
+    :rtype: str
+    """
+
+    if not variants:
+        return None
+    entry = variants.get(url)
+    if not entry or not entry[1]:
+        return None
+    width, variant_widths = entry
+    candidates = [f"{variant_name(url, w)} {w}w" for w in variant_widths]
+    if width:
+        candidates.append(f"{url} {width}w")
+    return ", ".join(candidates)
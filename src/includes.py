@@ -0,0 +1,288 @@
+import copy, json, os, posixpath, threading
+
+from blocknode import HEADING_TAGS, markdown_to_html_node, node_text
+from htmlnode import RawNode
+
+# Directory of the snippets pages include with {{ include NAME }}
+INCLUDE_DIR = "includes"
+
+class IncludeNode(RawNode):
+    def __init__(self, html, children, child_html=None):
+        """
+        A rendered snippet. Its HTML is rendered once and inserted as-is;
+        its nodes are kept as children so the links and images in it are
+        still found by collect_references() and page_stats().
+
+        :param html: The snippet's HTML
+        :type html: str, required
+
+        :param children: The snippet's block nodes
+        :type children: list[HTMLNode], required
+
+        :param child_html: HTML of each of children; html is made of them
+        :type child_html: list[str], optional
+        """
+
+        super().__init__(html)
+        self.children = children
+        self.child_html = child_html or [child.to_html() for child in children]
+        self.has_headings = any(
+            child.tag in HEADING_TAGS
+            or isinstance(child, IncludeNode) and child.has_headings
+            for child in children
+        )
+
+    def with_outline(self, outline):
+        """
+        Add the snippet's headings to the outline of the page including
+        it, so they get ids and are listed in its table of contents.
+
+        :param outline: The page's outline
+        :type outline: Outline, required
+
+        :returns: The snippet with ids on its headings. Cached nodes are
+        shared by every page, so this is a copy if it has headings; only
+        the headings are rendered again.
+        :rtype: IncludeNode
+        """
+
+        if not self.has_headings:
+            return self
+        children = []
+        child_html = []
+        for child, html in zip(self.children, self.child_html):
+            if isinstance(child, IncludeNode):
+                child = child.with_outline(outline)
+                html = child.to_html()
+            elif child.tag in HEADING_TAGS:
+                heading_id = outline.add(
+                    int(child.tag[1]), node_text(child).strip()
+                )
+                child = copy.copy(child)
+                child.props = dict(child.props or {}, id=heading_id)
+                html = child.to_html()
+            children.append(child)
+            child_html.append(html)
+        return IncludeNode("".join(child_html), children, child_html)
+
+class IncludeResolver:
+    def __init__(self, root=INCLUDE_DIR, registry=None):
+        """
+        Renders the snippets under root. Each is parsed and rendered
+        once and cached until it, or a snippet it includes, changes.
+        Safe to share between threads.
+
+        :param root: Directory of snippets
+        :type root: str, optional
+
+        :param registry: Registry of the syntax snippets are rendered
+        with; defaults to the built-in syntax
+        :type registry: ExtensionRegistry, optional
+        """
+
+        self.root = root
+        self.registry = registry
+        # name -> (IncludeNode, {name: stat key} of it and its includes)
+        self.cache = {}
+        # Snippets being rendered, to catch one that includes itself
+        self.resolving = set()
+        self.lock = threading.RLock()
+        self.renders = 0
+
+    def stat_key(self, name):
+        """
+        :param name: Path of a snippet under root
+        :type name: str, required
+
+        :returns: (mtime_ns, size) of the snippet, or None if it does
+        not exist
+        :rtype: (int, int)
+        """
+
+        try:
+            stat = os.stat(self.root + "/" + name)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def resolve(self, name):
+        """
+        :param name: Path of a snippet under root, eg. "install.md"
+        :type name: str, required
+
+        :returns: The rendered snippet, and the stat key of it and each
+        snippet it includes
+        :rtype: (IncludeNode, dict{str: (int, int)})
+
+        :raises SyntaxError: If the snippet is missing, outside root,
+        includes itself or has invalid syntax
+        """
+
+        clean_name = posixpath.normpath(name)
+        if clean_name.startswith(("../", "/")) or clean_name == "..":
+            raise SyntaxError(f"Invalid include: {name} is outside {self.root}")
+        with self.lock:
+            cached = self.cache.get(clean_name)
+            if cached is not None and all(
+                self.stat_key(dep) == key for dep, key in cached[1].items()
+            ):
+                return cached
+            if clean_name in self.resolving:
+                raise SyntaxError(f"Invalid include: {name} includes itself")
+            key = self.stat_key(clean_name)
+            if key is None:
+                raise SyntaxError(f"Invalid include: {name} not found")
+            self.resolving.add(clean_name)
+            try:
+                with open(self.root + "/" + clean_name) as snippet_file:
+                    text = snippet_file.read()
+                page_includes = PageIncludes(self)
+                root_node = markdown_to_html_node(
+                    text, registry=self.registry, includes=page_includes
+                )
+            except SyntaxError as error:
+                raise SyntaxError(
+                    f"Invalid include: {name}: {error.msg}"
+                ) from error
+            finally:
+                self.resolving.discard(clean_name)
+            children = root_node.children or []
+            child_html = [child.to_html() for child in children]
+            node = IncludeNode("".join(child_html), children, child_html)
+            deps = dict(page_includes.used)
+            deps[clean_name] = key
+            self.renders += 1
+            self.cache[clean_name] = (node, deps)
+            return node, deps
+
+    def changed(self, used):
+        """
+        :param used: {name: stat key} recorded when a page was rendered,
+        see PageIncludes.used
+        :type used: dict, required
+
+        :returns: Whether any of the snippets changed since
+        :rtype: bool
+        """
+
+        return any(self.stat_key(name) != tuple(key) for name, key in used.items())
+
+class PageIncludes:
+    def __init__(self, resolver):
+        """
+        Resolves the includes of one page through resolver, recording
+        the snippets the page depends on; passed to
+        markdown_to_html_node().
+
+        :param resolver: Renders and caches the snippets
+        :type resolver: IncludeResolver, required
+        """
+
+        self.resolver = resolver
+        # name -> stat key of every snippet the page includes, directly
+        # or through another snippet
+        self.used = {}
+
+    def include(self, name, outline=None):
+        """
+        :param name: Path of a snippet under the resolver's root
+        :type name: str, required
+
+        :param outline: The page's outline, which the snippet's headings
+        are added to; see IncludeNode.with_outline()
+        :type outline: Outline, optional
+
+        :returns: The rendered snippet
+        :rtype: IncludeNode
+
+        :raises SyntaxError: See IncludeResolver.resolve()
+        """
+
+        node, deps = self.resolver.resolve(name)
+        self.used.update(deps)
+        if outline is not None:
+            node = node.with_outline(outline)
+        return node
+
+class IncludeIndex:
+    def __init__(self, path=None):
+        """
+        Reverse dependencies of the snippets: which pages include which,
+        so a changed snippet re-renders only the pages that use it.
+
+        :param path: JSON file to persist the index in
+        :type path: str, optional
+        """
+
+        self.path = path
+        # src_path of a page -> {name: stat key} of the snippets it uses
+        self.pages = {}
+
+    def add_page(self, src_path, used):
+        """
+        :param src_path: Path of the page's markdown file
+        :type src_path: str, required
+
+        :param used: The page's PageIncludes.used
+        :type used: dict, required
+        """
+
+        if used:
+            self.pages[src_path] = dict(used)
+        else:
+            self.pages.pop(src_path, None)
+
+    def dependents(self, names):
+        """
+        :param names: Snippet names
+        :type names: set[str], required
+
+        :returns: Paths of the pages including any of names
+        :rtype: set[str]
+        """
+
+        return {
+            src_path for src_path, used in self.pages.items()
+            if not names.isdisjoint(used)
+        }
+
+    def stale(self, resolver):
+        """
+        :param resolver: Reads the snippets as they are now
+        :type resolver: IncludeResolver, required
+
+        :returns: Paths of the pages including a snippet that changed
+        since they were rendered
+        :rtype: set[str]
+        """
+
+        return {
+            src_path for src_path, used in self.pages.items()
+            if resolver.changed(used)
+        }
+
+    def snippets(self):
+        """
+        :returns: Names of every snippet some page includes
+        :rtype: set[str]
+        """
+
+        names = set()
+        for used in self.pages.values():
+            names.update(used)
+        return names
+
+    def load(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path) as index_file:
+                self.pages = json.load(index_file)
+        except (OSError, ValueError):
+            self.pages = {}
+
+    def save(self):
+        if self.path is None:
+            return
+        with open(self.path, "w") as index_file:
+            json.dump(self.pages, index_file)
@@ -2,56 +2,50 @@ from textnode import TextNode, TextType
 
 import re
 
-def split_delimiter_at_start(text, delimiter, text_type):
-    """
-    Called by split_nodes_delimiter() when delimiter occurs at
-    beginning of text.
+# Neither regex can backtrack across a "[", "]", "(" or ")", so each
+# scans a line in linear time
+image_regex = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+link_regex = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
 
-    :param text: Text to evaluate.
-    :type text: str, required
+# (delimiter, text_type) of the built-in inline syntax, in the order
+# they are applied
+BUILTIN_DELIMITERS = (
+    ("**", TextType.BOLD_TEXT),
+    ("_", TextType.ITALIC_TEXT),
+    ("`", TextType.CODE_TEXT),
+)
 
-    :param delimiter: A string delimiter
-    :type delimiter: str, required
+def unpaired_delimiter_error(text, index):
+    """
+    Build the SyntaxError raised for an unpaired delimiter.
 
-    :param text_type: TextType to convert to
-    :type text_type: TextType, required
+    :param text: Text being split
+    :type text: str, required
 
-    :returns: A list of TextNodes
-    :rtype: list[TextNode]
+    :param index: 0-based index of the unpaired delimiter in text
+    :type index: int, required
 
-    :raises SyntaxError: If an unpaired delimiter is found
+    :returns: A SyntaxError carrying text and the delimiter's offset
+    :rtype: SyntaxError
     """
 
-    new_nodes = []
-    dLength = len(delimiter)
-    try:
-        # Search for second delimiter
-        text.index(delimiter, dLength)
-    except ValueError:
-        raise SyntaxError("invalid Markdown syntax: unpaired delimiter")
-    
-    text_list = text.split(delimiter, 2)
-
-    # text_list[0] is an empty string in this instance
-    selected_text = text_list[1]
-    new_nodes.append(TextNode(selected_text, text_type))
-    
-    # Search stub node for any more delimiters
-    stub_node = TextNode(text_list[2], TextType.NORMAL_TEXT)
-    if delimiter in text_list[2]:
-        split_stub_nodes = split_nodes_delimiter([stub_node], delimiter, text_type)
-        new_nodes.extend(split_stub_nodes)
-    else:
-        new_nodes.append(stub_node)
-    return new_nodes
+    return SyntaxError(
+        "invalid Markdown syntax: unpaired delimiter",
+        (None, 1, index + 1, text)
+    )
 
-def split_delimiter_at_end(text, delimiter, text_type):
+def split_nodes_delimiter(old_nodes, delimiter, text_type):
     """
-    Called by split_nodes_delimiter() when delimiter occurs at
-    end of text.
+    Create a list of TextNodes
 
-    :param text: Text to evaluate.
-    :type text: str, required
+    Delimiters are paired left to right; the text between each pair
+    becomes a node of text_type. Each node is split in a single pass, so
+    the cost is linear in the length of the text however many
+    delimiters it holds.
+
+    :param old_nodes: A list of previously-made TextNodes, that have 
+    not yet been evaluated for the presence of inline nodes
+    :type old_nodes: list[TextNode], required
 
     :param delimiter: A string delimiter
     :type delimiter: str, required
@@ -66,151 +60,103 @@ def split_delimiter_at_end(text, delimiter, text_type):
     """
 
     new_nodes = []
-    dLength = len(delimiter)
-
-    # Search for second delimiter
-    count = text.count(delimiter, 0, len(text)-dLength)
-    if count == 0:
-        raise SyntaxError("invalid Markdown syntax: unpaired delimiter")
-    elif count == 1:            
-        text_list = text.split(delimiter)
-        new_nodes.append(TextNode(text_list[0], TextType.NORMAL_TEXT))
-        new_nodes.append(TextNode(text_list[1], text_type))
-    else:
-        i = 0
-        index = 0
-        while i < count:
-            index = text.index(delimiter, index, len(text)-dLength)
-            i += 1
-        stub_text = text[0:index]
-        selected_text = text[index:(len(text)-dLength+1)]
-        stub_node = TextNode(stub_text, TextType.NORMAL_TEXT)
-        split_nodes = split_nodes_delimiter([stub_node])
-        new_nodes.extend(split_nodes)
-        selected_node = TextNode(selected_text, text_type)
-        new_nodes.append(selected_node)
+    for old_node in old_nodes:
+        text = old_node.text
+
+        # Node already flagged as another TextType, or does not contain
+        # delimiter. Append to new_nodes and move on to next node.
+        if old_node.text_type != TextType.NORMAL_TEXT or delimiter not in text:
+            new_nodes.append(old_node)
+            continue
+
+        sections = text.split(delimiter)
+        # An even number of sections means an odd number of delimiters;
+        # the last one is unpaired
+        if len(sections) % 2 == 0:
+            index = len(text) - len(sections[-1]) - len(delimiter)
+            raise unpaired_delimiter_error(text, index)
+
+        for i, section in enumerate(sections):
+            if i % 2:
+                new_nodes.append(TextNode(section, text_type))
+            elif section:
+                new_nodes.append(TextNode(section, TextType.NORMAL_TEXT))
+
     return new_nodes
 
-def split_delimiter_in_middle(text, delimiter, text_type):
+def split_multi_delimiters(old_nodes, registry=None):
     """
-    Called by split_nodes_delimiter() when delimiter occurs in
-    middle of text.
+    Iterate over old_nodes for all registered delimiters.
 
-    :param text: Text to evaluate.
-    :type text: str, required
-
-    :param delimiter: A string delimiter
-    :type delimiter: str, required
+    :param old_nodes: A list of previously-made TextNodes, that have 
+    not yet been evaluated for the presence of inline nodes
+    :type old_nodes: list[TextNode], required
 
-    :param text_type: TextType to convert to
-    :type text_type: TextType, required
+    :param registry: Registry of inline delimiters; defaults to
+    BUILTIN_DELIMITERS
+    :type registry: ExtensionRegistry, optional
 
     :returns: A list of TextNodes
     :rtype: list[TextNode]
+    """
 
-    :raises SyntaxError: If an unpaired delimiter is found
+    if registry is None:
+        delimiters = BUILTIN_DELIMITERS
+    else:
+        delimiters = registry.inline_delimiters()
+    for delimiter, text_type in delimiters:
+        old_nodes = split_nodes_delimiter(old_nodes, delimiter, text_type)
+    return old_nodes
+
+def register_builtin_inlines(registry):
     """
+    Register the built-in inline delimiters.
 
-    i = text.index(delimiter)
-    new_nodes = []
-    dLength = len(delimiter)
+    :param registry: Registry to register with
+    :type registry: ExtensionRegistry, required
+    """
 
-    try:
-        text.index(delimiter, i+dLength)
-    except ValueError:
-        raise SyntaxError("invalid Markdown syntax: unpaired delimiter")
-    
-    text_list = text.split(delimiter, 2)
-    first_slice = text_list[0]
-    selected_text = text_list[1]
-    stub_text = text_list[2]
-    new_nodes.append(TextNode(first_slice, TextType.NORMAL_TEXT))
-    new_nodes.append(TextNode(selected_text, text_type))
-    stub_node = TextNode(stub_text, TextType.NORMAL_TEXT)
-    if delimiter in stub_text:
-        split_nodes = split_nodes_delimiter([stub_node], delimiter, text_type)
-        new_nodes.extend(split_nodes)
-    else:
-        new_nodes.append(TextNode(text_list[2], TextType.NORMAL_TEXT))
-    return new_nodes
+    for delimiter, text_type in BUILTIN_DELIMITERS:
+        registry.register_inline(delimiter, text_type)
 
-def split_nodes_delimiter(old_nodes, delimiter, text_type):
+def split_nodes_matches(old_nodes, regex, text_type):
     """
-    Create a list of TextNodes
+    Iterate over old_nodes. Split nodes of TextType.NORMAL_TEXT on each
+    match of regex, in a single pass over the text.
 
-    :param old_nodes: A list of previously-made TextNodes, that have 
-    not yet been evaluated for the presence of inline nodes
+    :param old_nodes: A list of previously-made TextNodes
     :type old_nodes: list[TextNode], required
 
-    :param delimiter: A string delimiter
-    :type delimiter: str, required
+    :param regex: Compiled regex whose groups are the node's text and url
+    :type regex: re.Pattern, required
 
-    :param text_type: TextType to convert to
+    :param text_type: TextType of the nodes made from matches
     :type text_type: TextType, required
 
     :returns: A list of TextNodes
     :rtype: list[TextNode]
-
-    :raises SyntaxError: If an unpaired delimiter is found
     """
 
     new_nodes = []
     for old_node in old_nodes:
-        text = old_node.text
-
-        # Node already flagged as another TextType.
-        # Append to new_nodes and move one to next node.
         if old_node.text_type != TextType.NORMAL_TEXT:
             new_nodes.append(old_node)
-        
-        # Node does not contain delimiter. Append to
-        # new_nodes and move on to next node.
-        elif delimiter not in text:
+            continue
+        text = old_node.text
+        position = 0
+        for _match in regex.finditer(text):
+            if _match.start() > position:
+                new_nodes.append(
+                    TextNode(text[position:_match.start()], TextType.NORMAL_TEXT)
+                )
+            new_nodes.append(TextNode(_match[1], text_type, _match[2]))
+            position = _match.end()
+        if position == 0:
             new_nodes.append(old_node)
-
-        # Line starts with delimiter, so we will only get
-        # a two-member list.
-        elif text.startswith(delimiter):
-            node_list = split_delimiter_at_start(text, delimiter, text_type)
-            new_nodes.extend(node_list)
-            
-        # Line ends with delimiter, so we will only get
-        # a two-member list.
-        elif text.endswith(delimiter):
-            node_list = split_delimiter_at_end(text, delimiter, text_type)
-            new_nodes.extend(node_list)
-
-        # Delimiter occurs in the middle of the line,
-        # so we will get a three-member list.
-        else:
-            node_list = split_delimiter_in_middle(text, delimiter, text_type)
-            new_nodes.extend(node_list)
-
+        elif position < len(text):
+            new_nodes.append(TextNode(text[position:], TextType.NORMAL_TEXT))
     return new_nodes
 
-def split_multi_delimiters(old_nodes):
-    """
-    Iterate over old_nodes for all delimiters. For testing purposes.
-
-    :param old_nodes: A list of previously-made TextNodes, that have 
-    not yet been evaluated for the presence of inline nodes
-    :type old_nodes: list[TextNode], required
-
-    :returns: A list of TextNodes
-    :rtype: list[TextNode]
-    """
-
-    delimiter_dict = {
-        "**": TextType.BOLD_TEXT,
-        "_": TextType.ITALIC_TEXT,
-        "`": TextType.CODE_TEXT,
-    }
-
-    for delimiter in delimiter_dict:
-        text_type = delimiter_dict[delimiter]
-        old_nodes = split_nodes_delimiter(old_nodes, delimiter, text_type)
-    return old_nodes
-
 def split_nodes_image(old_nodes):
     """
     Iterate over old_nodes. Convert nodes of TextType.NORMAL_TEXT
@@ -224,66 +170,7 @@ def split_nodes_image(old_nodes):
     :rtype: list[TextNode]
     """
 
-    new_nodes = []
-    for old_node in old_nodes:
-        text = old_node.text
-
-        # Node already flagged as another TextType.
-        # Append to new_nodes and move on to next node.
-        if old_node.text_type != TextType.NORMAL_TEXT:
-            new_nodes.append(old_node)
-            continue
-        
-        # "!" not in text; therefore not a Markdown image tag
-        # Append to new_nodes and move on to next node.
-        if "!" not in text:
-            new_nodes.append(old_node)
-            continue
-        
-        while len(text) > 0:
-            sections = []
-            try:
-                _match = extract_markdown_images(text)[0]
-                alt_text = _match[0]
-                url = _match[1]
-                sections = text.split(f"![{alt_text}]({url})")
-                
-            # _match not found in text. Process text into text_noe
-            except IndexError:
-                text_node = TextNode(text, TextType.NORMAL_TEXT)
-                new_nodes.append(text_node)
-
-                # End while loop with empty text string
-                text = ""
-                continue
-
-            # _match occurred at beginning of text;
-            # append TextNode for _match to new_nodes list
-            if len(sections[0]) == 0:
-                image_node = TextNode(alt_text, TextType.IMAGE, url)
-                new_nodes.append(image_node)
-
-                # Re-run while loop with remaining text
-                text = sections[1]
-                
-            # _match occurred in middle of line
-            else:
-                # Create text_node for first chunk
-                text_node = TextNode(sections[0], TextType.NORMAL_TEXT)
-                new_nodes.append(text_node)
-
-                # Create image_node for second chunk
-                image_node = TextNode(alt_text, TextType.IMAGE, url)
-                new_nodes.append(image_node)
-                    
-                # Re-run while loop with remaining text
-                try:
-                    text = sections[1]
-                except IndexError:
-                    # _match occurred at end of line
-                    # End while loop with empty text string
-                    text = ""
-    return new_nodes
+    return split_nodes_matches(old_nodes, image_regex, TextType.IMAGE)
 
 def split_nodes_links(old_nodes):
     """
@@ -298,66 +185,7 @@ def split_nodes_links(old_nodes):
     :rtype: list[TextNode]
     """
 
-    new_nodes = []
-    for old_node in old_nodes:
-        text = old_node.text
-
-        # Node already flagged as another TextType.
-        # Append to new_nodes and move one to next node.
-        if old_node.text_type != TextType.NORMAL_TEXT:
-            new_nodes.append(old_node)
-            continue
-        
-        # "[" not in text; therefore not a Markdown link tag
-        # Append to new_nodes and move on to next node.
-        if "[" not in text:
-            new_nodes.append(old_node)
-            continue
-
-        while len(text) > 0:
-            sections = []
-            try:
-                _match = extract_markdown_links(text)[0]
-                link_text = _match[0]
-                url = _match[1]
-                sections = text.split(f"[{link_text}]({url})")
-                
-            # _match not found in text. Process text into text_node
-            except IndexError:
-                text_node = TextNode(text, TextType.NORMAL_TEXT)
-                new_nodes.append(text_node)
-
-                # End while loop with empty text string
-                text = ""
-                continue
-
-            # _match occurred at beginning of text;
-            # append TextNode for _match to new_nodes list
-            if len(sections[0]) == 0:
-                link_node = TextNode(link_text, TextType.LINK, url)
-                new_nodes.append(link_node)
-
-                # Re-run while loop with remaining text
-                text = sections[1]
-                
-            # _match occurred in middle or at end of line
-            else:
-                # Create text_node for first chunk
-                text_node = TextNode(sections[0], TextType.NORMAL_TEXT)
-                new_nodes.append(text_node)
-
-                # Create link_node for second chunk
-                link_node = TextNode(link_text, TextType.LINK, url)
-                new_nodes.append(link_node)
-                    
-                # Re-run while loop with remaining text
-                try:
-                    text = sections[1]
-                except IndexError:
-                    # _match occurred at end of line
-                    # End while loop with empty text string
-                    text = ""
-    return new_nodes
+    return split_nodes_matches(old_nodes, link_regex, TextType.LINK)
 
 def extract_markdown_images(text):
     """
@@ -371,9 +199,7 @@ def extract_markdown_images(text):
     :rtype: list[(str, str)]
     """
 
-    regex = r"!\[([^\[\]]*)\]\(([^\(\)]*)\)"
-    matches = re.findall(regex, text)
-    return matches
+    return image_regex.findall(text)
 
 def extract_markdown_links(text):
     """
@@ -387,23 +213,25 @@ def extract_markdown_links(text):
     :rtype: list[(str, str)]
     """
 
-    regex = r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)"
-    matches = re.findall(regex, text)
-    return matches
+    return link_regex.findall(text)
 
-def text_to_textnodes(text):
+def text_to_textnodes(text, registry=None):
     """
     Convert raw text to appropriate TextNodes.
 
     :param text: Raw text to convert
     :type text: str
 
+    :param registry: Registry of inline delimiters; defaults to
+    BUILTIN_DELIMITERS
+    :type registry: ExtensionRegistry, optional
+
     :returns: A list of nodes
     :rtype: list[TextNode]
     """
     
     node_list = [TextNode(text, TextType.NORMAL_TEXT)]
-    node_list = split_multi_delimiters(node_list)
+    node_list = split_multi_delimiters(node_list, registry)
     node_list = split_nodes_image(node_list)
     node_list = split_nodes_links(node_list)
-    return node_list
\ No newline at end of file
+    return node_list
@@ -0,0 +1,274 @@
+import json, os, posixpath, re
+
+# URLs with a scheme ("https:", "mailto:") or protocol-relative URLs
+# point outside the site and are never checked
+external_url_regex = re.compile(r"^([a-zA-Z][a-zA-Z0-9+.-]*:|//)")
+
+def collect_references(node):
+    """
+    Walk an HTMLNode tree and collect its outgoing references and the
+    ids that can be used as #fragment targets.
+
+    :param node: Root of a rendered page
+    :type node: HTMLNode, required
+
+    :returns: A list of (tag, url) tuples for <a href> and <img src>,
+    in document order, and the set of ids found in the tree
+    :rtype: (list[(str, str)], set[str])
+    """
+
+    references = []
+    anchors = set()
+    stack = [node]
+    while stack:
+        _node = stack.pop()
+        props = _node.props
+        if props:
+            if "id" in props:
+                anchors.add(props["id"])
+            if _node.tag == "a" and props.get("href") is not None:
+                references.append(("a", props["href"]))
+            elif _node.tag == "img" and props.get("src") is not None:
+                references.append(("img", props["src"]))
+        if _node.children:
+            # Reversed so nodes are popped in document order
+            stack.extend(reversed(_node.children))
+    return references, anchors
+
+def page_url(src_path, src_tree_root):
+    """
+    Convert the path of a markdown file to the site URL of its page.
+
+    :param src_path: Path to a markdown file under src_tree_root
+    :type src_path: str, required
+
+    :param src_tree_root: Content directory
+    :type src_tree_root: str, required
+
+    :returns: Site URL, eg. "/blog/tom/index.html"
+    :rtype: str
+    """
+
+    rel_path = os.path.relpath(src_path, src_tree_root).replace(os.sep, "/")
+    return "/" + os.path.splitext(rel_path)[0] + ".html"
+
+class LinkGraph:
+    def __init__(self):
+        """
+        Site-wide graph of internal links and image references, checked
+        against an index of generated pages and static assets. Nothing
+        is fetched over the network.
+        """
+
+        # page url -> list of (tag, url) references in document order
+        self.pages = {}
+        # page url -> set of ids usable as #fragment targets
+        self.anchors = {}
+        # url of every static asset
+        self.assets = set()
+
+    def add_page(self, url, references, anchors):
+        """
+        Record a rendered page.
+
+        :param url: Site URL of the page (see page_url())
+        :type url: str, required
+
+        :param references: (tag, url) tuples from collect_references()
+        :type references: list[(str, str)], required
+
+        :param anchors: ids found in the page
+        :type anchors: set[str], required
+        """
+
+        self.pages[url] = references
+        self.anchors[url] = anchors
+
+    def add_static_tree(self, static_root, rel_paths=None):
+        """
+        Record every file under static_root as an asset.
+
+        :param static_root: Directory copied to the site root
+        :type static_root: str, required
+
+        :param rel_paths: Files under static_root, as listed by
+        DirectorySnapshot.list_files(); static_root is walked if omitted
+        :type rel_paths: list[str], optional
+        """
+
+        if rel_paths is not None:
+            for rel_path in rel_paths:
+                self.assets.add("/" + rel_path)
+            return
+        for dir_path, dir_names, file_names in os.walk(static_root):
+            rel_dir = os.path.relpath(dir_path, static_root).replace(os.sep, "/")
+            for file_name in file_names:
+                self.assets.add(posixpath.normpath("/" + rel_dir + "/" + file_name))
+
+    def save(self, path):
+        """
+        Write the graph to path as JSON, creating its directory, so a
+        later partial build can check links and find backlinks without
+        rendering every page.
+
+        :param path: JSON file to write
+        :type path: str, required
+        """
+
+        cache_dir = os.path.dirname(path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        data = {
+            "pages": self.pages,
+            "anchors": {page: sorted(ids) for page, ids in self.anchors.items()},
+            "assets": sorted(self.assets),
+        }
+        with open(path, "w") as graph_file:
+            json.dump(data, graph_file)
+
+    def load(self, path):
+        """
+        Add the pages and assets saved by save(). A missing or corrupt
+        file is ignored.
+
+        :param path: JSON file written by save()
+        :type path: str, required
+        """
+
+        try:
+            with open(path) as graph_file:
+                data = json.load(graph_file)
+        except (OSError, ValueError):
+            return
+        for page, references in data.get("pages", {}).items():
+            self.pages[page] = [tuple(reference) for reference in references]
+        for page, ids in data.get("anchors", {}).items():
+            self.anchors[page] = set(ids)
+        self.assets.update(data.get("assets", []))
+
+    def backlinks(self, targets):
+        """
+        :param targets: Page or asset URLs
+        :type targets: set[str], required
+
+        :returns: Pages that link to or embed any of targets, other than
+        the targets themselves
+        :rtype: set[str]
+        """
+
+        pages = set()
+        for page, references in self.pages.items():
+            if page in targets:
+                continue
+            for tag, url in references:
+                if self.resolve(page, url)[0] in targets:
+                    pages.add(page)
+                    break
+        return pages
+
+    def resolve(self, page, url):
+        """
+        Resolve url, as written on page, to a page or asset URL.
+
+        :returns: The target URL and its fragment, or (None, None) for
+        external URLs. The target is "" if nothing matches.
+        :rtype: (str, str)
+        """
+
+        if external_url_regex.match(url):
+            return None, None
+        path, _, fragment = url.partition("#")
+        path = path.split("?", 1)[0]
+        if path == "":
+            # Fragment-only link to the same page
+            return page, fragment
+        if not path.startswith("/"):
+            path = posixpath.join(posixpath.dirname(page), path)
+        directory = path.endswith("/")
+        path = posixpath.normpath(path)
+        if path == "/":
+            candidates = ["/index.html"]
+        elif directory:
+            candidates = [path + "/index.html"]
+        else:
+            candidates = [path, path + "/index.html", path + ".html"]
+        for candidate in candidates:
+            if candidate in self.pages or candidate in self.assets:
+                return candidate, fragment
+        return "", fragment
+
+    def check(self):
+        """
+        Check every reference. Runs in O(pages + references).
+
+        :returns: A report with "broken" (list of dicts with page, url
+        and reason) and "orphans" (pages no other page links to)
+        :rtype: dict
+        """
+
+        broken = []
+        inbound = set()
+        for page, references in self.pages.items():
+            for tag, url in references:
+                target, fragment = self.resolve(page, url)
+                if target is None:
+                    continue
+                if target == "":
+                    reason = "missing page" if tag == "a" else "missing image"
+                    broken.append({"page": page, "url": url, "reason": reason})
+                    continue
+                if target != page:
+                    inbound.add(target)
+                if (
+                    fragment and target in self.anchors and
+                    fragment not in self.anchors[target]
+                ):
+                    broken.append(
+                        {"page": page, "url": url, "reason": "missing anchor"}
+                    )
+        orphans = sorted(
+            page for page in self.pages
+            if page not in inbound and page != "/index.html"
+        )
+        return {"broken": broken, "orphans": orphans}
+
+    def prefetch_targets(self, limit):
+        """
+        Pick the pages each page most likely leads to, in one pass over
+        the graph. A page's internal links are ranked by how many pages
+        link to their target (in-degree), then by their position on the
+        page.
+
+        :param limit: Most targets to pick per page
+        :type limit: int, required
+
+        :returns: Map of page URL to the hrefs of its top links, as
+        written on the page but without any #fragment
+        :rtype: dict{str: list[str]}
+        """
+
+        # page -> [(target, href)] in document order, one per target
+        links = {}
+        in_degree = {}
+        for page, references in self.pages.items():
+            page_links = []
+            seen = set()
+            for tag, url in references:
+                if tag != "a":
+                    continue
+                target, fragment = self.resolve(page, url)
+                if not target or target == page or target not in self.pages:
+                    continue
+                if target in seen:
+                    continue
+                seen.add(target)
+                page_links.append((target, url.partition("#")[0]))
+                in_degree[target] = in_degree.get(target, 0) + 1
+            links[page] = page_links
+
+        targets = {}
+        for page, page_links in links.items():
+            # sorted() is stable, so ties keep document order
+            ranked = sorted(page_links, key=lambda link: -in_degree[link[0]])
+            targets[page] = [href for target, href in ranked[:limit]]
+        return targets
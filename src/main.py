@@ -1,150 +1,227 @@
-import os, shutil, sys
-
-from blocknode import heading_regex, markdown_to_html_node
-
-def extract_title(markdown):
-    """
-    Given the text of a single markdown file, extract the title
-    from the H1 header.
-
-    :param markdown: Markdown text to parse
-    :type markdown: str, required
-
-    :returns: Text containing title
-    :rtype: str
-
-    :raises SyntaxError: If no H1 tag is found in markdown text
+import argparse, os, sys
+
+from budgets import BUDGETS_FILE, load_budgets
+from builder import CACHE_DIR, Builder
+from diagnostics import format_report, write_json_report
+from memory import format_size, parse_size
+from feeds import FEED_LIMIT
+from headers import HEADERS_FILE, load_headers
+from render import new_registry
+from scheduler import IO_WORKERS
+from server import SiteRenderer, serve
+
+def print_memory_report(report):
     """
+    Print the largest per-page memory peaks.
 
-    line_list = markdown.split("\n")
-    for line in line_list:
-        _match = heading_regex.match(line)
-        if _match:
-            hashes = _match[1]
-            text = _match[2]
-            num_hashes = len(hashes)
-            if num_hashes == 1:
-                return text
-    raise SyntaxError("Invalid Markdown Syntax: No H1 Markdown tag")
-
-def copy_static_tree(src_path, dest_path):
+    :param report: Report returned by MemoryBudget.report()
+    :type report: dict, required
     """
-    Recursively copy a directory tree.
 
-    :param src_path: Directory to copy from
-    :type src_path: str, required
-
-    :param dest_path: Directory to copy to
-    :type dest_path: str, required
-    """
+    for src_path, peak in report["peaks"].items():
+        print(f"Peak memory {format_size(peak)} rendering {src_path}")
+    print(
+        f"Memory budget {format_size(report['max_memory'])}: at most "
+        f"{report['max_concurrency']} pages at once, "
+        f"{len(report['serial'])} rendered serially"
+    )
 
-    if os.path.exists(src_path):
-        os.mkdir(dest_path)
-        dir_list = os.listdir(src_path)
-        for path_name in dir_list:
-            _src_path = src_path + "/" + path_name
-            _dest_path = dest_path + "/" + path_name
-            if os.path.isfile(_src_path):
-                _path = shutil.copy(_src_path, _dest_path)
-            if os.path.isdir(_src_path):
-                copy_static_tree(_src_path, _dest_path)
-
-def create_child_dirs(dest_path):
+def print_link_report(report):
     """
-    Check if parent directories of dest_path exist. If not,
-    create them.
+    Print broken links and orphan pages found by LinkGraph.check().
 
-    :param dest_path: Path to check/create
-    :type dest_path: str, required
+    :param report: Report returned by LinkGraph.check()
+    :type report: dict, required
     """
 
-    path_list = dest_path.split("/")
-    # Pop off file name at end of path_list
-    file_name = path_list.pop()
-    _path = ""
-    for dir_name in path_list:
-        _path = _path + dir_name + "/"
-        if not os.path.exists(_path):
-            os.mkdir(_path)
+    for item in report["broken"]:
+        print(f"Broken link on {item['page']}: {item['url']} ({item['reason']})")
+    for page in report["orphans"]:
+        print(f"Orphan page (no inbound links): {page}")
+    print(
+        f"Link check: {len(report['broken'])} broken, "
+        f"{len(report['orphans'])} orphan pages"
+    )
 
-def generate_page(src_path, template_path, dest_path, basepath):
+def print_schedule_report(report):
     """
-    Generate an HTML page, and place it at dest_path.
-
-    :param src_path: Path to read the markdown file from
-    :type src_path: str, required
-
-    :param template_path: Path to read the template html file from
-    :type template_path: str, required
+    Print the chain of tasks that bounded the build.
 
-    :param dest_path: Path to write resulting html file to
-    :type dest_path: str, required
+    :param report: Report returned by Scheduler.report()
+    :type report: dict, required
     """
 
+    for step in report["critical_path"]:
+        print(
+            f"Critical path: {step['task']} ({step['pool']}) "
+            f"{step['seconds']:.3f}s"
+        )
     print(
-        f"Generating page from {src_path} to {dest_path} using {template_path}"
+        f"Build took {report['seconds']:.3f}s: {report['tasks']} tasks, "
+        f"{report['busy']['cpu']:.3f}s rendering and writing, "
+        f"{report['busy']['io']:.3f}s copying on io threads"
     )
-    create_child_dirs(dest_path)
-
-    src_text = ""
-    with open(src_path) as src_file:
-        src_text = src_file.read()
-    
-    template_text = ""
-    with open(template_path) as template_file:
-        template_text = template_file.read()
-    
-    title = extract_title(src_text)
-    src_html_node = markdown_to_html_node(src_text)
-    src_html_text = src_html_node.to_html()
-
-    content_text = template_text.replace("{{ Title }}", title)
-    content_text = content_text.replace("{{ Content }}", src_html_text)
-    content_text = content_text.replace('href="/', f'href="{basepath}/')
-    content_text = content_text.replace('src="/', f'src="{basepath}/')
 
-
-    with open(dest_path, "w") as dest_file:
-        dest_file.write(content_text)
-
-def generate_html_tree(src_tree_root, template_path, dest_tree_root, basepath):
+def parse_args(argv=None):
     """
-    Given the root of a tree of markdown file, iterate over all markdown files in the root, and generate html pages from them in the dest_tree_root.
-
-    :param src_tree_root: Source directory to search for markdown files in
-    :type src_tree_root: str, required
+    Parse command line arguments.
 
-    :param template_path: Path to template.html
-    :type template_path: str, required
+    :param argv: Arguments to parse; defaults to sys.argv[1:]
+    :type argv: list[str], optional
 
-    :param dest_tree_root: Destination directory to place converted html files
-    :type dest_tree_root: str, required
+    :returns: Parsed arguments
+    :rtype: argparse.Namespace
     """
 
-    dir_list = os.listdir(src_tree_root)
-    for path_name in dir_list:
-        _src_path = src_tree_root + "/" + path_name
-        _dest_path = dest_tree_root + "/" + path_name
-        if os.path.isfile(_src_path):
-            # Change .md file type to .html file type
-            _dest_path = _dest_path.replace(".md", ".html")
-            generate_page(_src_path, template_path, _dest_path, basepath)
-        if os.path.isdir(_src_path):
-            generate_html_tree(_src_path, template_path, _dest_path, basepath)
-
-def main():
-    try:
-        shutil.rmtree("docs")
-    except FileNotFoundError:
-        pass
-
-    try:
-        basepath = sys.argv[1]
-    except IndexError:
-        basepath = "/"
-
-    copy_static_tree("static", "docs")
-    generate_html_tree("content", "template.html", "docs", basepath)
+    parser = argparse.ArgumentParser(
+        description="Generate a static site from Markdown."
+    )
+    parser.add_argument(
+        "basepath", nargs="?", default="/",
+        help="URL prefix the site is served under (default: /)"
+    )
+    parser.add_argument(
+        "--keep-going", action="store_true",
+        help="report every syntax error instead of stopping at the first"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1,
+        help="number of processes to render pages with (default: 1)"
+    )
+    parser.add_argument(
+        "--io-workers", type=int, default=IO_WORKERS, metavar="N",
+        help="number of threads copying static files while pages render "
+        f"(default: {IO_WORKERS})"
+    )
+    parser.add_argument(
+        "--plugin", action="append", default=[], metavar="MODULE",
+        help="load an extension module (repeatable)"
+    )
+    parser.add_argument(
+        "--archive", metavar="PATH",
+        help="write the site to a .zip, .tar, .tar.gz or .tar.xz archive "
+        "instead of docs/"
+    )
+    parser.add_argument(
+        "--target", nargs=3, action="append", default=[],
+        metavar=("NAME", "BASEPATH", "DIR"),
+        help="write a copy of the site served under BASEPATH to DIR; "
+        "repeatable, and pages are rendered once for all targets "
+        "(default: basepath to docs/)"
+    )
+    parser.add_argument(
+        "--only", action="append", default=[], metavar="PATH",
+        help="build only the content files matching PATH, a path or glob "
+        "under content/ (repeatable), into the existing output; a snippet "
+        "under includes/ selects the pages that include it"
+    )
+    parser.add_argument(
+        "--with-backlinks", action="store_true",
+        help="with --only, also rebuild the pages that link to them"
+    )
+    parser.add_argument(
+        "--report-json", metavar="PATH",
+        help="write the diagnostics report to PATH as JSON"
+    )
+    parser.add_argument(
+        "--budgets", default=BUDGETS_FILE, metavar="PATH",
+        help=f"per-page performance budgets (default: {BUDGETS_FILE})"
+    )
+    parser.add_argument(
+        "--headers", default=HEADERS_FILE, metavar="PATH",
+        help="Cache-Control settings for the generated _headers file "
+        f"(default: {HEADERS_FILE})"
+    )
+    parser.add_argument(
+        "--budget-report", metavar="PATH",
+        help="write every page's size, node count, depth and asset "
+        "weight to PATH as JSON"
+    )
+    parser.add_argument(
+        "--prefetch", type=int, default=0, metavar="K",
+        help="add <link rel=\"prefetch\"> hints for the K pages each page "
+        "most likely leads to"
+    )
+    parser.add_argument(
+        "--site-url", metavar="URL",
+        help="scheme and host the site is published at, eg. "
+        "https://example.com; enables sitemap.xml and the blog's atom.xml"
+    )
+    parser.add_argument(
+        "--site-author", metavar="NAME",
+        help="author named in atom.xml (default: the --site-url host); "
+        "a post's author front matter names its own"
+    )
+    parser.add_argument(
+        "--feed-limit", type=int, default=FEED_LIMIT, metavar="N",
+        help=f"number of posts in the Atom feed (default: {FEED_LIMIT})"
+    )
+    parser.add_argument(
+        "--page-timeout", type=float, metavar="SECONDS",
+        help="report a page that takes longer than SECONDS to render "
+        "instead of letting it stall the build"
+    )
+    parser.add_argument(
+        "--max-memory", type=parse_size, metavar="SIZE",
+        help="measure each page's peak memory and render fewer pages at "
+        "once to stay under SIZE, eg. 512M"
+    )
+    parser.add_argument(
+        "--serve", type=int, nargs="?", const=8888, metavar="PORT",
+        help="serve the site, rendering pages on request, instead of "
+        "building it (default port: 8888)"
+    )
+    args = parser.parse_args(argv)
+    if args.target and args.archive:
+        parser.error("--archive cannot be combined with --target")
+    if args.only and args.archive:
+        parser.error("--archive cannot be combined with --only")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Plugin modules are importable from the directory the site is
+    # built in
+    sys.path.insert(0, os.getcwd())
+
+    if args.serve is not None:
+        registry = new_registry(args.plugin, CACHE_DIR + "/highlight")
+        serve(
+            SiteRenderer(basepath=args.basepath.rstrip("/"), registry=registry),
+            args.serve
+        )
+        return 0
+
+    builder = Builder(
+        targets=args.target or [("default", args.basepath, "docs")],
+        archive=args.archive, plugins=args.plugin, keep_going=args.keep_going,
+        jobs=args.jobs, max_memory=args.max_memory,
+        budgets=load_budgets(args.budgets),
+        measure_budgets=bool(args.budget_report), prefetch=args.prefetch,
+        site_url=args.site_url, site_author=args.site_author,
+        feed_limit=args.feed_limit, page_timeout=args.page_timeout,
+        io_workers=args.io_workers, headers=load_headers(args.headers)
+    )
+    context = builder.build(args.only, args.with_backlinks)
+
+    print_link_report(context.link_graph.check())
+    report_extra = {"schedule": context.schedule.report()}
+    print_schedule_report(report_extra["schedule"])
+    if context.memory_budget is not None:
+        report_extra["memory"] = context.memory_budget.report()
+        print_memory_report(report_extra["memory"])
+    if args.budget_report:
+        context.budget_report.write(args.budget_report)
+
+    if context.diagnostics:
+        print(format_report(context.diagnostics))
+    if args.report_json:
+        write_json_report(context.diagnostics, args.report_json, report_extra)
+
+    if any(d.severity == "error" for d in context.diagnostics):
+        return 1
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
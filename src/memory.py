@@ -0,0 +1,217 @@
+import os, re
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from diagnostics import Diagnostic
+from render import render_in_worker, render_page
+
+size_regex = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*$", re.IGNORECASE)
+
+_size_units = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+# Bytes allocated while rendering per byte of markdown, until measured
+DEFAULT_MEMORY_RATIO = 32
+
+# Pages smaller than this are dominated by fixed costs (the template,
+# the parser's tables) and are not used to learn the ratio
+MIN_RATIO_SAMPLE = 4096
+
+def parse_size(text):
+    """
+    Parse a size such as "512M", "1.5G" or "65536".
+
+    :param text: Size, with an optional K, M, G or T suffix (powers of
+    1024)
+    :type text: str, required
+
+    :returns: The size in bytes
+    :rtype: int
+
+    :raises ValueError: If text is not a size
+    """
+
+    _match = size_regex.match(text)
+    if not _match:
+        raise ValueError(f"Invalid size: {text}")
+    return int(float(_match[1]) * _size_units[_match[2].upper()])
+
+def format_size(size):
+    """
+    :returns: size in bytes formatted for humans, eg. "1.5 MiB"
+    :rtype: str
+    """
+
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024 or unit == "GiB":
+            break
+        size /= 1024
+    if unit == "B":
+        return f"{size} B"
+    return f"{size:.1f} {unit}"
+
+class MemoryBudget:
+    def __init__(self, max_memory, jobs=1):
+        """
+        Tracks the memory pages take to render and decides how many can
+        be rendered at once. A page's need is estimated from its size,
+        using the largest allocation-per-byte ratio measured so far.
+        The budget covers memory allocated while rendering, not the
+        interpreter each worker process runs.
+
+        :param max_memory: Bytes the pages rendering at once may use
+        :type max_memory: int, required
+
+        :param jobs: Most pages to render at once
+        :type jobs: int, optional
+        """
+
+        self.max_memory = max_memory
+        self.jobs = jobs
+        self.ratio = DEFAULT_MEMORY_RATIO
+        # src_path -> peak bytes allocated while rendering
+        self.peaks = {}
+        # pages rendered alone because they would not fit alongside others
+        self.serial = []
+        # most pages seen rendering at once
+        self.max_concurrency = 0
+
+    def estimate(self, src_size):
+        """
+        :param src_size: Size of the markdown file in bytes
+        :type src_size: int, required
+
+        :returns: Estimated bytes allocated while rendering the page
+        :rtype: int
+        """
+
+        return int(src_size * self.ratio)
+
+    def record(self, result, src_size):
+        """
+        Record a page's measured peak. A page above the budget gets a
+        warning diagnostic.
+
+        :param result: A page rendered with track_memory
+        :type result: PageResult, required
+
+        :param src_size: Size of the markdown file in bytes
+        :type src_size: int, required
+        """
+
+        peak = result.peak_memory
+        if peak is None:
+            return
+        self.peaks[result.src_path] = peak
+        if src_size >= MIN_RATIO_SAMPLE:
+            self.ratio = max(self.ratio, peak / src_size)
+        if peak > self.max_memory:
+            result.diagnostics.append(Diagnostic(
+                f"Rendering took {format_size(peak)}, above the "
+                f"{format_size(self.max_memory)} memory budget",
+                path=result.src_path, severity="warning"
+            ))
+
+    def report(self, limit=5):
+        """
+        :param limit: Number of pages to list
+        :type limit: int, optional
+
+        :returns: The largest peaks, for the build report
+        :rtype: dict
+        """
+
+        largest = sorted(self.peaks.items(), key=lambda item: -item[1])
+        return {
+            "max_memory": self.max_memory,
+            "max_concurrency": self.max_concurrency,
+            "serial": list(self.serial),
+            "peaks": dict(largest[:limit]),
+        }
+
+def render_bounded(executor, page_list, budget, render_args, timeout=None,
+                   content_paths=None, registry=None):
+    """
+    Render pages in executor, submitting a page only when the estimates
+    of the pages in flight leave room for it, so concurrency drops as
+    pages get larger. Pages that would exceed the budget on their own
+    are rendered last, one at a time, in this process.
+
+    :param executor: Pool of worker processes, set up by
+    render.init_worker()
+    :type executor: concurrent.futures.Executor, required
+
+    :param page_list: (src_path, dest_path) tuples
+    :type page_list: list[(str, str)], required
+
+    :param budget: The memory budget
+    :type budget: MemoryBudget, required
+
+    :param render_args: Arguments passed to render_page() after src_path:
+    template_text, basepath, src_tree_root and keep_going
+    :type render_args: tuple, required
+
+    :param timeout: Seconds each page may take to render
+    :type timeout: float, optional
+
+    :param content_paths: Pages whose content HTML is kept, see
+    render_page()
+    :type content_paths: set[str], optional
+
+    :param registry: What pages rendered in this process render with,
+    see render_page(); workers use the one made by render.init_worker()
+    :type registry: ExtensionRegistry, optional
+
+    :returns: An iterator of (src_path, dest_path, result), in the order
+    pages finish
+    :rtype: iterator[(str, str, PageResult)]
+    """
+
+    queue = deque()
+    serial = []
+    for src_path, dest_path in page_list:
+        src_size = os.path.getsize(src_path)
+        if budget.estimate(src_size) > budget.max_memory:
+            serial.append((src_path, dest_path, src_size))
+        else:
+            queue.append((src_path, dest_path, src_size))
+
+    # future -> (src_path, dest_path, src_size, estimate)
+    in_flight = {}
+    in_use = 0
+    while queue or in_flight:
+        while queue and len(in_flight) < budget.jobs:
+            src_path, dest_path, src_size = queue[0]
+            estimate = budget.estimate(src_size)
+            if estimate > budget.max_memory:
+                # The measured ratio grew since the page was queued
+                serial.append(queue.popleft())
+                continue
+            if in_flight and in_use + estimate > budget.max_memory:
+                break
+            queue.popleft()
+            future = executor.submit(
+                render_in_worker, src_path, *render_args, track_memory=True,
+                timeout=timeout, content_paths=content_paths
+            )
+            in_flight[future] = (src_path, dest_path, src_size, estimate)
+            in_use += estimate
+            budget.max_concurrency = max(budget.max_concurrency, len(in_flight))
+        if not in_flight:
+            continue
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            src_path, dest_path, src_size, estimate = in_flight.pop(future)
+            in_use -= estimate
+            result = future.result()
+            budget.record(result, src_size)
+            yield src_path, dest_path, result
+
+    for src_path, dest_path, src_size in serial:
+        budget.serial.append(src_path)
+        budget.max_concurrency = max(budget.max_concurrency, 1)
+        result = render_page(
+            src_path, *render_args, track_memory=True, timeout=timeout,
+            content_paths=content_paths, registry=registry
+        )
+        budget.record(result, src_size)
+        yield src_path, dest_path, result
@@ -0,0 +1,345 @@
+import json, os
+
+from blocknode import heading_regex
+from diagnostics import Diagnostic
+
+FRONT_MATTER_DELIMITER = "---"
+
+# Number of lines read past the front matter while looking for an H1
+# when the front matter does not provide a title
+HEADER_LINE_LIMIT = 50
+
+# Front matter keys whose value must be a single string; pages are
+# sorted by date and the others are written out as text
+STRING_KEYS = ("title", "date", "author")
+
+def parse_front_matter_value(value):
+    """
+    Convert a front matter value string to a Python value.
+
+    :param value: Raw value following "key:"
+    :type value: str, required
+
+    :returns: A bool for true/false, a list for [a, b] lists, else a str
+    :rtype: bool | list[str] | str
+    """
+
+    value = value.strip()
+    if value.lower() in ("true", "yes"):
+        return True
+    if value.lower() in ("false", "no"):
+        return False
+    if value.startswith("[") and value.endswith("]"):
+        items = value[1:-1].split(",")
+        return [parse_front_matter_value(item) for item in items if item.strip()]
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    return value
+
+def parse_front_matter(lines, diagnostics=None):
+    """
+    Parse YAML-style front matter. Supports "key: value" pairs, inline
+    lists ("tags: [a, b]") and block lists ("- item" lines following a
+    key with no value).
+
+    :param lines: Lines between the opening and closing "---"
+    :type lines: list[str], required
+
+    :param diagnostics: If given, invalid lines are appended to this list
+    as Diagnostics and skipped, instead of raising
+    :type diagnostics: list[Diagnostic], optional
+
+    :returns: A dictionary of front matter keys and values
+    :rtype: dict{str: bool | list[str] | str}
+
+    :raises SyntaxError: If a line is neither a key nor a list item, or
+    a key of STRING_KEYS has another type of value (eg. "date: yes"),
+    and diagnostics is not given
+    """
+
+    metadata = {}
+    key = None
+    # key -> index of the line it was set on
+    key_lines = {}
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if stripped == "" or stripped.startswith("#"):
+            continue
+        if stripped.startswith("- ") and key is not None:
+            if not isinstance(metadata[key], list):
+                metadata[key] = []
+            metadata[key].append(parse_front_matter_value(stripped[2:]))
+        elif ":" in stripped:
+            key, value = stripped.split(":", 1)
+            key = key.strip().lower()
+            metadata[key] = parse_front_matter_value(value)
+            key_lines[key] = i
+        elif diagnostics is not None:
+            # Line 1 of the file is the opening "---"
+            diagnostics.append(
+                Diagnostic(f"Invalid front matter line: {line!r}", i + 2, 1)
+            )
+        else:
+            raise SyntaxError(f"Invalid front matter line: {line!r}")
+
+    for key in STRING_KEYS:
+        value = metadata.get(key)
+        if value is None or isinstance(value, str):
+            continue
+        # Left out, as if the key was not given
+        del metadata[key]
+        message = f"Front matter {key} must be text, not {value!r}"
+        if diagnostics is None:
+            raise SyntaxError(message)
+        diagnostics.append(Diagnostic(message, key_lines[key] + 2, 1))
+    return metadata
+
+def split_front_matter(markdown, diagnostics=None):
+    """
+    Separate front matter from the markdown body.
+
+    :param markdown: Full text of a markdown file
+    :type markdown: str, required
+
+    :param diagnostics: Passed on to parse_front_matter()
+    :type diagnostics: list[Diagnostic], optional
+
+    :returns: The front matter dictionary (empty if there is none) and
+    the remaining markdown text
+    :rtype: (dict, str)
+    """
+
+    if not markdown.startswith(FRONT_MATTER_DELIMITER + "\n"):
+        return {}, markdown
+    end = markdown.find("\n" + FRONT_MATTER_DELIMITER + "\n", 3)
+    if end == -1:
+        if markdown.endswith("\n" + FRONT_MATTER_DELIMITER):
+            end = len(markdown) - len(FRONT_MATTER_DELIMITER) - 1
+        else:
+            return {}, markdown
+    lines = markdown[4:end].split("\n")
+    body = markdown[end + len(FRONT_MATTER_DELIMITER) + 2:]
+    return parse_front_matter(lines, diagnostics), body
+
+def normalize_metadata(metadata):
+    """
+    Fill in defaults so every page record has title, date, tags and draft.
+
+    :param metadata: Metadata read from a page
+    :type metadata: dict, required
+
+    :returns: metadata with missing keys set to their defaults
+    :rtype: dict
+    """
+
+    tags = metadata.get("tags", [])
+    if isinstance(tags, str):
+        tags = [tags]
+    metadata["title"] = metadata.get("title")
+    metadata["date"] = metadata.get("date")
+    metadata["tags"] = [str(tag) for tag in tags]
+    metadata["draft"] = metadata.get("draft", False) is True
+    return metadata
+
+def read_page_metadata(src_path):
+    """
+    Read metadata from the header region of a markdown file. Only the
+    front matter and, if no title was given there, the lines up to the
+    first H1 are read; the page body is never loaded.
+
+    :param src_path: Path to a markdown file
+    :type src_path: str, required
+
+    :returns: A dictionary with title, date, tags and draft keys
+    :rtype: dict
+    """
+
+    metadata = {}
+    with open(src_path) as src_file:
+        line = src_file.readline()
+        if line.rstrip("\n") == FRONT_MATTER_DELIMITER:
+            front_matter_lines = []
+            for line in src_file:
+                if line.rstrip("\n") == FRONT_MATTER_DELIMITER:
+                    break
+                front_matter_lines.append(line.rstrip("\n"))
+            # Invalid lines are skipped here; they are reported when
+            # the page itself is rendered
+            metadata = parse_front_matter(front_matter_lines, [])
+            line = src_file.readline()
+
+        # No title in the front matter; fall back to the first H1
+        count = 0
+        while "title" not in metadata and line and count < HEADER_LINE_LIMIT:
+            _match = heading_regex.match(line.rstrip("\n"))
+            if _match and len(_match[1]) == 1:
+                metadata["title"] = _match[2]
+            line = src_file.readline()
+            count += 1
+    return normalize_metadata(metadata)
+
+class MetadataIndex:
+    def __init__(self, cache_path=None):
+        """
+        Index of per-page metadata, persisted between builds. Entries
+        are only re-read when a file's mtime or size changes.
+
+        :param cache_path: JSON file to persist the index to
+        :type cache_path: str, optional
+        """
+
+        self.cache_path = cache_path
+        self.entries = {}
+        self._build_tables()
+        if cache_path and os.path.exists(cache_path):
+            self.load()
+
+    def load(self):
+        """
+        Load entries from self.cache_path. A corrupt cache is ignored.
+        """
+
+        try:
+            with open(self.cache_path) as cache_file:
+                self.entries = json.load(cache_file)
+        except (OSError, ValueError):
+            self.entries = {}
+        self._build_tables()
+
+    def save(self):
+        """
+        Write entries to self.cache_path, creating its directory.
+        """
+
+        cache_dir = os.path.dirname(self.cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        with open(self.cache_path, "w") as cache_file:
+            json.dump(self.entries, cache_file, indent=1, sort_keys=True)
+
+    def update(self, src_tree_root, rel_paths=None):
+        """
+        Refresh the index from every markdown file under src_tree_root.
+        Unchanged files are not opened.
+
+        :param src_tree_root: Content directory to index
+        :type src_tree_root: str, required
+
+        :param rel_paths: Files under src_tree_root, as listed by
+        DirectorySnapshot.list_files(); src_tree_root is walked if omitted
+        :type rel_paths: list[str], optional
+
+        :returns: Paths of entries that were (re-)read
+        :rtype: list[str]
+        """
+
+        if rel_paths is None:
+            rel_paths = []
+            for dir_path, dir_names, file_names in os.walk(src_tree_root):
+                rel_dir = dir_path[len(src_tree_root) + 1:]
+                for file_name in file_names:
+                    rel_paths.append(
+                        rel_dir + "/" + file_name if rel_dir else file_name
+                    )
+
+        refreshed = []
+        seen = set()
+        for rel_path in rel_paths:
+            if not rel_path.endswith(".md"):
+                continue
+            src_path = src_tree_root + "/" + rel_path
+            seen.add(src_path)
+            if self.refresh(src_path):
+                refreshed.append(src_path)
+        for src_path in list(self.entries):
+            if src_path not in seen:
+                del self.entries[src_path]
+        self._build_tables()
+        return refreshed
+
+    def refresh(self, src_path):
+        """
+        Re-read src_path's metadata if it changed since it was indexed.
+        Call _build_tables() (or update()) before querying afterwards.
+
+        :param src_path: Path to a markdown file
+        :type src_path: str, required
+
+        :returns: True if the entry was re-read
+        :rtype: bool
+        """
+
+        stat = os.stat(src_path)
+        entry = self.entries.get(src_path)
+        if (
+            entry and entry["mtime"] == stat.st_mtime_ns and
+            entry["size"] == stat.st_size
+        ):
+            return False
+        entry = read_page_metadata(src_path)
+        entry["path"] = src_path
+        entry["mtime"] = stat.st_mtime_ns
+        entry["size"] = stat.st_size
+        self.entries[src_path] = entry
+        return True
+
+    def _build_tables(self):
+        """
+        Precompute the sorted lists answered by the query methods, with
+        and without drafts. Pages are sorted newest first; undated pages
+        sort last.
+        """
+
+        entries = sorted(self.entries.values(), key=lambda e: e["path"])
+        entries.sort(key=lambda e: e["date"] or "", reverse=True)
+        self._by_date = {True: entries, False: []}
+        self._by_tag = {True: {}, False: {}}
+        for entry in entries:
+            tables = [True] if entry["draft"] else [True, False]
+            for include_drafts in tables:
+                if not include_drafts:
+                    self._by_date[False].append(entry)
+                by_tag = self._by_tag[include_drafts]
+                for tag in entry["tags"]:
+                    by_tag.setdefault(tag, []).append(entry)
+
+    def get(self, src_path):
+        """
+        :returns: The metadata entry for src_path, or None
+        :rtype: dict
+        """
+
+        return self.entries.get(src_path)
+
+    def pages_by_date(self, include_drafts=False):
+        """
+        :param include_drafts: Whether to include pages marked draft
+        :type include_drafts: bool, optional
+
+        :returns: Metadata entries, newest first
+        :rtype: list[dict]
+        """
+
+        return list(self._by_date[include_drafts])
+
+    def pages_with_tag(self, tag, include_drafts=False):
+        """
+        :param tag: Tag to look up
+        :type tag: str, required
+
+        :param include_drafts: Whether to include pages marked draft
+        :type include_drafts: bool, optional
+
+        :returns: Metadata entries carrying tag, newest first
+        :rtype: list[dict]
+        """
+
+        return list(self._by_tag[include_drafts].get(tag, []))
+
+    def tags(self):
+        """
+        :returns: Every tag in the index, sorted
+        :rtype: list[str]
+        """
+
+        return sorted(self._by_tag[True])
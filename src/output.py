@@ -0,0 +1,307 @@
+import io, os, posixpath, shutil, tarfile, threading, time, zipfile
+
+# Size of the write buffer used by DirectoryBackend
+WRITE_BUFFER_SIZE = 1 << 16
+
+class OutputBackend:
+    def __init__(self, root):
+        """
+        Destination for generated files. Paths handed to a backend are
+        the paths the build would write to on disk, under root.
+
+        :param root: Output directory the build writes under, eg. "docs"
+        :type root: str, required
+        """
+
+        self.root = root
+
+    def member_name(self, path):
+        """
+        :returns: path relative to self.root, with "/" separators
+        :rtype: str
+        """
+
+        rel_path = os.path.relpath(path, self.root).replace(os.sep, "/")
+        return posixpath.normpath(rel_path)
+
+    def write_text(self, path, text):
+        """
+        Write a text file.
+
+        :param path: Path of the file under self.root
+        :type path: str, required
+
+        :param text: File contents
+        :type text: str, required
+
+        :raises NotImplementedError: Implemented by child classes
+        """
+
+        raise NotImplementedError
+
+    def write_bytes(self, path, data):
+        """
+        Write a binary file. See write_text().
+
+        :raises NotImplementedError: Implemented by child classes
+        """
+
+        raise NotImplementedError
+
+    def copy_file(self, src_path, path):
+        """
+        Copy the file at src_path to path.
+
+        :param src_path: File to copy
+        :type src_path: str, required
+
+        :param path: Path of the copy under self.root
+        :type path: str, required
+        """
+
+        with open(src_path, "rb") as src_file:
+            self.write_bytes(path, src_file.read())
+
+    def open_binary(self, path):
+        """
+        Open path for streaming writes. Closing the returned file
+        finishes the file. By default the data is buffered in memory and
+        handed to write_bytes() on close.
+
+        :param path: Path of the file under self.root
+        :type path: str, required
+
+        :returns: A writable binary file
+        :rtype: file
+        """
+
+        return SpooledMember(self, path)
+
+    def close(self):
+        """
+        Finish writing. The backend must not be used afterwards.
+        """
+
+        pass
+
+class SpooledMember:
+    def __init__(self, backend, path):
+        """
+        File returned by OutputBackend.open_binary() for backends that
+        cannot be written to incrementally. The data is held in memory,
+        not a temporary file: the feeds keep their streams open for the
+        whole build, and an archive can take only one member being
+        written at a time, with its size known up front for tar.
+        """
+
+        self.backend = backend
+        self.path = path
+        self.file = io.BytesIO()
+
+    def write(self, data):
+        return self.file.write(data)
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.backend.write_bytes(self.path, self.file.getvalue())
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class DirectoryBackend(OutputBackend):
+    def __init__(self, root):
+        """
+        Writes files to the filesystem. Directories are created once
+        and remembered, rather than probed for every file.
+        """
+
+        super().__init__(root)
+        self.created_dirs = set()
+
+    def make_parent_dirs(self, path):
+        """
+        Create the parent directories of path if this backend has not
+        already done so.
+        """
+
+        dir_path = os.path.dirname(path)
+        if dir_path and dir_path not in self.created_dirs:
+            os.makedirs(dir_path, exist_ok=True)
+            # Every ancestor now exists too
+            while dir_path and dir_path not in self.created_dirs:
+                self.created_dirs.add(dir_path)
+                dir_path = os.path.dirname(dir_path)
+
+    def write_text(self, path, text):
+        self.write_bytes(path, text.encode())
+
+    def write_bytes(self, path, data):
+        self.make_parent_dirs(path)
+        with open(path, "wb", buffering=WRITE_BUFFER_SIZE) as dest_file:
+            dest_file.write(data)
+
+    def open_binary(self, path):
+        self.make_parent_dirs(path)
+        return open(path, "wb", buffering=WRITE_BUFFER_SIZE)
+
+    def copy_file(self, src_path, path):
+        """
+        Copy src_path to path, unless path is already a copy of it: the
+        copy is given the source's mtime, so a copy with the same size
+        and mtime is up to date and left alone.
+        """
+
+        src_stat = os.stat(src_path)
+        try:
+            dest_stat = os.stat(path)
+        except FileNotFoundError:
+            dest_stat = None
+        if (
+            dest_stat is not None and dest_stat.st_size == src_stat.st_size
+            and dest_stat.st_mtime_ns == src_stat.st_mtime_ns
+        ):
+            return
+        self.make_parent_dirs(path)
+        # Uses the kernel's zero-copy path where there is one
+        shutil.copyfile(src_path, path)
+        os.utime(path, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+
+class ArchiveBackend(OutputBackend):
+    def __init__(self, root, archive_path):
+        """
+        Streams files into a tar or zip archive; nothing is written to
+        root. The format follows archive_path's extension: .zip, .tar,
+        .tar.gz/.tgz or .tar.xz. Members are written one at a time, so
+        the backend can be shared by threads.
+
+        :param archive_path: Archive to create
+        :type archive_path: str, required
+
+        :raises ValueError: If the extension is not recognised
+        """
+
+        super().__init__(root)
+        self.archive_path = archive_path
+        self.mtime = time.time()
+        self.lock = threading.Lock()
+        if archive_path.endswith(".zip"):
+            self.archive = zipfile.ZipFile(
+                archive_path, "w", zipfile.ZIP_DEFLATED
+            )
+            self.is_zip = True
+        elif archive_path.endswith((".tar.gz", ".tgz")):
+            self.archive = tarfile.open(archive_path, "w|gz")
+            self.is_zip = False
+        elif archive_path.endswith(".tar.xz"):
+            self.archive = tarfile.open(archive_path, "w|xz")
+            self.is_zip = False
+        elif archive_path.endswith(".tar"):
+            self.archive = tarfile.open(archive_path, "w|")
+            self.is_zip = False
+        else:
+            raise ValueError(f"Unsupported archive type: {archive_path}")
+
+    def write_text(self, path, text):
+        self.write_bytes(path, text.encode())
+
+    def write_bytes(self, path, data):
+        name = self.member_name(path)
+        with self.lock:
+            if self.is_zip:
+                self.archive.writestr(name, data)
+            else:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = self.mtime
+                info.mode = 0o644
+                self.archive.addfile(info, io.BytesIO(data))
+
+    def copy_file(self, src_path, path):
+        # Both formats stream the source file into the archive
+        name = self.member_name(path)
+        with self.lock:
+            if self.is_zip:
+                self.archive.write(src_path, name)
+            else:
+                self.archive.add(src_path, name, recursive=False)
+
+    def close(self):
+        self.archive.close()
+
+class MemoryBackend(OutputBackend):
+    def __init__(self, root):
+        """
+        Keeps files in self.files, a dict of member name to bytes. For
+        tests and previews.
+        """
+
+        super().__init__(root)
+        self.files = {}
+
+    def write_text(self, path, text):
+        self.write_bytes(path, text.encode())
+
+    def write_bytes(self, path, data):
+        self.files[self.member_name(path)] = data
+
+    def read_text(self, name):
+        """
+        :param name: Member name, relative to root (eg. "index.html")
+        :type name: str, required
+
+        :returns: The file's contents
+        :rtype: str
+
+        :raises KeyError: If no file was written under name
+        """
+
+        return self.files[name].decode()
+
+class OutputTarget:
+    def __init__(self, name, basepath, backend):
+        """
+        One copy of the site: served under basepath and written through
+        backend. A build can write several, eg. one for GitHub Pages and
+        one for local preview, from a single pass over the content.
+
+        :param name: Name of the target, for messages
+        :type name: str, required
+
+        :param basepath: URL prefix this copy is served under; a
+        trailing "/" is dropped
+        :type basepath: str, required
+
+        :param backend: Where this copy's files are written
+        :type backend: OutputBackend, required
+        """
+
+        self.name = name
+        self.basepath = basepath.rstrip("/")
+        self.backend = backend
+
+    def path(self, rel_path):
+        """
+        :param rel_path: Path within the site, eg. "/blog/index.html"
+        :type rel_path: str, required
+
+        :returns: Where the backend writes rel_path
+        :rtype: str
+        """
+
+        return self.backend.root + rel_path
+
+def open_backend(root, archive_path=None):
+    """
+    :returns: An ArchiveBackend if archive_path is given, otherwise a
+    DirectoryBackend writing to root
+    :rtype: OutputBackend
+    """
+
+    if archive_path:
+        return ArchiveBackend(root, archive_path)
+    return DirectoryBackend(root)
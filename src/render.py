@@ -0,0 +1,430 @@
+import os, re, signal, threading, tracemalloc, warnings
+
+from blocknode import Outline, builtin_registry, markdown_to_html_node
+from budgets import page_stats
+from diagnostics import Diagnostic
+from extensions import load_plugins
+from highlight import HighlightCache
+from htmlnode import LeafNode, ParentNode, escape_attribute, escape_text
+from includes import INCLUDE_DIR, IncludeResolver, PageIncludes
+from linkcheck import collect_references, page_url
+from metadata import split_front_matter
+
+srcset_regex = re.compile(r'srcset="([^"]*)"')
+
+def toc_html(headings):
+    """
+    Render a table of contents: nested lists of links to the headings.
+    The <h1> is the page's title and is left out.
+
+    :param headings: Outline.headings of a page
+    :type headings: list[dict], required
+
+    :returns: A <ul>, or "" if the page has no headings below <h1>
+    :rtype: str
+    """
+
+    # Each entry is (heading, child entries)
+    top = []
+    # (level, entries a heading of a deeper level is added to)
+    stack = [(1, top)]
+    for heading in headings:
+        if heading["level"] == 1:
+            continue
+        while len(stack) > 1 and stack[-1][0] >= heading["level"]:
+            stack.pop()
+        children = []
+        stack[-1][1].append((heading, children))
+        stack.append((heading["level"], children))
+
+    def list_node(entries):
+        items = []
+        for heading, children in entries:
+            item_nodes = [LeafNode("a", heading["text"], {"href": "#" + heading["id"]})]
+            if children:
+                item_nodes.append(list_node(children))
+            items.append(ParentNode("li", item_nodes))
+        return ParentNode("ul", items)
+
+    if not top:
+        return ""
+    return list_node(top).to_html()
+
+def apply_template(template_text, title, content_html, basepath, toc=""):
+    """
+    Fill in the template and prefix root-relative URLs with basepath.
+
+    :param template_text: Text of template.html
+    :type template_text: str, required
+
+    :param title: Page title (unescaped)
+    :type title: str, required
+
+    :param content_html: Rendered page content
+    :type content_html: str, required
+
+    :param basepath: URL prefix the site is served under
+    :type basepath: str, required
+
+    :param toc: The page's table of contents, from toc_html()
+    :type toc: str, optional
+
+    :returns: The full HTML page
+    :rtype: str
+    """
+
+    content_text = template_text.replace("{{ Title }}", escape_text(title))
+    content_text = content_text.replace("{{ TOC }}", toc)
+    content_text = content_text.replace("{{ Content }}", content_html)
+    return prefix_urls(content_text, basepath)
+
+def prefix_urls(html, basepath):
+    """
+    Prefix the root-relative href, src and srcset URLs in html with
+    basepath. This is the only part of a page that depends on where the
+    site is served, so a page rendered once with an empty basepath can
+    be written out for several.
+
+    :param html: HTML with root-relative URLs
+    :type html: str, required
+
+    :param basepath: URL prefix the site is served under
+    :type basepath: str, required
+
+    :returns: The HTML with prefixed URLs
+    :rtype: str
+    """
+
+    if not basepath:
+        return html
+    html = html.replace('href="/', f'href="{basepath}/')
+    html = html.replace('src="/', f'src="{basepath}/')
+    if "srcset=" in html:
+        html = srcset_regex.sub(
+            lambda _match: 'srcset="' + ", ".join(
+                basepath + candidate if candidate.startswith("/") else candidate
+                for candidate in _match[1].split(", ")
+            ) + '"',
+            html
+        )
+    return html
+
+def add_prefetch_hints(html, hrefs, basepath):
+    """
+    Add a <link rel="prefetch"> to the page's head for each of hrefs.
+
+    :param html: The full HTML page
+    :type html: str, required
+
+    :param hrefs: URLs to prefetch, as written in the page's content
+    :type hrefs: list[str], required
+
+    :param basepath: URL prefix the site is served under
+    :type basepath: str, required
+
+    :returns: The page with the hints, or html unchanged if it has no
+    </head> or there are no hrefs
+    :rtype: str
+    """
+
+    head_end = html.find("</head>")
+    if head_end == -1 or not hrefs:
+        return html
+    hints = []
+    for href in hrefs:
+        if href.startswith("/"):
+            href = basepath + href
+        hints.append(f'<link rel="prefetch" href="{escape_attribute(href)}" />')
+    return html[:head_end] + "\n".join(hints) + "\n" + html[head_end:]
+
+def new_registry(plugins, highlight_cache_dir=None, include_root=None):
+    """
+    Make the state a site renders with: a registry with the built-in
+    syntax and plugins, its own highlight cache and include resolver.
+    Set its image_variants once the images are planned.
+
+    :param plugins: Names of extension modules
+    :type plugins: list[str], required
+
+    :param highlight_cache_dir: Directory of the highlight cache
+    :type highlight_cache_dir: str, optional
+
+    :param include_root: Directory of snippets, or None for INCLUDE_DIR
+    :type include_root: str, optional
+
+    :returns: The registry, to pass to render_page()
+    :rtype: ExtensionRegistry
+    """
+
+    registry = builtin_registry()
+    load_plugins(plugins, registry)
+    registry.highlight_cache = HighlightCache(highlight_cache_dir)
+    registry.include_resolver = IncludeResolver(
+        include_root or INCLUDE_DIR, registry
+    )
+    return registry
+
+# Registry of a worker process, made by init_worker()
+worker_registry = None
+
+def init_worker(plugins, highlight_cache_dir=None, image_variants=None,
+                include_root=None):
+    """
+    Prepare a worker process to render pages with render_in_worker():
+    make its registry from the build's settings, as new_registry() does
+    for the build itself.
+
+    :param plugins: Names of extension modules
+    :type plugins: list[str], required
+
+    :param highlight_cache_dir: Directory of the highlight cache, shared
+    with the other processes
+    :type highlight_cache_dir: str, optional
+
+    :param image_variants: Images with width variants, see srcset()
+    :type image_variants: dict, optional
+
+    :param include_root: Directory of snippets
+    :type include_root: str, optional
+    """
+
+    global worker_registry
+    worker_registry = new_registry(plugins, highlight_cache_dir, include_root)
+    worker_registry.image_variants = image_variants or {}
+
+def render_in_worker(src_path, *args, **kwargs):
+    """
+    render_page() with the registry made by init_worker(); submitted to
+    worker processes, since a registry can't be sent to them.
+    """
+
+    return render_page(src_path, *args, registry=worker_registry, **kwargs)
+
+class PageTimeout(Exception):
+    """
+    Raised when a page takes longer to render than its time limit.
+    """
+
+class TimeLimit:
+    def __init__(self, seconds):
+        """
+        Context manager raising PageTimeout in the block it guards once
+        seconds have passed. It uses SIGALRM, so the limit only applies
+        on platforms that have it and in a process's main thread; a
+        RuntimeWarning is issued when a limit is given but can't be
+        enforced, eg. in the dev server's request threads.
+
+        :param seconds: Time limit, or None for no limit
+        :type seconds: float, required
+        """
+
+        self.seconds = seconds
+        self.active = False
+        if not seconds:
+            return
+        if not hasattr(signal, "setitimer"):
+            reason = "this platform has no SIGALRM"
+        elif threading.current_thread() is not threading.main_thread():
+            reason = "pages are rendered outside the main thread"
+        else:
+            self.active = True
+            return
+        warnings.warn(
+            f"The {seconds:g}s page time limit is not enforced: {reason}",
+            RuntimeWarning, stacklevel=2
+        )
+
+    def expire(self, signum, frame):
+        raise PageTimeout(f"Rendering took longer than {self.seconds:g}s")
+
+    def __enter__(self):
+        if self.active:
+            self.previous_handler = signal.signal(signal.SIGALRM, self.expire)
+            signal.setitimer(signal.ITIMER_REAL, self.seconds)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.active:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, self.previous_handler)
+
+class PageResult:
+    def __init__(self, src_path, url, html, title=None, references=None,
+                 anchors=None, diagnostics=None, peak_memory=None,
+                 stats=None, content_html=None, outline=None, includes=None):
+        """
+        Output of render_page(). Holds only plain data so it can be
+        returned from a worker process.
+
+        :param src_path: Path of the markdown file
+        :type src_path: str, required
+
+        :param url: Site URL of the page (see page_url())
+        :type url: str, required
+
+        :param html: The full HTML page, or None if rendering failed
+        :type html: str, required
+
+        :param title: Page title
+        :type title: str, optional
+
+        :param references: (tag, url) tuples from collect_references()
+        :type references: list[(str, str)], optional
+
+        :param anchors: ids found in the page
+        :type anchors: set[str], optional
+
+        :param diagnostics: Problems found while rendering
+        :type diagnostics: list[Diagnostic], optional
+
+        :param peak_memory: Peak bytes allocated while rendering, if
+        measured
+        :type peak_memory: int, optional
+
+        :param stats: Page metrics from budgets.page_stats()
+        :type stats: dict, optional
+
+        :param content_html: The rendered markdown, without the
+        template, if render_page() was asked to keep it
+        :type content_html: str, optional
+
+        :param outline: The page's headings, see Outline.headings
+        :type outline: list[dict], optional
+
+        :param includes: Snippets the page includes, see
+        PageIncludes.used
+        :type includes: dict, optional
+        """
+
+        self.src_path = src_path
+        self.url = url
+        self.html = html
+        self.title = title
+        self.references = references or []
+        self.anchors = anchors or set()
+        self.diagnostics = diagnostics or []
+        self.peak_memory = peak_memory
+        self.stats = stats
+        self.content_html = content_html
+        self.outline = outline or []
+        self.includes = includes or {}
+
+def render_page(src_path, template_text, basepath, src_tree_root="content",
+                keep_going=False, track_memory=False, timeout=None,
+                content_paths=None, registry=None):
+    """
+    Render a markdown file to a full HTML page.
+
+    :param src_path: Path to read the markdown file from
+    :type src_path: str, required
+
+    :param template_text: Text of the template html file
+    :type template_text: str, required
+
+    :param basepath: URL prefix the site is served under
+    :type basepath: str, required
+
+    :param src_tree_root: Content directory src_path is under
+    :type src_tree_root: str, optional
+
+    :param keep_going: Record errors as diagnostics and render a
+    fallback for the offending blocks instead of raising
+    :type keep_going: bool, optional
+
+    :param track_memory: Measure the peak memory allocated while
+    rendering with tracemalloc; see PageResult.peak_memory
+    :type track_memory: bool, optional
+
+    :param timeout: Seconds the page may take to render; a page that
+    takes longer raises PageTimeout, or is reported as a diagnostic
+    with keep_going
+    :type timeout: float, optional
+
+    :param content_paths: Pages whose PageResult.content_html is kept,
+    eg. the feed's posts; None keeps it for every page. Leaving it out
+    keeps the results sent back by worker processes small.
+    :type content_paths: set[str], optional
+
+    :param registry: Syntax, caches and site data to render with, see
+    new_registry(); defaults to a new one without plugins
+    :type registry: ExtensionRegistry, optional
+
+    :returns: The rendered page
+    :rtype: PageResult
+
+    :raises SyntaxError: If Markdown syntax is invalid and keep_going
+    is False
+    :raises PageTimeout: If rendering takes longer than timeout and
+    keep_going is False
+    """
+
+    if registry is None:
+        registry = new_registry([])
+    url = page_url(src_path, src_tree_root)
+    diagnostics = [] if keep_going else None
+    page_includes = None
+    started_tracing = False
+    if track_memory:
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.start()
+            started_tracing = True
+        base_memory = tracemalloc.get_traced_memory()[0]
+    try:
+        with TimeLimit(timeout):
+            with open(src_path) as src_file:
+                src_text = src_file.read()
+
+            metadata, body_text = split_front_matter(src_text, diagnostics)
+            # Line of src_text that body_text starts on
+            first_line = src_text.count("\n", 0, len(src_text) - len(body_text)) + 1
+
+            outline = Outline()
+            if registry.include_resolver is not None:
+                page_includes = PageIncludes(registry.include_resolver)
+            src_html_node = markdown_to_html_node(
+                body_text, diagnostics, first_line, registry, outline,
+                page_includes
+            )
+            # Taken from the parse, rather than scanning the page again
+            title = metadata.get("title") or outline.title()
+            if not title:
+                message = "Invalid Markdown Syntax: No H1 Markdown tag"
+                if not keep_going:
+                    raise SyntaxError(message)
+                diagnostics.append(Diagnostic(message, first_line, 1))
+                title = os.path.splitext(os.path.basename(src_path))[0]
+
+            src_html_text = src_html_node.to_html()
+            references, anchors = collect_references(src_html_node)
+            toc = ""
+            if "{{ TOC }}" in template_text:
+                toc = toc_html(outline.headings)
+            html = apply_template(
+                template_text, title, src_html_text, basepath, toc
+            )
+            stats = page_stats(src_html_node, html, references, template_text)
+    except Exception as error:
+        if not keep_going:
+            raise
+        diagnostics.append(Diagnostic(f"{type(error).__name__}: {error}"))
+        html = title = references = anchors = stats = src_html_text = None
+        outline = None
+    finally:
+        peak_memory = None
+        if track_memory:
+            peak_memory = tracemalloc.get_traced_memory()[1] - base_memory
+            if started_tracing:
+                tracemalloc.stop()
+
+    for diagnostic in diagnostics or []:
+        diagnostic.path = src_path
+    if content_paths is not None and src_path not in content_paths:
+        src_html_text = None
+    return PageResult(
+        src_path, url, html, title, references, anchors, diagnostics,
+        peak_memory, stats, src_html_text,
+        outline.headings if outline is not None else None,
+        page_includes.used if page_includes is not None else None
+    )
@@ -0,0 +1,185 @@
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Threads copying files and processing images at once
+IO_WORKERS = 4
+
+class Task:
+    def __init__(self, name, func, args, deps, pool):
+        """
+        One step of a build; see Scheduler.add().
+        """
+
+        self.name = name
+        self.func = func
+        self.args = args
+        self.deps = deps
+        self.pool = pool
+        # Tasks that depend on this one
+        self.dependents = []
+        self.result = None
+        # perf_counter() times, set once the task has run
+        self.started = None
+        self.finished = None
+
+    @property
+    def seconds(self):
+        """
+        :returns: How long the task ran, or 0 if it has not
+        :rtype: float
+        """
+
+        if self.finished is None:
+            return 0
+        return self.finished - self.started
+
+    def run(self):
+        self.started = time.perf_counter()
+        try:
+            self.result = self.func(*self.args)
+        finally:
+            self.finished = time.perf_counter()
+        return self.result
+
+class Scheduler:
+    def __init__(self, io_workers=IO_WORKERS):
+        """
+        Runs a graph of tasks, each as soon as the tasks it depends on
+        have finished, so independent stages overlap. "io" tasks run on
+        a pool of io_workers threads. "cpu" tasks run one at a time in
+        the calling thread, so they can use signals and fan out to
+        their own worker processes; they are started ahead of waiting on
+        io tasks, so copies never hold up rendering.
+
+        :param io_workers: Most io tasks to run at once
+        :type io_workers: int, optional
+        """
+
+        self.io_workers = io_workers
+        self.tasks = []
+        self.task_set = set()
+        self.started = None
+        self.finished = None
+
+    def add(self, name, func, *args, deps=(), pool="io"):
+        """
+        Add a task. Dependencies must already have been added, so the
+        graph cannot have cycles.
+
+        :param name: Name of the task, for reports
+        :type name: str, required
+
+        :param func: Called with args when the task runs
+        :type func: callable, required
+
+        :param deps: Tasks that must finish first
+        :type deps: list[Task], optional
+
+        :param pool: "io" or "cpu"
+        :type pool: str, optional
+
+        :returns: The task
+        :rtype: Task
+
+        :raises ValueError: If pool is unknown or a dependency belongs to
+        another scheduler
+        """
+
+        if pool not in ("io", "cpu"):
+            raise ValueError(f"Unknown pool: {pool}")
+        task = Task(name, func, args, list(deps), pool)
+        for dep in task.deps:
+            if dep not in self.task_set:
+                raise ValueError(f"{name} depends on unknown task {dep.name}")
+            dep.dependents.append(task)
+        self.tasks.append(task)
+        self.task_set.add(task)
+        return task
+
+    def run(self):
+        """
+        Run every task. If one raises, no further tasks are started, the
+        running ones are waited for, and the exception is re-raised.
+        """
+
+        self.started = time.perf_counter()
+        # Task -> dependencies not yet finished
+        waiting = {task: len(task.deps) for task in self.tasks}
+        ready_cpu = deque()
+        # future -> io task
+        in_flight = {}
+        executor = ThreadPoolExecutor(self.io_workers)
+
+        def make_ready(task):
+            if task.pool == "io":
+                in_flight[executor.submit(task.run)] = task
+            else:
+                ready_cpu.append(task)
+
+        def finish(task):
+            for dependent in task.dependents:
+                waiting[dependent] -= 1
+                if not waiting[dependent]:
+                    make_ready(dependent)
+
+        try:
+            for task in self.tasks:
+                if not task.deps:
+                    make_ready(task)
+            while ready_cpu or in_flight:
+                if ready_cpu:
+                    task = ready_cpu.popleft()
+                    task.run()
+                    finish(task)
+                    done = [future for future in in_flight if future.done()]
+                else:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = in_flight.pop(future)
+                    future.result()
+                    finish(task)
+        finally:
+            executor.shutdown(cancel_futures=True)
+            self.finished = time.perf_counter()
+
+    def critical_path(self):
+        """
+        The chain of dependencies that bounded the run: starting from
+        the task that finished last, each step back is the dependency
+        that finished last, ie. the one the task was waiting on.
+
+        :returns: The tasks on the path, first to last
+        :rtype: list[Task]
+        """
+
+        finished = [task for task in self.tasks if task.finished is not None]
+        if not finished:
+            return []
+        task = max(finished, key=lambda task: task.finished)
+        path = [task]
+        while task.deps:
+            task = max(task.deps, key=lambda dep: dep.finished)
+            path.append(task)
+        path.reverse()
+        return path
+
+    def report(self):
+        """
+        :returns: Wall time, time spent in each pool and the critical
+        path, for the build report
+        :rtype: dict
+        """
+
+        busy = {"io": 0, "cpu": 0}
+        for task in self.tasks:
+            busy[task.pool] += task.seconds
+        return {
+            "seconds": (self.finished or 0) - (self.started or 0),
+            "tasks": len(self.tasks),
+            "busy": busy,
+            "critical_path": [
+                {"task": task.name, "pool": task.pool, "seconds": task.seconds}
+                for task in self.critical_path()
+            ],
+        }
@@ -0,0 +1,259 @@
+import hashlib, mimetypes, os, posixpath, sys, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+from diagnostics import format_report
+from render import new_registry, render_page
+
+class Response:
+    def __init__(self, body, content_type, etag):
+        """
+        A cached response body.
+
+        :param body: Response body
+        :type body: bytes, required
+
+        :param content_type: Value of the Content-Type header
+        :type content_type: str, required
+
+        :param etag: Strong ETag, including the quotes
+        :type etag: str, required
+        """
+
+        self.body = body
+        self.content_type = content_type
+        self.etag = etag
+
+def make_etag(body):
+    """
+    :returns: A strong ETag for body
+    :rtype: str
+    """
+
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def is_file_within(path, root):
+    """
+    :returns: Whether path is a file and, with symlinks resolved, is
+    inside the directory root
+    :rtype: bool
+    """
+
+    if not os.path.isfile(path):
+        return False
+    root = os.path.realpath(root)
+    return os.path.commonpath([root, os.path.realpath(path)]) == root
+
+class SiteRenderer:
+    def __init__(self, static_root="static", content_root="content",
+                 template_path="template.html", basepath="", registry=None):
+        """
+        Resolves request paths to pages in content_root or files in
+        static_root. Pages are rendered on first request and cached
+        until their source, a snippet they include or the template
+        changes.
+
+        :param static_root: Directory of static files
+        :type static_root: str, optional
+
+        :param content_root: Directory of markdown files
+        :type content_root: str, optional
+
+        :param template_path: Path to template.html
+        :type template_path: str, optional
+
+        :param basepath: URL prefix for root-relative links; "" when the
+        site is served from the server root
+        :type basepath: str, optional
+
+        :param registry: Syntax, caches and snippets to render with, see
+        render.new_registry(); defaults to one without plugins
+        :type registry: ExtensionRegistry, optional
+        """
+
+        self.static_root = static_root
+        self.content_root = content_root
+        self.template_path = template_path
+        self.basepath = basepath
+        self.registry = registry or new_registry([])
+        # request path -> (validity key, Response, snippets included)
+        self.cache = {}
+        self.lock = threading.Lock()
+        self.renders = 0
+
+    def resolve(self, path):
+        """
+        Map a request path to a source file.
+
+        :param path: URL path, eg. "/blog/tom/"
+        :type path: str, required
+
+        :returns: ("page", markdown path), ("static", file path), or
+        (None, None) if nothing matches
+        :rtype: (str, str)
+        """
+
+        # Rooted before normalizing, so ".." can't climb out of the site
+        # even when the request target has no leading slash
+        path = posixpath.normpath("/" + unquote(path))
+        rel_path = path.lstrip("/")
+        if rel_path == "":
+            rel_path = "index.html"
+
+        static_path = os.path.join(self.static_root, rel_path)
+        if is_file_within(static_path, self.static_root):
+            return "static", static_path
+        # Assets and raw HTML kept in the content tree
+        content_path = os.path.join(self.content_root, rel_path)
+        if not rel_path.endswith(".md") and is_file_within(
+            content_path, self.content_root
+        ):
+            return "static", content_path
+
+        stem, ext = posixpath.splitext(rel_path)
+        if ext == ".html":
+            candidates = [stem + ".md"]
+        elif ext == "":
+            candidates = [rel_path + ".md", rel_path + "/index.md"]
+        else:
+            candidates = []
+        for candidate in candidates:
+            src_path = os.path.join(self.content_root, candidate)
+            if is_file_within(src_path, self.content_root):
+                return "page", src_path
+        return None, None
+
+    def get(self, path):
+        """
+        Return the response for a request path, rendering it if it is
+        not cached or its source, its snippets or the template changed.
+
+        :param path: URL path
+        :type path: str, required
+
+        :returns: The response, or None if nothing matches path
+        :rtype: Response
+        """
+
+        kind, src_path = self.resolve(path)
+        if kind is None:
+            return None
+        src_stat = os.stat(src_path)
+        key = (src_path, src_stat.st_mtime_ns, src_stat.st_size)
+        if kind == "page":
+            template_stat = os.stat(self.template_path)
+            key += (template_stat.st_mtime_ns, template_stat.st_size)
+
+        with self.lock:
+            cached = self.cache.get(path)
+        if (
+            cached is not None and cached[0] == key
+            and not self.registry.include_resolver.changed(cached[2])
+        ):
+            return cached[1]
+
+        used = {}
+        if kind == "page":
+            response, used = self.render(src_path)
+        else:
+            with open(src_path, "rb") as src_file:
+                body = src_file.read()
+            content_type = mimetypes.guess_type(src_path)[0]
+            response = Response(
+                body, content_type or "application/octet-stream", make_etag(body)
+            )
+        with self.lock:
+            self.cache[path] = (key, response, used)
+        return response
+
+    def render(self, src_path):
+        """
+        Render a page as the build does. Syntax errors are printed and
+        rendered as fallback blocks so the page still loads.
+
+        :returns: The rendered page, and the snippets it includes (see
+        PageIncludes.used)
+        :rtype: (Response, dict)
+        """
+
+        with open(self.template_path) as template_file:
+            template_text = template_file.read()
+        result = render_page(
+            src_path, template_text, self.basepath, self.content_root,
+            keep_going=True, registry=self.registry
+        )
+        self.renders += 1
+        if result.diagnostics:
+            print(format_report(result.diagnostics), file=sys.stderr)
+        if result.html is None:
+            body = "<pre>Failed to render page; see the server log.</pre>"
+        else:
+            body = result.html
+        body = body.encode()
+        response = Response(body, "text/html; charset=utf-8", make_etag(body))
+        return response, result.includes
+
+class DevRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves responses from self.server.site, a SiteRenderer.
+    """
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def respond(self, send_body):
+        path = urlsplit(self.path).path
+        response = self.server.site.get(path)
+        if response is None:
+            self.send_error(404)
+            return
+
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            etags = [etag.strip() for etag in if_none_match.split(",")]
+            if response.etag in etags or "*" in etags:
+                self.send_response(304)
+                self.send_header("ETag", response.etag)
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                return
+
+        self.send_response(200)
+        self.send_header("Content-Type", response.content_type)
+        self.send_header("Content-Length", str(len(response.body)))
+        self.send_header("ETag", response.etag)
+        # Browsers may keep the response but must revalidate it
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(response.body)
+
+def create_server(site, port=8888, host="127.0.0.1"):
+    """
+    :param site: Renderer to serve
+    :type site: SiteRenderer, required
+
+    :returns: A server; call serve_forever() to run it
+    :rtype: ThreadingHTTPServer
+    """
+
+    server = ThreadingHTTPServer((host, port), DevRequestHandler)
+    server.site = site
+    return server
+
+def serve(site, port=8888, host="127.0.0.1"):
+    """
+    Serve site until interrupted.
+    """
+
+    server = create_server(site, port, host)
+    print(f"Serving on http://{host}:{server.server_address[1]}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
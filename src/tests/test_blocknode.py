@@ -1,11 +1,13 @@
 import unittest
 
-from src.blocknode import (
-    markdown_to_blocks, block_to_block_type, text_to_children, markdown_to_html_node
+from blocknode import (
+    markdown_to_blocks, markdown_to_located_blocks, block_to_block_type,
+    text_to_children, markdown_to_html_node, scan_blocks, Outline, slugify
 )
+from diagnostics import Diagnostic
 
-from src.htmlnode import LeafNode
-from src.blocknode import BlockType
+from htmlnode import LeafNode
+from blocknode import BlockType
 
 class TestBlocknode(unittest.TestCase):
     def test_markdown_to_blocks(self):
@@ -28,6 +30,41 @@ This is the same paragraph on a new line
 
         self.assertListEqual(result, expected)
 
+    def test_markdown_to_located_blocks(self):
+        md = "\n\n# Title\n\n\n\nline one\nline two\n\n- item"
+        result = markdown_to_located_blocks(md)
+        expected = [
+            ("# Title", 3),
+            ("line one\nline two", 7),
+            ("- item", 10),
+        ]
+        self.assertListEqual(result, expected)
+
+    def test_scan_blocks(self):
+        md = "  # Title  \n \nline one\n  line two\t\n"
+        blocks = scan_blocks(md)
+        self.assertEqual(blocks, ["# Title", "line one\n  line two"])
+        self.assertEqual(blocks[1].lines, ["line one", "  line two"])
+        self.assertEqual([block.line for block in blocks], [1, 3])
+
+    def test_fence_with_blank_lines(self):
+        md = "```python\na = 1\n\n\nb = 2\n```\n\nafter"
+        self.assertEqual(markdown_to_located_blocks(md), [
+            ("```python\na = 1\n\n\nb = 2\n```", 1),
+            ("after", 8),
+        ])
+        html = markdown_to_html_node("```\na\n\nb\n```").to_html()
+        self.assertEqual(html, "<div><pre><code>a\n\nb</code></pre></div>")
+
+    def test_unclosed_fence(self):
+        md = "text\n\n```\ncode\n\n# Heading\n\n```a\n\nend"
+        self.assertEqual(markdown_to_blocks(md), [
+            "text", "```\ncode", "# Heading", "```a", "end",
+        ])
+        diagnostics = []
+        markdown_to_html_node(md, diagnostics)
+        self.assertEqual([d.line for d in diagnostics], [3, 8])
+
 class TestBlockToBlockType(unittest.TestCase):
     def test_heading(self):
         text1 = "### test"
@@ -304,4 +341,86 @@ class TestMarkdownToHTMLNode(unittest.TestCase):
         ]
         expected = "\n".join(expected)
         print(expected)
-        self.assertEqual(html, expected)
\ No newline at end of file
+        self.assertEqual(html, expected)
+    
+    def test_escaping(self):
+        md_list = [
+            "A paragraph with 1 < 2 & a [link](/a?b=1&c=2)",
+            "",
+            "```",
+            "<p>html in code</p>",
+            "```",
+            "",
+            "> a quote",
+            "> with <tags>",
+        ]
+
+        md = "\n".join(md_list)
+        node = markdown_to_html_node(md)
+        html = node.to_html()
+        expected = (
+            '<div><p>A paragraph with 1 &lt; 2 &amp; a <a href="/a?b=1&amp;c=2">link</a></p>'
+            "<pre><code>&lt;p&gt;html in code&lt;/p&gt;</code></pre>"
+            "<blockquote>a quote<br>with &lt;tags&gt;</blockquote></div>"
+        )
+        self.assertEqual(html, expected)
+
+    def test_keep_going(self):
+        md_list = [
+            "# Title",
+            "",
+            "some **bold",
+            "",
+            "> ok",
+            "not ok",
+            "",
+            "The end",
+        ]
+
+        md = "\n".join(md_list)
+        with self.assertRaises(SyntaxError):
+            markdown_to_html_node(md)
+
+        diagnostics = []
+        html = markdown_to_html_node(md, diagnostics, first_line=5).to_html()
+        expected = (
+            "<div><h1>Title</h1>"
+            '<pre class="parse-error"><code>some **bold</code></pre>'
+            '<pre class="parse-error"><code>&gt; ok\nnot ok</code></pre>'
+            "<p>The end</p></div>"
+        )
+        self.assertEqual(html, expected)
+        expected_diagnostics = [
+            Diagnostic("invalid Markdown syntax: unpaired delimiter", 7, 6),
+            Diagnostic('Invalid Markdown Syntax: all lines in a quote block must begin with a ">" character', 10, 1),
+        ]
+        self.assertEqual(diagnostics, expected_diagnostics)
+
+
+    def test_heading_ids(self):
+        md = "# Intro\n\n## Getting _started_!\n\ntext\n\n## Getting started\n\n### `pip` install"
+        outline = Outline()
+        html = markdown_to_html_node(md, outline=outline).to_html()
+        self.assertEqual(html, (
+            '<div><h1 id="intro">Intro</h1>'
+            '<h2 id="getting-started">Getting <i>started</i>!</h2>'
+            "<p>text</p>"
+            '<h2 id="getting-started-1">Getting started</h2>'
+            '<h3 id="pip-install"><code>pip</code> install</h3></div>'
+        ))
+        self.assertEqual(outline.headings, [
+            {"level": 1, "text": "Intro", "id": "intro"},
+            {"level": 2, "text": "Getting started!", "id": "getting-started"},
+            {"level": 2, "text": "Getting started", "id": "getting-started-1"},
+            {"level": 3, "text": "pip install", "id": "pip-install"},
+        ])
+        self.assertEqual(outline.title(), "Intro")
+
+    def test_heading_ids_need_outline(self):
+        self.assertEqual(
+            markdown_to_html_node("# Intro").to_html(), "<div><h1>Intro</h1></div>"
+        )
+
+    def test_slugify(self):
+        self.assertEqual(slugify("  Héllo, World "), "héllo-world")
+        self.assertEqual(slugify("?!"), "section")
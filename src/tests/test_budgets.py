@@ -0,0 +1,95 @@
+import json, os, tempfile, unittest
+
+from budgets import BudgetReport, load_budgets, page_stats, tree_stats
+from htmlnode import LeafNode, ParentNode
+from linkcheck import LinkGraph
+from render import PageResult
+
+class TestStats(unittest.TestCase):
+    def test_tree_stats(self):
+        node = ParentNode("div", [
+            ParentNode("p", [LeafNode(None, "a"), LeafNode("b", "c")]),
+            LeafNode("p", "d"),
+        ])
+        self.assertEqual(tree_stats(node), (5, 3))
+
+    def test_page_stats(self):
+        node = ParentNode("div", [LeafNode("img", "", {"src": "/a.png"})])
+        stats = page_stats(
+            node, "<p>é</p>", [("img", "/a.png"), ("a", "/b.html")],
+            '<link href="/index.css" rel="stylesheet" />'
+        )
+        self.assertEqual(stats, {
+            "html_bytes": 9,
+            "nodes": 2,
+            "depth": 2,
+            "images": ["/a.png"],
+            "stylesheets": ["/index.css"],
+        })
+
+class TestBudgetReport(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        self.static = os.path.join(self.root, "static")
+        os.makedirs(os.path.join(self.static, "images"))
+        with open(os.path.join(self.static, "images/a.png"), "wb") as f:
+            f.write(b"x" * 1000)
+        with open(os.path.join(self.static, "index.css"), "w") as f:
+            f.write("body {}")
+        self.link_graph = LinkGraph()
+        self.link_graph.add_static_tree(self.static)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def result(self, src_path="content/blog/post.md"):
+        stats = {
+            "html_bytes": 500,
+            "nodes": 20,
+            "depth": 4,
+            "images": ["../images/a.png", "/images/a.png", "/missing.png"],
+            "stylesheets": ["/index.css"],
+        }
+        return PageResult(src_path, "/blog/post.html", "", stats=stats)
+
+    def test_metrics(self):
+        report = BudgetReport(None, self.static)
+        report.check(self.result(), self.link_graph)
+        self.assertEqual(report.pages["/blog/post.html"], {
+            "html_bytes": 500,
+            "nodes": 20,
+            "depth": 4,
+            "images": 1,
+            "image_bytes": 1000,
+            "stylesheets": 1,
+            "stylesheet_bytes": 7,
+        })
+
+    def test_path_budgets_override_default(self):
+        budgets = {
+            "default": {"image_bytes": 500, "nodes": 10},
+            "paths": {"blog/*": {"image_bytes": 5000}},
+            "severity": "error",
+        }
+        report = BudgetReport(budgets, self.static)
+        result = self.result()
+        report.check(result, self.link_graph)
+        self.assertEqual(len(result.diagnostics), 1)
+        self.assertIn("nodes budget: 20 > 10", result.diagnostics[0].message)
+        self.assertEqual(result.diagnostics[0].severity, "error")
+
+        result = self.result("content/index.md")
+        report.check(result, self.link_graph)
+        self.assertEqual(len(result.diagnostics), 2)
+
+    def test_load_budgets(self):
+        path = os.path.join(self.root, "budgets.json")
+        self.assertIsNone(load_budgets(path))
+        with open(path, "w") as f:
+            json.dump({"default": {"html_bytes": 10}}, f)
+        self.assertEqual(load_budgets(path), {"default": {"html_bytes": 10}})
+        with open(path, "w") as f:
+            json.dump({"paths": {"*": {"weight": 10}}}, f)
+        with self.assertRaises(ValueError):
+            load_budgets(path)
@@ -0,0 +1,254 @@
+import json, os, tempfile, time, unittest
+
+from headers import load_headers
+from builder import Builder
+
+class TestBuilder(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(self.static)
+        with open(os.path.join(self.content, "index.md"), "w") as f:
+            f.write("# Home\n\n[post](/blog/post.html)")
+        with open(os.path.join(self.content, "blog/post.md"), "w") as f:
+            f.write("# Post\n\n[home](/index.html)")
+        with open(os.path.join(self.static, "index.css"), "w") as f:
+            f.write("body {}")
+        with open(os.path.join(self.static, "unused.css"), "w") as f:
+            f.write("")
+        self.template = os.path.join(self.root, "template.html")
+        with open(self.template, "w") as f:
+            f.write('<title>{{ Title }}</title><link href="/index.css" />{{ Content }}')
+        self.docs = os.path.join(self.root, "docs")
+        self.builder = Builder(
+            self.content, self.static, self.template,
+            targets=[("pages", "/site", self.docs)],
+            cache_dir=os.path.join(self.root, "cache")
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_build(self):
+        context = self.builder.build()
+        self.assertEqual(context.diagnostics, [])
+        with open(os.path.join(self.docs, "blog/post.html")) as f:
+            self.assertIn('<a href="/site/index.html">home</a>', f.read())
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "index.css")))
+
+    def test_feed_from_fresh_cache(self):
+        self.builder.site_url = "https://example.com"
+        self.builder.build()
+        with open(os.path.join(self.docs, "blog/atom.xml")) as f:
+            feed = f.read()
+        self.assertEqual(feed.count("<entry>"), 1)
+        self.assertIn("<title>Post</title>", feed)
+
+    def test_build_schedule(self):
+        with open(os.path.join(self.static, "a.png"), "wb") as f:
+            f.write(b"not a png")
+        context = self.builder.build()
+        report = context.schedule.report()
+        names = [task.name for task in context.schedule.tasks]
+        self.assertIn("copy index.css", names)
+        self.assertIn("process a.png", names)
+        self.assertIn("render pages", names)
+        # Pages render while images are processed
+        render = context.schedule.tasks[names.index("render pages")]
+        self.assertFalse([
+            task.name for task in render.deps if task.name.startswith("process")
+        ])
+        self.assertEqual(report["critical_path"][-1]["task"], "write index")
+
+    def test_toc(self):
+        with open(self.template, "w") as f:
+            f.write("<nav>{{ TOC }}</nav>{{ Content }}")
+        with open(os.path.join(self.content, "blog/post.md"), "w") as f:
+            f.write("# Post\n\n## Setup\n\n### Linux\n\n## Usage\n\n[home](/index.html)")
+        self.builder.build()
+        with open(os.path.join(self.docs, "blog/post.html")) as f:
+            self.assertIn(
+                '<nav><ul><li><a href="#setup">Setup</a><ul>'
+                '<li><a href="#linux">Linux</a></li></ul></li>'
+                '<li><a href="#usage">Usage</a></li></ul></nav>',
+                f.read()
+            )
+        with open(os.path.join(self.docs, "toc.json")) as f:
+            outlines = json.load(f)
+        self.assertEqual(outlines["/index.html"], {
+            "title": "Home",
+            "headings": [{"level": 1, "text": "Home", "id": "home"}],
+        })
+        self.assertEqual(
+            [heading["id"] for heading in outlines["/blog/post.html"]["headings"]],
+            ["post", "setup", "linux", "usage"]
+        )
+
+    def test_rebuild_reuses_state(self):
+        self.builder.build()
+        self.builder.build()
+        self.assertGreater(self.builder.snapshot.reused, 0)
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "index.html")))
+
+    def test_render_page(self):
+        result = self.builder.render_page(os.path.join(self.content, "index.md"))
+        self.assertEqual(result.url, "/index.html")
+        self.assertEqual(
+            result.html,
+            '<title>Home</title><link href="/site/index.css" />'
+            '<div><h1 id="home">Home</h1><p><a href="/site/blog/post.html">post</a></p></div>'
+        )
+
+    def test_render_string(self):
+        self.assertEqual(
+            self.builder.render_string("some **bold**"),
+            "<div><p>some <b>bold</b></p></div>"
+        )
+        self.assertEqual(
+            self.builder.render_string("# Preview", full_page=True),
+            '<title>Preview</title><link href="/site/index.css" />'
+            '<div><h1 id="preview">Preview</h1></div>'
+        )
+
+    def test_template_reread_on_change(self):
+        self.assertIn("<title>", self.builder.template_text())
+        with open(self.template, "w") as f:
+            f.write("<h2>{{ Title }}</h2>")
+        # Make sure the mtime moves even on coarse-grained filesystems
+        mtime = time.time() + 10
+        os.utime(self.template, (mtime, mtime))
+        self.assertEqual(self.builder.template_text(), "<h2>{{ Title }}</h2>")
+
+    def test_build_uses_resident_template(self):
+        self.builder.build()
+        stat = os.stat(self.template)
+        with open(self.template, "w") as f:
+            f.write('<TITLE>{{ Title }}</TITLE><link href="/index.css" />{{ Content }}')
+        # Same size and mtime: the template kept by the Builder is used
+        os.utime(self.template, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.builder.build()
+        with open(os.path.join(self.docs, "index.html")) as f:
+            self.assertIn("<title>Home</title>", f.read())
+
+    def test_partial_build(self):
+        self.builder.build()
+        os.remove(os.path.join(self.docs, "index.css"))
+        os.remove(os.path.join(self.docs, "unused.css"))
+        with open(os.path.join(self.content, "blog/post.md"), "w") as f:
+            f.write("# Changed\n\n[home](/index.html)")
+        index_mtime = os.stat(os.path.join(self.docs, "index.html")).st_mtime_ns
+
+        context = self.builder.build(only=[self.content + "/blog/post.md"])
+        self.assertEqual(context.only, {self.content + "/blog/post.md"})
+        with open(os.path.join(self.docs, "blog/post.html")) as f:
+            self.assertIn('<h1 id="changed">Changed</h1>', f.read())
+        # The page's stylesheet is copied back; nothing else is touched
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "index.css")))
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "unused.css")))
+        self.assertEqual(
+            os.stat(os.path.join(self.docs, "index.html")).st_mtime_ns,
+            index_mtime
+        )
+        # Links are checked against the rest of the site
+        self.assertEqual(context.link_graph.check()["broken"], [])
+
+    def test_partial_build_with_backlinks(self):
+        self.builder.build()
+        context = self.builder.build(only=["blog/*"], backlinks=True)
+        self.assertEqual(context.only, {
+            self.content + "/blog/post.md", self.content + "/index.md"
+        })
+
+    def test_partial_build_of_snippet(self):
+        includes_dir = os.path.join(self.root, "includes")
+        os.makedirs(includes_dir)
+        with open(os.path.join(includes_dir, "note.md"), "w") as f:
+            f.write("A note")
+        with open(os.path.join(self.content, "blog/post.md"), "w") as f:
+            f.write("# Post\n\n{{ include note.md }}\n\n[home](/index.html)")
+        builder = Builder(
+            self.content, self.static, self.template,
+            targets=[("pages", "/site", self.docs)],
+            cache_dir=os.path.join(self.root, "cache"), include_root=includes_dir
+        )
+        builder.build()
+        with open(os.path.join(self.docs, "blog/post.html")) as f:
+            self.assertIn("<p>A note</p>", f.read())
+
+        context = builder.build(only=[includes_dir + "/note.md"])
+        self.assertEqual(context.only, {self.content + "/blog/post.md"})
+
+        # An edited snippet rebuilds its dependents along with what was asked
+        with open(os.path.join(includes_dir, "note.md"), "w") as f:
+            f.write("A longer note")
+        context = builder.build(only=[self.content + "/index.md"])
+        self.assertEqual(
+            context.only,
+            {self.content + "/index.md", self.content + "/blog/post.md"}
+        )
+        with open(os.path.join(self.docs, "blog/post.html")) as f:
+            self.assertIn("<p>A longer note</p>", f.read())
+        context = builder.build(only=[self.content + "/index.md"])
+        self.assertEqual(context.only, {self.content + "/index.md"})
+
+    def test_builders_keep_their_own_state(self):
+        builders = []
+        for name in ("a", "b"):
+            includes_dir = os.path.join(self.root, "includes-" + name)
+            os.makedirs(includes_dir)
+            with open(os.path.join(includes_dir, "note.md"), "w") as f:
+                f.write(f"Note {name}")
+            builders.append(Builder(
+                self.content, self.static, self.template,
+                cache_dir=os.path.join(self.root, "cache-" + name),
+                include_root=includes_dir
+            ))
+        src_path = os.path.join(self.content, "blog/post.md")
+        with open(src_path, "w") as f:
+            f.write("# Post\n\n{{ include note.md }}")
+        for name, builder in zip(("a", "b"), builders):
+            self.assertIn(f"<p>Note {name}</p>", builder.render_page(src_path).html)
+
+    def test_worker_processes(self):
+        includes_dir = os.path.join(self.root, "includes")
+        os.makedirs(includes_dir)
+        with open(os.path.join(includes_dir, "note.md"), "w") as f:
+            f.write("A note")
+        with open(os.path.join(self.content, "blog/post.md"), "w") as f:
+            f.write("# Post\n\n{{ include note.md }}")
+        builder = Builder(
+            self.content, self.static, self.template,
+            targets=[("pages", "/site", self.docs)],
+            cache_dir=os.path.join(self.root, "cache"), jobs=2,
+            include_root=includes_dir
+        )
+        context = builder.build()
+        self.assertEqual(context.diagnostics, [])
+        with open(os.path.join(self.docs, "blog/post.html")) as f:
+            self.assertIn("<p>A note</p>", f.read())
+
+    def test_headers(self):
+        self.builder.headers = load_headers(os.path.join(self.root, "headers.json"))
+        self.builder.build()
+        with open(os.path.join(self.docs, "_headers")) as f:
+            text = f.read()
+        self.assertIn(
+            "/site/blog/post.html\n"
+            "  Cache-Control: public, max-age=300\n"
+            "  Link: </site/index.css>; rel=preload; as=style\n",
+            text
+        )
+        self.assertIn(
+            "/site/unused.css\n  Cache-Control: public, max-age=3600\n",
+            text
+        )
+
+    def test_archive_needs_single_target(self):
+        with self.assertRaises(ValueError):
+            Builder(
+                targets=[("a", "/", "a"), ("b", "/", "b")], archive="site.zip",
+                cache_dir=os.path.join(self.root, "cache")
+            )
@@ -0,0 +1,48 @@
+import unittest
+
+from diagnostics import Diagnostic, locate_syntax_error, format_report
+
+class TestDiagnostic(unittest.TestCase):
+    def test_str(self):
+        diagnostic = Diagnostic("bad", 3, 7, "content/a.md")
+        self.assertEqual(str(diagnostic), "content/a.md:3:7: error: bad")
+        diagnostic = Diagnostic("bad", path="content/a.md", severity="warning")
+        self.assertEqual(str(diagnostic), "content/a.md: warning: bad")
+
+    def test_eq(self):
+        self.assertEqual(Diagnostic("bad", 3), Diagnostic("bad", 3))
+        self.assertNotEqual(Diagnostic("bad", 3), Diagnostic("bad", 4))
+        self.assertNotEqual(Diagnostic("bad"), "bad")
+        self.assertNotIn(None, [Diagnostic("bad")])
+
+    def test_format_report(self):
+        diagnostics = [
+            Diagnostic("second", 9, 1, "b.md"),
+            Diagnostic("first", 2, 4, "b.md"),
+            Diagnostic("other", 1, 1, "a.md", "warning"),
+        ]
+        expected = "\n".join([
+            "a.md:1:1: warning: other",
+            "b.md:2:4: error: first",
+            "b.md:9:1: error: second",
+            "2 error(s), 1 warning(s) in 2 file(s)",
+        ])
+        self.assertEqual(format_report(diagnostics), expected)
+
+class TestLocateSyntaxError(unittest.TestCase):
+    def test_locate(self):
+        block = "first line\nsecond **line"
+        error = SyntaxError("unpaired", (None, 1, 8, "second **line"))
+        self.assertEqual(locate_syntax_error(error, block, 10), (11, 8))
+    
+    def test_locate_across_lines(self):
+        # Inline parsing joins lines with spaces
+        block = "one\ntwo **three"
+        error = SyntaxError("unpaired", (None, 1, 9, "one two **three"))
+        self.assertEqual(locate_syntax_error(error, block, 1), (2, 5))
+    
+    def test_locate_without_text(self):
+        self.assertEqual(locate_syntax_error(SyntaxError("x"), "block", 4), (4, 1))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os, tempfile, unittest
+
+from discovery import (
+    DirectorySnapshot, IgnoreRules, PathSelector, load_ignore_patterns
+)
+
+class TestIgnoreRules(unittest.TestCase):
+    def test_defaults(self):
+        rules = IgnoreRules()
+        self.assertTrue(rules.matches("blog/.post.md.swp"))
+        self.assertTrue(rules.matches("post.md~"))
+        self.assertFalse(rules.matches("blog/post.md"))
+
+    def test_patterns(self):
+        rules = IgnoreRules(["drafts/", "blog/*.tmp", "*.bak"])
+        self.assertTrue(rules.matches("drafts", is_dir=True))
+        self.assertTrue(rules.matches("blog/drafts", is_dir=True))
+        self.assertFalse(rules.matches("drafts"))
+        self.assertTrue(rules.matches("blog/a.tmp"))
+        self.assertFalse(rules.matches("a.tmp"))
+        self.assertTrue(rules.matches("x/y/z.bak"))
+
+    def test_load_ignore_patterns(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, ".ssgignore")
+            with open(path, "w") as f:
+                f.write("# comment\n\n*.bak\n  drafts/ \n")
+            self.assertEqual(load_ignore_patterns(path), ["*.bak", "drafts/"])
+            self.assertEqual(load_ignore_patterns(path + "x"), [])
+
+class TestPathSelector(unittest.TestCase):
+    def test_matches(self):
+        selector = PathSelector(["content/blog/tom", "./about.md", "*/x/*.md"])
+        self.assertTrue(selector.matches("blog/tom/index.md"))
+        self.assertTrue(selector.matches("blog/tom/photo.png"))
+        self.assertFalse(selector.matches("blog/tommy/index.md"))
+        self.assertTrue(selector.matches("about.md"))
+        self.assertFalse(selector.matches("blog/about.md"))
+        self.assertTrue(selector.matches("a/x/b.md"))
+        self.assertFalse(selector.matches("a/y/b.md"))
+
+class TestDirectorySnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp_dir.name, "content")
+        for rel_path in ["index.md", "blog/a.md", "blog/.a.md.swp",
+                         "blog/tom/index.md", "drafts/x.md"]:
+            path = os.path.join(self.root, rel_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write("# x")
+        self.cache_path = os.path.join(self.tmp_dir.name, "snapshot.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def snapshot(self):
+        snapshot = DirectorySnapshot(IgnoreRules(["drafts/"]), self.cache_path)
+        snapshot.load()
+        return snapshot
+
+    def touch_dir(self, rel_path):
+        # Step the mtime explicitly; changes within one clock tick can
+        # otherwise leave it unchanged
+        path = os.path.join(self.root, rel_path)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def test_list_files(self):
+        snapshot = self.snapshot()
+        self.assertEqual(
+            snapshot.list_files(self.root),
+            ["blog/a.md", "blog/tom/index.md", "index.md"]
+        )
+        self.assertEqual(snapshot.scanned, 3)
+
+    def test_missing_root(self):
+        self.assertEqual(DirectorySnapshot().list_files(self.root + "x"), [])
+
+    def test_unchanged_dirs_are_reused(self):
+        snapshot = self.snapshot()
+        files = snapshot.list_files(self.root)
+        snapshot.save()
+
+        snapshot = self.snapshot()
+        self.assertEqual(snapshot.list_files(self.root), files)
+        self.assertEqual((snapshot.scanned, snapshot.reused), (0, 3))
+
+        with open(os.path.join(self.root, "blog/b.md"), "w") as f:
+            f.write("# b")
+        self.touch_dir("blog")
+        snapshot = self.snapshot()
+        self.assertIn("blog/b.md", snapshot.list_files(self.root))
+        self.assertEqual((snapshot.scanned, snapshot.reused), (1, 2))
+
+    def test_removed_dir_is_pruned(self):
+        snapshot = self.snapshot()
+        snapshot.list_files(self.root)
+        os.remove(os.path.join(self.root, "blog/tom/index.md"))
+        os.rmdir(os.path.join(self.root, "blog/tom"))
+        self.touch_dir("blog")
+        self.assertEqual(snapshot.list_files(self.root), ["blog/a.md", "index.md"])
+        self.assertNotIn(self.root + "/blog/tom", snapshot.dirs)
+
+    def test_changed_patterns_discard_snapshot(self):
+        snapshot = self.snapshot()
+        snapshot.list_files(self.root)
+        snapshot.save()
+        snapshot = DirectorySnapshot(IgnoreRules(), self.cache_path)
+        snapshot.load()
+        self.assertIn("drafts/x.md", snapshot.list_files(self.root))
+        self.assertEqual(snapshot.reused, 0)
@@ -0,0 +1,80 @@
+import unittest
+
+from blocknode import (
+    BlockType, block_to_block_type, markdown_to_html_node,
+    register_builtin_blocks, text_to_children
+)
+from extensions import ExtensionRegistry
+from htmlnode import ParentNode
+from inlinenode import register_builtin_inlines
+
+def detect_admonition(block, line_list):
+    if line_list[0].startswith(":::"):
+        return "admonition"
+    return None
+
+def admonition_to_html_node(block, registry=None):
+    line_list = block.split("\n")
+    kind = line_list[0][3:].strip()
+    text = "\n".join(line_list[1:])
+    children = text_to_children(text, registry)
+    return ParentNode("aside", children, {"class": kind})
+
+def create_registry():
+    registry = ExtensionRegistry()
+    register_builtin_blocks(registry)
+    register_builtin_inlines(registry)
+    registry.register_block(":", detect_admonition, "admonition", admonition_to_html_node)
+    registry.register_inline("~~", "strikethrough", "del")
+    return registry
+
+class TestExtensionRegistry(unittest.TestCase):
+    def test_detect_block(self):
+        registry = create_registry()
+        self.assertEqual(block_to_block_type("::: note\ntext", registry), "admonition")
+        self.assertEqual(block_to_block_type(": not one", registry), BlockType.PARAGRAPH)
+        self.assertEqual(block_to_block_type("# Heading", registry), BlockType.HEADING)
+    
+    def test_detectors_dispatch_by_leading_char(self):
+        registry = ExtensionRegistry()
+        calls = []
+        def detector(block, line_list):
+            calls.append(block)
+            return None
+        registry.register_block("!", detector, "bang", None)
+        registry.detect_block("no match", ["no match"])
+        self.assertEqual(calls, [])
+        registry.detect_block("!match", ["!match"])
+        self.assertEqual(calls, ["!match"])
+    
+    def test_later_detectors_first(self):
+        registry = create_registry()
+        def detect_note(block, line_list):
+            return "note" if block.startswith("# NOTE") else None
+        registry.register_block("#", detect_note, "note", admonition_to_html_node)
+        self.assertEqual(block_to_block_type("# NOTE hi", registry), "note")
+        self.assertEqual(block_to_block_type("# hi", registry), BlockType.HEADING)
+    
+    def test_inline_delimiters(self):
+        registry = create_registry()
+        delimiters = [delimiter for delimiter, text_type in registry.inline_delimiters()]
+        self.assertEqual(delimiters, ["**", "_", "`", "~~"])
+        self.assertEqual(registry.text_type_tag("strikethrough"), "del")
+    
+    def test_markdown_to_html_node(self):
+        registry = create_registry()
+        md = "::: warning\nThis is **bold** and ~~gone~~\n\nA ~~plain~~ paragraph"
+        html = markdown_to_html_node(md, registry=registry).to_html()
+        expected = (
+            '<div><aside class="warning">This is <b>bold</b> and <del>gone</del></aside>'
+            "<p>A <del>plain</del> paragraph</p></div>"
+        )
+        self.assertEqual(html, expected)
+    
+    def test_builtin_registry_untouched(self):
+        create_registry()
+        html = markdown_to_html_node("A ~~plain~~ paragraph").to_html()
+        self.assertEqual(html, "<div><p>A ~~plain~~ paragraph</p></div>")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import os, tempfile, unittest
+import xml.etree.ElementTree as ElementTree
+
+from feeds import (
+    SiteFeeds, SitemapWriter, absolute_url, entry_updated, w3c_datetime
+)
+from builder import BuildContext, generate_html_tree
+from metadata import MetadataIndex
+from output import MemoryBackend
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+SITEMAP = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+class TestHelpers(unittest.TestCase):
+    def test_absolute_url(self):
+        self.assertEqual(
+            absolute_url("https://example.com/", "/site", "/blog/tom/index.html"),
+            "https://example.com/site/blog/tom/"
+        )
+        self.assertEqual(
+            absolute_url("https://example.com", "", "/about.html"),
+            "https://example.com/about.html"
+        )
+
+    def test_entry_updated(self):
+        self.assertEqual(
+            entry_updated({"date": "2024-05-01", "mtime": 0}),
+            "2024-05-01T00:00:00Z"
+        )
+        self.assertEqual(
+            entry_updated({"date": None, "mtime": 86400 * 10**9}),
+            "1970-01-02T00:00:00Z"
+        )
+        self.assertEqual(w3c_datetime(0), "1970-01-01T00:00:00Z")
+
+    def test_sitemap_writer(self):
+        backend = MemoryBackend("docs")
+        sitemap = SitemapWriter(
+            backend.open_binary("docs/sitemap.xml"), "https://example.com", ""
+        )
+        sitemap.add("/index.html", "2024-01-01T00:00:00Z")
+        sitemap.add("/a&b.html")
+        sitemap.close()
+        root = ElementTree.fromstring(backend.files["sitemap.xml"])
+        locs = [loc.text for loc in root.iter(SITEMAP + "loc")]
+        self.assertEqual(
+            locs, ["https://example.com/", "https://example.com/a&b.html"]
+        )
+        self.assertEqual(len(list(root.iter(SITEMAP + "lastmod"))), 1)
+
+class TestSiteFeeds(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        root = self.tmp_dir.name
+        self.content = os.path.join(root, "content")
+        pages = {
+            "index.md": "# Home",
+            "blog/old.md": "---\ndate: 2023-01-01\n---\n# Old\n\n![x](/x.png)",
+            "blog/new.md": "---\ndate: 2024-01-01\nauthor: Tom\n---\n# New",
+            "blog/newest.md": "---\ndate: 2025-01-01\n---\n# Newest",
+            "blog/draft.md": "---\ndate: 2026-01-01\ndraft: true\n---\n# Draft",
+        }
+        for rel_path, text in pages.items():
+            path = os.path.join(self.content, rel_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(text)
+        self.template = os.path.join(root, "template.html")
+        with open(self.template, "w") as f:
+            f.write("{{ Content }}")
+        self.docs = os.path.join(root, "docs")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def build(self, limit, author=None):
+        index = MetadataIndex()
+        index.update(self.content)
+        backend = MemoryBackend(self.docs)
+        feeds = SiteFeeds(
+            backend, self.docs, "https://example.com", "/site", index,
+            self.content, limit=limit, author=author
+        )
+        context = BuildContext(backend=backend, feeds=feeds)
+        generate_html_tree(self.content, self.template, self.docs, "/site", context)
+        feeds.close()
+        return backend
+
+    def test_sitemap_skips_drafts(self):
+        backend = self.build(2)
+        root = ElementTree.fromstring(backend.files["sitemap.xml"])
+        locs = sorted(loc.text for loc in root.iter(SITEMAP + "loc"))
+        self.assertEqual(locs, [
+            "https://example.com/site/",
+            "https://example.com/site/blog/new.html",
+            "https://example.com/site/blog/newest.html",
+            "https://example.com/site/blog/old.html",
+        ])
+
+    def test_feed_has_latest_posts(self):
+        backend = self.build(2)
+        feed = ElementTree.fromstring(backend.files["blog/atom.xml"])
+        entries = feed.findall(ATOM + "entry")
+        self.assertEqual(
+            [entry.find(ATOM + "title").text for entry in entries],
+            ["Newest", "New"]
+        )
+        self.assertEqual(feed.find(ATOM + "updated").text, "2025-01-01T00:00:00Z")
+        self.assertEqual(
+            entries[0].find(ATOM + "content").text, '<div><h1 id="newest">Newest</h1></div>'
+        )
+
+    def test_feed_links_are_absolute(self):
+        backend = self.build(3)
+        feed = ElementTree.fromstring(backend.files["blog/atom.xml"])
+        content = feed.findall(ATOM + "entry")[2].find(ATOM + "content").text
+        self.assertIn('src="https://example.com/site/x.png"', content)
+
+    def test_feed_authors(self):
+        backend = self.build(2)
+        feed = ElementTree.fromstring(backend.files["blog/atom.xml"])
+        self.assertEqual(
+            feed.find(ATOM + "author/" + ATOM + "name").text, "example.com"
+        )
+        entries = feed.findall(ATOM + "entry")
+        self.assertIsNone(entries[0].find(ATOM + "author"))
+        self.assertEqual(
+            entries[1].find(ATOM + "author/" + ATOM + "name").text, "Tom"
+        )
+        backend = self.build(2, author="Jane")
+        feed = ElementTree.fromstring(backend.files["blog/atom.xml"])
+        self.assertEqual(feed.find(ATOM + "author/" + ATOM + "name").text, "Jane")
+
+    def test_content_kept_for_feed_posts_only(self):
+        index = MetadataIndex()
+        index.update(self.content)
+        feeds = SiteFeeds(
+            MemoryBackend(self.docs), self.docs, "https://example.com", "",
+            index, self.content, limit=1
+        )
+        results = []
+        feeds.add_page = results.append
+        generate_html_tree(
+            self.content, self.template, self.docs, "", BuildContext(
+                backend=MemoryBackend(self.docs), feeds=feeds
+            )
+        )
+        kept = {
+            os.path.basename(result.src_path) for result in results
+            if result.content_html is not None
+        }
+        self.assertEqual(kept, {"newest.md"})
@@ -0,0 +1,109 @@
+import json, os, tempfile, unittest
+
+from headers import (
+    DEFAULT_HEADERS, asset_cache_control, build_headers, fingerprint_regex,
+    load_headers
+)
+from linkcheck import LinkGraph
+
+TEMPLATE = '<link href="/index.css" rel="stylesheet" />{{ Content }}'
+
+class TestHeaders(unittest.TestCase):
+    def setUp(self):
+        self.link_graph = LinkGraph()
+        self.link_graph.add_static_tree(
+            "static", [
+                "index.css", "images/a.png", "images/b.png", "doc.html",
+                "app.3f2a9c1e.js",
+            ]
+        )
+        self.link_graph.add_page("/index.html", [
+            ("a", "/blog/post.html"),
+            ("img", "images/a.png"),
+            ("img", "/images/b.png"),
+        ], set())
+        self.link_graph.add_page("/blog/post.html", [
+            ("img", "https://example.com/x.png"),
+        ], set())
+
+    def test_build_headers(self):
+        text = build_headers(self.link_graph, TEMPLATE, DEFAULT_HEADERS, "/site")
+        self.assertEqual(text, (
+            "/site/blog/post.html\n"
+            "  Cache-Control: public, max-age=300\n"
+            "  Link: </site/index.css>; rel=preload; as=style\n"
+            "/site/\n"
+            "  Cache-Control: public, max-age=300\n"
+            "  Link: </site/index.css>; rel=preload; as=style\n"
+            "  Link: </site/images/a.png>; rel=preload; as=image\n"
+            "/site/index.html\n"
+            "  Cache-Control: public, max-age=300\n"
+            "  Link: </site/index.css>; rel=preload; as=style\n"
+            "  Link: </site/images/a.png>; rel=preload; as=image\n"
+            "/site/app.3f2a9c1e.js\n"
+            "  Cache-Control: public, max-age=31536000, immutable\n"
+            "/site/doc.html\n"
+            "  Cache-Control: public, max-age=300\n"
+            "/site/images/a.png\n"
+            "  Cache-Control: public, max-age=3600\n"
+            "/site/images/b.png\n"
+            "  Cache-Control: public, max-age=3600\n"
+            "/site/index.css\n"
+            "  Cache-Control: public, max-age=3600\n"
+        ))
+
+    def test_immutable_directory(self):
+        long_policy = "public, max-age=31536000, immutable"
+        config = dict(
+            DEFAULT_HEADERS,
+            assets={"/": "public, max-age=3600", "/images/": long_policy}
+        )
+        text = build_headers(self.link_graph, TEMPLATE, config)
+        self.assertIn(f"/images/a.png\n  Cache-Control: {long_policy}\n", text)
+        self.assertIn("/index.css\n  Cache-Control: public, max-age=3600\n", text)
+
+    def test_image_variants(self):
+        config = dict(DEFAULT_HEADERS, preload_images=2)
+        text = build_headers(
+            self.link_graph, TEMPLATE, config,
+            image_variants={"/images/b.png": (960, [480])}
+        )
+        self.assertIn(
+            '  Link: </images/b.png>; rel=preload; as=image; '
+            'imagesrcset="/images/b-480w.png 480w, /images/b.png 960w"\n',
+            text
+        )
+        self.assertIn("/images/b-480w.png\n  Cache-Control: public, max-age=3600", text)
+
+    def test_fingerprint_regex(self):
+        for url in ("/app.3f2a9c1e.css", "/images/logo-3f2a9c1e8b.png"):
+            self.assertTrue(fingerprint_regex.search(url), url)
+        for url in ("/index.css", "/images/b-480w.png", "/a.3f2a.css", "/3f2a9c1e4/a.css"):
+            self.assertFalse(fingerprint_regex.search(url), url)
+
+    def test_asset_cache_control(self):
+        assets = {"/": "long", "images": "images", "/images/icons/": "icons"}
+        self.assertEqual(asset_cache_control("/index.css", assets), "long")
+        self.assertEqual(asset_cache_control("/images/a.png", assets), "images")
+        self.assertEqual(asset_cache_control("/images/icons/a.svg", assets), "icons")
+        self.assertEqual(asset_cache_control("/imagesx.png", assets), "long")
+        self.assertIsNone(asset_cache_control("/index.css", {"/images/": "x"}))
+
+    def test_load_headers(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "headers.json")
+            self.assertEqual(load_headers(path), DEFAULT_HEADERS)
+            with open(path, "w") as f:
+                json.dump({"html": "no-cache"}, f)
+            config = load_headers(path)
+            self.assertEqual(config["html"], "no-cache")
+            self.assertEqual(config["assets"], DEFAULT_HEADERS["assets"])
+            for bad in (
+                [], {"ttl": 1}, {"assets": {"/": 1}}, {"fingerprinted": None},
+                {"preload_images": "1"},
+            ):
+                with self.subTest(bad=bad):
+                    with open(path, "w") as f:
+                        json.dump(bad, f)
+                    with self.assertRaises(ValueError):
+                        load_headers(path)
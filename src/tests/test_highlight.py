@@ -0,0 +1,79 @@
+import os, tempfile, unittest
+
+from blocknode import markdown_to_html_node
+from highlight import HighlightCache, normalize_language, tokenize
+
+class TestNormalizeLanguage(unittest.TestCase):
+    def test_normalize_language(self):
+        self.assertEqual(normalize_language("python"), "python")
+        self.assertEqual(normalize_language("Py title=example.py"), "python")
+        self.assertEqual(normalize_language("bash"), "shell")
+        self.assertEqual(normalize_language("cobol"), None)
+        self.assertEqual(normalize_language(""), None)
+
+class TestTokenize(unittest.TestCase):
+    def test_python(self):
+        result = tokenize('if x < 1:  # note\n    print("<b>")', "python")
+        expected = (
+            '<span class="k">if</span> x &lt; <span class="m">1</span>:  '
+            '<span class="c"># note</span>\n    <span class="nb">print</span>'
+            '(<span class="s">"&lt;b&gt;"</span>)'
+        )
+        self.assertEqual(result, expected)
+    
+    def test_javascript(self):
+        result = tokenize("const s = `a`; // done", "javascript")
+        expected = (
+            '<span class="k">const</span> s = <span class="s">`a`</span>; '
+            '<span class="c">// done</span>'
+        )
+        self.assertEqual(result, expected)
+    
+    def test_json(self):
+        result = tokenize('{"a": null}', "json")
+        expected = '{<span class="p">"a"</span>: <span class="k">null</span>}'
+        self.assertEqual(result, expected)
+
+class TestHighlightCache(unittest.TestCase):
+    def test_memory_cache(self):
+        cache = HighlightCache()
+        first = cache.highlight("x = 1", "python")
+        second = cache.highlight("x = 1", "python")
+        self.assertEqual(first, second)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.highlight("x = 1", "javascript")
+        self.assertEqual(cache.misses, 2)
+    
+    def test_disk_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = HighlightCache(cache_dir)
+            html = cache.highlight("x = 1", "python")
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+            # A new process starts with an empty memory cache
+            cache = HighlightCache(cache_dir)
+            self.assertEqual(cache.highlight("x = 1", "python"), html)
+            self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+class TestCodeBlock(unittest.TestCase):
+    def test_info_string(self):
+        md = "```python\nreturn None\n```"
+        html = markdown_to_html_node(md).to_html()
+        expected = (
+            '<div><pre><code class="language-python"><span class="k">return</span> '
+            '<span class="k">None</span></code></pre></div>'
+        )
+        self.assertEqual(html, expected)
+    
+    def test_unknown_language(self):
+        md = "```cobol\nDISPLAY 'HI'.\n```"
+        html = markdown_to_html_node(md).to_html()
+        self.assertEqual(html, "<div><pre><code>DISPLAY 'HI'.</code></pre></div>")
+    
+    def test_no_info_string(self):
+        md = "```\n<b>plain</b>\n```"
+        html = markdown_to_html_node(md).to_html()
+        self.assertEqual(html, "<div><pre><code>&lt;b&gt;plain&lt;/b&gt;</code></pre></div>")
+
+if __name__ == "__main__":
+    unittest.main()
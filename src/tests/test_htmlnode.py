@@ -1,5 +1,7 @@
 import unittest
-from src.htmlnode import HTMLNode, LeafNode, ParentNode
+from htmlnode import (
+    HTMLNode, LeafNode, ParentNode, escape_text, escape_attribute
+)
 
 class TestHTMLNode(unittest.TestCase):
     def test_props_to_html(self):
@@ -22,6 +24,27 @@ class TestHTMLNode(unittest.TestCase):
         )
         self.assertEqual(node4.props_to_html(), "")
 
+    def test_props_to_html_escapes_values(self):
+        node = HTMLNode(tag="img", props={"alt": 'a "quoted" <b> & more'})
+        self.assertEqual(
+            node.props_to_html(),
+            'alt="a &quot;quoted&quot; &lt;b&gt; &amp; more"'
+        )
+
+class TestEscape(unittest.TestCase):
+    def test_escape_text(self):
+        self.assertEqual(escape_text("1 < 2 && 3 > 2"), "1 &lt; 2 &amp;&amp; 3 &gt; 2")
+        self.assertEqual(escape_text('"quotes" stay'), '"quotes" stay')
+    
+    def test_escape_text_fast_path(self):
+        text = "nothing to escape here"
+        self.assertIs(escape_text(text), text)
+    
+    def test_escape_attribute(self):
+        self.assertEqual(escape_attribute('say "hi" & <go>'), "say &quot;hi&quot; &amp; &lt;go&gt;")
+        value = "https://www.google.com"
+        self.assertIs(escape_attribute(value), value)
+
 class TestLeafNode(unittest.TestCase):
     def test_leaf_to_html_p(self):
         node = LeafNode("p", "Hello, world!")
@@ -33,6 +56,17 @@ class TestLeafNode(unittest.TestCase):
             node.to_html(), 
             '<a href="https://www.google.com">Click me!</a>'
         )
+    
+    def test_leaf_to_html_escapes_value(self):
+        node = LeafNode("code", "<div>&nbsp;</div>")
+        self.assertEqual(
+            node.to_html(), "<code>&lt;div&gt;&amp;nbsp;&lt;/div&gt;</code>"
+        )
+    
+    def test_leaf_to_html_void(self):
+        node = LeafNode("img", "", {"src": "a.png", "alt": "x"})
+        self.assertEqual(node.to_html(), '<img src="a.png" alt="x">')
+        self.assertEqual(LeafNode("br", "").to_html(), "<br>")
 
 class TestParentNode(unittest.TestCase):
     def test_to_html_with_children(self):
@@ -0,0 +1,184 @@
+import os, struct, tempfile, unittest, zlib
+
+from extensions import ExtensionRegistry
+from images import (
+    Image, ImageCache, exif_orientation, optimize_png,
+    png_width, read_png_chunks, srcset, strip_jpeg_metadata, variant_name,
+    write_png_chunks
+)
+from render import apply_template
+from textnode import TextNode, TextType, text_node_to_html_node
+
+def make_png(width=4, height=2, extra_chunks=()):
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    # Filter byte 0 then RGB pixels for each row
+    raw = b"".join(b"\x00" + b"\x10\x20\x30" * width for _ in range(height))
+    image_data = zlib.compress(raw, 0)
+    return write_png_chunks([
+        (b"IHDR", header),
+        *extra_chunks,
+        (b"IDAT", image_data[:10]),
+        (b"IDAT", image_data[10:]),
+        (b"IEND", b""),
+    ])
+
+def pixels(data):
+    return zlib.decompress(b"".join(
+        chunk_data for chunk_type, chunk_data in read_png_chunks(data)
+        if chunk_type == b"IDAT"
+    ))
+
+class TestOptimizePng(unittest.TestCase):
+    def test_strips_metadata_losslessly(self):
+        data = make_png(extra_chunks=[
+            (b"tEXt", b"Comment\x00" + b"x" * 100),
+            (b"sRGB", b"\x00"),
+        ])
+        optimized = optimize_png(data)
+        self.assertLess(len(optimized), len(data))
+        chunk_types = [chunk_type for chunk_type, _ in read_png_chunks(optimized)]
+        self.assertEqual(chunk_types, [b"IHDR", b"sRGB", b"IDAT", b"IEND"])
+        self.assertEqual(pixels(optimized), pixels(data))
+
+    def test_animated_png_untouched(self):
+        data = make_png(extra_chunks=[(b"acTL", b"\x00" * 8)])
+        self.assertEqual(optimize_png(data), data)
+
+    def test_invalid_png(self):
+        with self.assertRaises(ValueError):
+            optimize_png(b"GIF89a")
+        with self.assertRaises(ValueError):
+            optimize_png(make_png()[:-20])
+
+    def test_png_width(self):
+        self.assertEqual(png_width(make_png(width=7)), 7)
+
+def jpeg_segment(marker, payload):
+    return bytes([0xFF, marker]) + struct.pack(">H", len(payload) + 2) + payload
+
+def make_exif(orientation):
+    # Little-endian TIFF with the orientation and a GPS IFD pointer
+    entries = [(0x0112, 3, 1, orientation), (0x8825, 4, 1, 38)]
+    tiff = b"II\x2a\x00" + struct.pack("<IH", 8, len(entries))
+    for tag, value_type, count, value in entries:
+        tiff += struct.pack("<HHII", tag, value_type, count, value)
+    return b"Exif\x00\x00" + tiff + struct.pack("<I", 0) + b"GPS 51.5N 0.1W"
+
+def make_jpeg(*segments):
+    scan = jpeg_segment(0xDA, b"\x01\x02\x03") + b"\x12\x34\xff\x00\x56"
+    return b"\xff\xd8" + b"".join(segments) + scan + b"\xff\xd9"
+
+class TestStripJpegMetadata(unittest.TestCase):
+    def test_strips_metadata_losslessly(self):
+        jfif = jpeg_segment(0xE0, b"JFIF\x00\x01\x01")
+        quantization = jpeg_segment(0xDB, b"\x00" * 65)
+        data = make_jpeg(
+            jfif, jpeg_segment(0xE1, make_exif(1)),
+            jpeg_segment(0xFE, b"taken by me"), quantization
+        )
+        self.assertEqual(strip_jpeg_metadata(data), make_jpeg(jfif, quantization))
+
+    def test_keeps_orientation(self):
+        data = make_jpeg(jpeg_segment(0xE1, make_exif(6)))
+        stripped = strip_jpeg_metadata(data)
+        self.assertNotIn(b"GPS", stripped)
+        self.assertEqual(stripped[2:4], b"\xff\xe1")
+        self.assertEqual(exif_orientation(stripped[12:]), 6)
+        self.assertTrue(stripped.endswith(data[-14:]))
+
+    def test_without_metadata(self):
+        data = make_jpeg(jpeg_segment(0xE0, b"JFIF\x00\x01\x01"))
+        self.assertEqual(strip_jpeg_metadata(data), data)
+
+    def test_invalid_jpeg(self):
+        with self.assertRaises(ValueError):
+            strip_jpeg_metadata(b"GIF89a")
+        with self.assertRaises(ValueError):
+            strip_jpeg_metadata(b"\xff\xd8\xff\xe1\x10\x00Exif")
+
+    def test_processed(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            src_path = os.path.join(tmp_dir, "a.jpg")
+            with open(src_path, "wb") as f:
+                f.write(make_jpeg(jpeg_segment(0xE1, make_exif(1))))
+            processed = ImageCache().process(src_path)
+            self.assertEqual(processed.data, make_jpeg())
+
+class TestImageCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.src_path = os.path.join(self.tmp_dir.name, "a.png")
+        with open(self.src_path, "wb") as f:
+            f.write(make_png(extra_chunks=[(b"tEXt", b"a\x00b" * 50)]))
+        self.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_cached_by_content(self):
+        processed = ImageCache(self.cache_dir).process(self.src_path)
+        self.assertEqual(processed.width, 4)
+
+        cache = ImageCache(self.cache_dir)
+        self.assertEqual(cache.process(self.src_path).data, processed.data)
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+        with open(self.src_path, "wb") as f:
+            f.write(make_png(width=5))
+        self.assertEqual(cache.process(self.src_path).width, 5)
+        self.assertEqual(cache.misses, 1)
+
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_variants(self):
+        with open(self.src_path, "wb") as f:
+            f.write(make_png(width=1000, height=10))
+        processed = ImageCache(self.cache_dir, [480, 960, 1600]).process(
+            self.src_path
+        )
+        self.assertEqual(sorted(processed.variants), [480, 960])
+
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_plan_matches_process(self):
+        with open(self.src_path, "wb") as f:
+            f.write(make_png(width=1000, height=10))
+        cache = ImageCache(self.cache_dir, [480, 960, 1600])
+        self.assertEqual(cache.plan(self.src_path), (1000, [480, 960]))
+        processed = cache.process(self.src_path)
+        self.assertEqual(
+            cache.plan(self.src_path),
+            (processed.width, sorted(processed.variants))
+        )
+
+    @unittest.skipIf(Image is not None, "Pillow is installed")
+    def test_plan_without_pillow(self):
+        self.assertEqual(ImageCache(self.cache_dir).plan(self.src_path), (None, []))
+
+class TestSrcset(unittest.TestCase):
+    def test_variant_name(self):
+        self.assertEqual(variant_name("images/tom.png", 480), "images/tom-480w.png")
+
+    def test_srcset(self):
+        variants = {"/images/tom.png": (2000, [480, 960])}
+        self.assertEqual(
+            srcset("/images/tom.png", variants),
+            "/images/tom-480w.png 480w, /images/tom-960w.png 960w, "
+            "/images/tom.png 2000w"
+        )
+        self.assertIsNone(srcset("/images/other.png", variants))
+        self.assertIsNone(srcset("/images/tom.png"))
+        registry = ExtensionRegistry()
+        registry.image_variants = variants
+        node = text_node_to_html_node(
+            TextNode("Tom", TextType.IMAGE, "/images/tom.png"), registry
+        )
+        self.assertIn('srcset="/images/tom-480w.png 480w', node.to_html())
+
+    def test_apply_template_prefixes_srcset(self):
+        html = apply_template(
+            "{{ Content }}", "T",
+            '<img src="/a.png" srcset="/a-480w.png 480w, b.png 960w">', "/site"
+        )
+        self.assertEqual(
+            html,
+            '<img src="/site/a.png" srcset="/site/a-480w.png 480w, b.png 960w">'
+        )
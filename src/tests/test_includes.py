@@ -0,0 +1,130 @@
+import os, tempfile, unittest
+
+from blocknode import Outline, markdown_to_html_node
+from includes import IncludeIndex, IncludeResolver, PageIncludes
+from linkcheck import collect_references
+
+class TestIncludes(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        self.write("install.md", "Run `make`.\n\nSee [the docs](/docs.html).")
+        self.write("warning.md", "> Careful\n\n{{ include install.md }}")
+        self.resolver = IncludeResolver(self.root)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.root, name)
+        with open(path, "w") as f:
+            f.write(text)
+        # Step the mtime explicitly; writes within one clock tick can
+        # otherwise leave it unchanged
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def render(self, markdown, outline=None):
+        page_includes = PageIncludes(self.resolver)
+        node = markdown_to_html_node(
+            markdown, outline=outline, includes=page_includes
+        )
+        return node, page_includes.used
+
+    def test_include(self):
+        node, used = self.render("# Page\n\n{{ include install.md }}\n\nEnd")
+        self.assertEqual(node.to_html(), (
+            "<div><h1>Page</h1><p>Run <code>make</code>.</p>"
+            '<p>See <a href="/docs.html">the docs</a>.</p><p>End</p></div>'
+        ))
+        self.assertEqual(list(used), ["install.md"])
+        # Links in the snippet belong to the page
+        self.assertEqual(collect_references(node)[0], [("a", "/docs.html")])
+
+    def test_rendered_once(self):
+        self.render("{{ include install.md }}")
+        self.render("{{ include install.md }}\n\n{{ include install.md }}")
+        self.assertEqual(self.resolver.renders, 1)
+        self.write("install.md", "Run `make install`.")
+        node, used = self.render("{{ include install.md }}")
+        self.assertIn("make install", node.to_html())
+        self.assertEqual(self.resolver.renders, 2)
+
+    def test_nested_include(self):
+        node, used = self.render("{{ include warning.md }}")
+        self.assertIn("<blockquote>Careful</blockquote><p>Run", node.to_html())
+        self.assertEqual(set(used), {"warning.md", "install.md"})
+        # Editing the inner snippet invalidates the outer one
+        self.assertFalse(self.resolver.changed(used))
+        self.write("install.md", "Run `make all`.")
+        self.assertTrue(self.resolver.changed(used))
+        node, used = self.render("{{ include warning.md }}")
+        self.assertIn("make all", node.to_html())
+
+    def test_headings_join_page_outline(self):
+        self.write("steps.md", "## Install\n\nRun it\n\n{{ include nested.md }}")
+        self.write("nested.md", "### Install\n\nAgain")
+        outline = Outline()
+        node, used = self.render(
+            "# Page\n\n## Install\n\n{{ include steps.md }}", outline
+        )
+        html = node.to_html()
+        self.assertIn('<h2 id="install-1">Install</h2><p>Run it</p>', html)
+        self.assertIn('<h3 id="install-2">Install</h3><p>Again</p>', html)
+        self.assertEqual(
+            [heading["id"] for heading in outline.headings],
+            ["page", "install", "install-1", "install-2"]
+        )
+        # The cached snippet is left without ids for the next page
+        node, used = self.render("{{ include steps.md }}", Outline())
+        self.assertIn('<h2 id="install">Install</h2>', node.to_html())
+        self.assertEqual(self.resolver.renders, 2)
+
+    def test_invalid_includes(self):
+        self.write("loop.md", "{{ include loop.md }}")
+        for name in ("missing.md", "../secret.md", "loop.md"):
+            with self.subTest(name):
+                with self.assertRaises(SyntaxError):
+                    self.render("{{ include " + name + " }}")
+
+    def test_without_resolver(self):
+        self.assertEqual(
+            markdown_to_html_node("{{ include install.md }}").to_html(),
+            "<div><p>{{ include install.md }}</p></div>"
+        )
+
+class TestIncludeIndex(unittest.TestCase):
+    def test_dependents(self):
+        index = IncludeIndex()
+        index.add_page("content/a.md", {"install.md": (1, 2)})
+        index.add_page("content/b.md", {"install.md": (1, 2), "warning.md": (3, 4)})
+        index.add_page("content/c.md", {})
+        self.assertEqual(index.dependents({"warning.md"}), {"content/b.md"})
+        self.assertEqual(
+            index.dependents({"install.md"}), {"content/a.md", "content/b.md"}
+        )
+        self.assertEqual(index.snippets(), {"install.md", "warning.md"})
+        # A page that stops including snippets leaves the index
+        index.add_page("content/a.md", {})
+        self.assertEqual(index.dependents({"install.md"}), {"content/b.md"})
+
+    def test_stale(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "install.md")
+            with open(path, "w") as f:
+                f.write("Run it")
+            resolver = IncludeResolver(tmp_dir)
+            index = IncludeIndex()
+            index.add_page("content/a.md", {"install.md": resolver.stat_key("install.md")})
+            index.add_page("content/b.md", {"install.md": (1, 2)})
+            self.assertEqual(index.stale(resolver), {"content/b.md"})
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "includes.json")
+            index = IncludeIndex(path)
+            index.add_page("content/a.md", {"install.md": (1, 2)})
+            index.save()
+            loaded = IncludeIndex(path)
+            loaded.load()
+            self.assertEqual(loaded.dependents({"install.md"}), {"content/a.md"})
@@ -1,7 +1,7 @@
 import unittest
 
-from src.textnode import TextNode, TextType
-from src.inlinenode import (
+from textnode import TextNode, TextType
+from inlinenode import (
     split_nodes_delimiter, split_multi_delimiters,
     extract_markdown_images, extract_markdown_links,
     split_nodes_image, split_nodes_links, text_to_textnodes
@@ -0,0 +1,126 @@
+import os, tempfile, unittest
+
+from blocknode import markdown_to_html_node
+from htmlnode import LeafNode, ParentNode
+from linkcheck import LinkGraph, collect_references, page_url
+from render import add_prefetch_hints
+
+class TestCollectReferences(unittest.TestCase):
+    def test_collect_references(self):
+        md = "[home](/) and ![pic](/images/a.png)\n\n- [post](/blog/post#intro)"
+        references, anchors = collect_references(markdown_to_html_node(md))
+        expected = [
+            ("a", "/"),
+            ("img", "/images/a.png"),
+            ("a", "/blog/post#intro"),
+        ]
+        self.assertEqual(references, expected)
+        self.assertEqual(anchors, set())
+    
+    def test_collect_anchors(self):
+        node = ParentNode("div", [
+            LeafNode("h2", "Intro", {"id": "intro"}),
+        ])
+        self.assertEqual(collect_references(node), ([], {"intro"}))
+
+class TestPageUrl(unittest.TestCase):
+    def test_page_url(self):
+        self.assertEqual(page_url("content/index.md", "content"), "/index.html")
+        self.assertEqual(
+            page_url("content/blog/tom/index.md", "content"),
+            "/blog/tom/index.html"
+        )
+
+class TestLinkGraph(unittest.TestCase):
+    def setUp(self):
+        self.graph = LinkGraph()
+        self.graph.assets = {"/images/a.png", "/index.css"}
+        self.graph.add_page("/index.html", [
+            ("a", "/blog/post"),
+            ("a", "https://example.com/missing"),
+            ("img", "/images/a.png"),
+            ("img", "/images/missing.png"),
+        ], set())
+        self.graph.add_page("/blog/post/index.html", [
+            ("a", "/"),
+            ("a", "#intro"),
+            ("a", "../../other.html#nowhere"),
+            ("a", "/blog/gone/"),
+        ], {"intro"})
+        self.graph.add_page("/other.html", [], set())
+        self.graph.add_page("/lonely.html", [("a", "lonely.html")], set())
+
+    def test_resolve(self):
+        page = "/blog/post/index.html"
+        self.assertEqual(self.graph.resolve(page, "/"), ("/index.html", ""))
+        self.assertEqual(
+            self.graph.resolve(page, "./#intro"), (page, "intro")
+        )
+        self.assertEqual(
+            self.graph.resolve(page, "/images/a.png?v=2"), ("/images/a.png", "")
+        )
+        self.assertEqual(self.graph.resolve(page, "mailto:a@b.c"), (None, None))
+        self.assertEqual(self.graph.resolve(page, "//cdn.example.com/x"), (None, None))
+
+    def test_check(self):
+        report = self.graph.check()
+        expected_broken = [
+            {"page": "/index.html", "url": "/images/missing.png", "reason": "missing image"},
+            {"page": "/blog/post/index.html", "url": "../../other.html#nowhere", "reason": "missing anchor"},
+            {"page": "/blog/post/index.html", "url": "/blog/gone/", "reason": "missing page"},
+        ]
+        self.assertEqual(report["broken"], expected_broken)
+        self.assertEqual(report["orphans"], ["/lonely.html"])
+
+    def test_backlinks(self):
+        self.assertEqual(
+            self.graph.backlinks({"/blog/post/index.html"}), {"/index.html"}
+        )
+        self.assertEqual(
+            self.graph.backlinks({"/images/a.png", "/lonely.html"}),
+            {"/index.html"}
+        )
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "cache/links.json")
+            self.graph.save(path)
+            graph = LinkGraph()
+            graph.load(path)
+            graph.load(path + "x")
+        self.assertEqual(graph.pages, self.graph.pages)
+        self.assertEqual(graph.anchors, self.graph.anchors)
+        self.assertEqual(graph.assets, self.graph.assets)
+
+class TestPrefetch(unittest.TestCase):
+    def test_prefetch_targets(self):
+        graph = LinkGraph()
+        graph.add_page("/index.html", [
+            ("a", "/b.html"),
+            ("a", "/a.html#top"),
+            ("a", "/b.html"),
+            ("a", "/index.html"),
+            ("img", "/c.html"),
+        ], set())
+        graph.add_page("/a.html", [("a", "c.html"), ("a", "/")], set())
+        graph.add_page("/b.html", [("a", "/a.html")], set())
+        graph.add_page("/c.html", [("a", "/missing.html")], set())
+        targets = graph.prefetch_targets(2)
+        # /a.html has two inbound links, /b.html one
+        self.assertEqual(targets["/index.html"], ["/a.html", "/b.html"])
+        self.assertEqual(targets["/a.html"], ["c.html", "/"])
+        self.assertEqual(targets["/c.html"], [])
+        self.assertEqual(graph.prefetch_targets(1)["/index.html"], ["/a.html"])
+
+    def test_add_prefetch_hints(self):
+        html = "<head><title>x</title></head><body></body>"
+        self.assertEqual(
+            add_prefetch_hints(html, ["/a.html", "b.html"], "/site"),
+            '<head><title>x</title><link rel="prefetch" href="/site/a.html" />\n'
+            '<link rel="prefetch" href="b.html" />\n</head><body></body>'
+        )
+        self.assertEqual(add_prefetch_hints(html, [], "/site"), html)
+        self.assertEqual(add_prefetch_hints("<p></p>", ["/a"], ""), "<p></p>")
+
+if __name__ == "__main__":
+    unittest.main()
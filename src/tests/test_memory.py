@@ -0,0 +1,86 @@
+import os, tempfile, unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from memory import (
+    MemoryBudget, format_size, parse_size, render_bounded
+)
+from render import PageResult, render_page
+
+class TestSizes(unittest.TestCase):
+    def test_parse_size(self):
+        self.assertEqual(parse_size("65536"), 65536)
+        self.assertEqual(parse_size("512M"), 512 << 20)
+        self.assertEqual(parse_size("1.5G"), 3 << 29)
+        self.assertEqual(parse_size("64KiB"), 64 << 10)
+        with self.assertRaises(ValueError):
+            parse_size("lots")
+
+    def test_format_size(self):
+        self.assertEqual(format_size(512), "512 B")
+        self.assertEqual(format_size(3 << 19), "1.5 MiB")
+
+class TestMemoryBudget(unittest.TestCase):
+    def test_record_learns_ratio(self):
+        budget = MemoryBudget(1 << 20)
+        result = PageResult("big.md", "/big.html", "", peak_memory=800000)
+        budget.record(result, 10000)
+        self.assertEqual(budget.ratio, 80)
+        self.assertEqual(budget.estimate(1000), 80000)
+        self.assertEqual(result.diagnostics, [])
+
+    def test_record_over_budget_warns(self):
+        budget = MemoryBudget(1000)
+        result = PageResult("a.md", "/a.html", "", peak_memory=5000)
+        budget.record(result, 100)
+        self.assertEqual(result.diagnostics[0].severity, "warning")
+        self.assertEqual(budget.report()["peaks"], {"a.md": 5000})
+
+    def test_render_page_tracks_memory(self):
+        with tempfile.TemporaryDirectory() as root:
+            src_path = os.path.join(root, "index.md")
+            with open(src_path, "w") as f:
+                f.write("# Title\n\n" + "Some **bold** text.\n\n" * 200)
+            result = render_page(src_path, "{{ Content }}", "", root)
+            self.assertIsNone(result.peak_memory)
+            result = render_page(
+                src_path, "{{ Content }}", "", root, track_memory=True
+            )
+            self.assertGreater(result.peak_memory, 0)
+
+class TestRenderBounded(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        self.page_list = []
+        for name, paragraphs in [("a", 1), ("huge", 2000), ("b", 1), ("c", 1)]:
+            src_path = os.path.join(self.root, name + ".md")
+            with open(src_path, "w") as f:
+                f.write("# Title\n\n" + "Some text.\n\n" * paragraphs)
+            self.page_list.append((src_path, name + ".html"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def render_all(self, budget):
+        render_args = ("{{ Content }}", "", self.root, False)
+        with ThreadPoolExecutor(1) as executor:
+            return list(render_bounded(
+                executor, self.page_list, budget, render_args
+            ))
+
+    def test_large_page_is_rendered_serially(self):
+        # Room for several small pages, but not for "huge"
+        budget = MemoryBudget(100000, jobs=4)
+        rendered = self.render_all(budget)
+        self.assertEqual(len(rendered), 4)
+        self.assertEqual(rendered[-1][1], "huge.html")
+        self.assertEqual(budget.serial, [self.page_list[1][0]])
+        self.assertGreater(budget.max_concurrency, 1)
+        self.assertEqual(len(budget.peaks), 4)
+
+    def test_tight_budget_limits_concurrency(self):
+        # Each small page's estimate uses most of the budget
+        budget = MemoryBudget(1000, jobs=4)
+        rendered = self.render_all(budget)
+        self.assertEqual(len(rendered), 4)
+        self.assertEqual(budget.max_concurrency, 1)
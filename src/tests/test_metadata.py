@@ -0,0 +1,121 @@
+import os, tempfile, unittest
+
+from metadata import (
+    parse_front_matter, split_front_matter, read_page_metadata, MetadataIndex
+)
+
+class TestFrontMatter(unittest.TestCase):
+    def test_parse_front_matter(self):
+        lines = [
+            "title: \"Hello: World\"",
+            "date: 2024-05-01",
+            "draft: true",
+            "tags: [tolkien, elves]",
+        ]
+        result = parse_front_matter(lines)
+        expected = {
+            "title": "Hello: World",
+            "date": "2024-05-01",
+            "draft": True,
+            "tags": ["tolkien", "elves"],
+        }
+        self.assertEqual(result, expected)
+    
+    def test_parse_block_list(self):
+        lines = [
+            "tags:",
+            "- one",
+            "- two",
+        ]
+        self.assertEqual(parse_front_matter(lines), {"tags": ["one", "two"]})
+    
+    def test_parse_invalid(self):
+        with self.assertRaises(SyntaxError):
+            parse_front_matter(["not a key"])
+    
+    def test_parse_non_string_date(self):
+        with self.assertRaises(SyntaxError):
+            parse_front_matter(["date: yes"])
+        diagnostics = []
+        lines = ["title: T", "date: [a]", "author: no"]
+        self.assertEqual(parse_front_matter(lines, diagnostics), {"title": "T"})
+        self.assertEqual(
+            [(d.line, d.message) for d in diagnostics],
+            [
+                (3, "Front matter date must be text, not ['a']"),
+                (4, "Front matter author must be text, not False"),
+            ]
+        )
+
+    def test_split_front_matter(self):
+        md = "---\ntitle: Hi\n---\n# Heading\n\nbody"
+        metadata, body = split_front_matter(md)
+        self.assertEqual(metadata, {"title": "Hi"})
+        self.assertEqual(body, "# Heading\n\nbody")
+    
+    def test_split_no_front_matter(self):
+        md = "# Heading\n\n---\n"
+        self.assertEqual(split_front_matter(md), ({}, md))
+
+class TestMetadataIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        self.write("a.md", "---\ndate: 2024-01-01\ntags: [x]\n---\n# A\n")
+        self.write("b.md", "---\ntitle: B\ndate: 2024-03-01\ntags: [x, y]\n---\nbody\n")
+        self.write("c.md", "---\ndate: 2024-02-01\ntags: [y]\ndraft: true\n---\n# C\n")
+        self.write("sub/d.md", "intro\n\n# D\n\nbody\n")
+    
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+    
+    def write(self, name, text):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+    
+    def test_read_page_metadata(self):
+        result = read_page_metadata(os.path.join(self.root, "sub/d.md"))
+        expected = {"title": "D", "date": None, "tags": [], "draft": False}
+        self.assertEqual(result, expected)
+    
+    def test_queries(self):
+        index = MetadataIndex()
+        index.update(self.root)
+        titles = [entry["title"] for entry in index.pages_by_date()]
+        self.assertEqual(titles, ["B", "A", "D"])
+        titles = [entry["title"] for entry in index.pages_by_date(include_drafts=True)]
+        self.assertEqual(titles, ["B", "C", "A", "D"])
+        titles = [entry["title"] for entry in index.pages_with_tag("y")]
+        self.assertEqual(titles, ["B"])
+        titles = [entry["title"] for entry in index.pages_with_tag("y", True)]
+        self.assertEqual(titles, ["B", "C"])
+        self.assertEqual(index.pages_with_tag("missing"), [])
+        self.assertEqual(index.tags(), ["x", "y"])
+    
+    def test_non_string_dates(self):
+        self.write("e.md", "---\ndate: yes\n---\n# E\n")
+        self.write("f.md", "---\ndate: [a]\n---\n# F\n")
+        index = MetadataIndex()
+        index.update(self.root)
+        titles = [entry["title"] for entry in index.pages_by_date()]
+        self.assertEqual(titles, ["B", "A", "E", "F", "D"])
+        self.assertIsNone(index.get(self.root + "/e.md")["date"])
+
+    def test_persistence(self):
+        cache_path = os.path.join(self.root, "cache/metadata.json")
+        index = MetadataIndex(cache_path)
+        self.assertEqual(len(index.update(self.root)), 4)
+        index.save()
+
+        index = MetadataIndex(cache_path)
+        self.assertEqual(index.update(self.root), [])
+        self.write("a.md", "---\ndate: 2024-01-01\n---\n# A changed\n")
+        os.utime(os.path.join(self.root, "a.md"), ns=(0, 0))
+        refreshed = index.update(self.root)
+        self.assertEqual(refreshed, [self.root + "/a.md"])
+        self.assertEqual(index.get(self.root + "/a.md")["title"], "A changed")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,195 @@
+import os, tarfile, tempfile, unittest, zipfile
+
+from builder import (
+    BuildContext, copy_static_tree, generate_html_tree, route_content,
+    write_deferred_pages
+)
+from output import (
+    ArchiveBackend, DirectoryBackend, MemoryBackend, OutputTarget
+)
+
+class TestBackends(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        self.static = os.path.join(self.root, "static")
+        os.makedirs(os.path.join(self.static, "images"))
+        with open(os.path.join(self.static, "index.css"), "w") as f:
+            f.write("body {}")
+        with open(os.path.join(self.static, "images/a.png"), "wb") as f:
+            f.write(b"\x89PNG")
+        self.content = os.path.join(self.root, "content")
+        os.makedirs(os.path.join(self.content, "blog"))
+        with open(os.path.join(self.content, "index.md"), "w") as f:
+            f.write("# Home\n\n[post](/blog/post)")
+        with open(os.path.join(self.content, "blog/post.md"), "w") as f:
+            f.write("# Post\n\ntext")
+        self.template = os.path.join(self.root, "template.html")
+        with open(self.template, "w") as f:
+            f.write("<title>{{ Title }}</title>{{ Content }}")
+        self.docs = os.path.join(self.root, "docs")
+    
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+    
+    def build(self, backend):
+        context = BuildContext(backend=backend)
+        copy_static_tree(self.static, self.docs, backend)
+        generate_html_tree(self.content, self.template, self.docs, "", context)
+        backend.close()
+    
+    def test_memory_backend(self):
+        backend = MemoryBackend(self.docs)
+        self.build(backend)
+        self.assertEqual(
+            sorted(backend.files),
+            ["blog/post.html", "images/a.png", "index.css", "index.html"]
+        )
+        self.assertEqual(
+            backend.read_text("blog/post.html"),
+            '<title>Post</title><div><h1 id="post">Post</h1><p>text</p></div>'
+        )
+        self.assertEqual(backend.files["images/a.png"], b"\x89PNG")
+        self.assertFalse(os.path.exists(self.docs))
+    
+    def test_prefetch_hints(self):
+        with open(self.template, "w") as f:
+            f.write("<head></head>{{ Content }}")
+        backend = MemoryBackend(self.docs)
+        context = BuildContext(backend=backend, prefetch=1)
+        generate_html_tree(self.content, self.template, self.docs, "", context)
+        self.assertEqual(backend.files, {})
+        write_deferred_pages(context, "")
+        self.assertEqual(
+            backend.read_text("index.html"),
+            '<head><link rel="prefetch" href="/blog/post" />\n</head>'
+            '<div><h1 id="home">Home</h1><p><a href="/blog/post">post</a></p></div>'
+        )
+    
+    def test_targets(self):
+        with open(self.template, "w") as f:
+            f.write('<head><link href="/index.css" /></head>{{ Content }}')
+        pages = OutputTarget("pages", "/site/", MemoryBackend(self.docs))
+        local = OutputTarget("local", "/", MemoryBackend(self.root + "/local"))
+        context = BuildContext(targets=[pages, local], prefetch=1)
+        generate_html_tree(self.content, self.template, self.docs, "/x", context)
+        write_deferred_pages(context, "/x")
+        self.assertEqual(
+            pages.backend.read_text("index.html"),
+            '<head><link href="/site/index.css" />'
+            '<link rel="prefetch" href="/site/blog/post" />\n</head>'
+            '<div><h1 id="home">Home</h1><p><a href="/site/blog/post">post</a></p></div>'
+        )
+        self.assertEqual(
+            local.backend.read_text("index.html"),
+            '<head><link href="/index.css" />'
+            '<link rel="prefetch" href="/blog/post" />\n</head>'
+            '<div><h1 id="home">Home</h1><p><a href="/blog/post">post</a></p></div>'
+        )
+        self.assertEqual(sorted(local.backend.files), ["blog/post.html", "index.html"])
+
+    def test_route_content(self):
+        for name in ["blog/photo.PNG", "blog/raw.html", "data.json", "notes.md.txt"]:
+            with open(os.path.join(self.content, name), "w") as f:
+                f.write('<a href="/blog/post.html">x</a>')
+        routes = route_content(self.content, "docs")
+        rel = lambda items: sorted(dest for src, dest in items)
+        self.assertEqual(rel(routes["page"]), ["docs/blog/post.html", "docs/index.html"])
+        self.assertEqual(rel(routes["html"]), ["docs/blog/raw.html"])
+        self.assertEqual(
+            rel(routes["asset"]),
+            ["docs/blog/photo.PNG", "docs/data.json", "docs/notes.md.txt"]
+        )
+
+        pages = OutputTarget("pages", "/site", MemoryBackend(self.docs))
+        context = BuildContext(targets=[pages])
+        generate_html_tree(self.content, self.template, self.docs, "", context)
+        self.assertEqual(
+            pages.backend.read_text("blog/raw.html"),
+            '<a href="/site/blog/post.html">x</a>'
+        )
+        self.assertEqual(
+            pages.backend.read_text("data.json"), '<a href="/blog/post.html">x</a>'
+        )
+        self.assertIn("/blog/photo.PNG", context.link_graph.assets)
+
+    def test_copy_skips_up_to_date_files(self):
+        backend = DirectoryBackend(self.docs)
+        src_path = os.path.join(self.static, "index.css")
+        dest_path = os.path.join(self.docs, "index.css")
+        backend.copy_file(src_path, dest_path)
+        src_stat = os.stat(src_path)
+        self.assertEqual(os.stat(dest_path).st_mtime_ns, src_stat.st_mtime_ns)
+
+        # Same size and mtime: taken to be a copy already
+        with open(dest_path, "w") as f:
+            f.write("body []")
+        os.utime(dest_path, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+        backend.copy_file(src_path, dest_path)
+        with open(dest_path) as f:
+            self.assertEqual(f.read(), "body []")
+
+        os.utime(dest_path, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns + 10**9))
+        backend.copy_file(src_path, dest_path)
+        with open(dest_path) as f:
+            self.assertEqual(f.read(), "body {}")
+
+    def test_directory_backend(self):
+        backend = DirectoryBackend(self.docs)
+        self.build(backend)
+        with open(os.path.join(self.docs, "blog/post.html")) as f:
+            self.assertIn('<h1 id="post">Post</h1>', f.read())
+        with open(os.path.join(self.docs, "images/a.png"), "rb") as f:
+            self.assertEqual(f.read(), b"\x89PNG")
+        self.assertIn(os.path.join(self.docs, "blog"), backend.created_dirs)
+    
+    def test_tar_backend(self):
+        archive_path = os.path.join(self.root, "site.tar.gz")
+        self.build(ArchiveBackend(self.docs, archive_path))
+        with tarfile.open(archive_path) as archive:
+            names = sorted(archive.getnames())
+            html = archive.extractfile("index.html").read().decode()
+        self.assertEqual(
+            names, ["blog/post.html", "images/a.png", "index.css", "index.html"]
+        )
+        self.assertIn('<a href="/blog/post">post</a>', html)
+        self.assertFalse(os.path.exists(self.docs))
+    
+    def test_zip_backend(self):
+        archive_path = os.path.join(self.root, "site.zip")
+        self.build(ArchiveBackend(self.docs, archive_path))
+        with zipfile.ZipFile(archive_path) as archive:
+            self.assertEqual(archive.read("index.css"), b"body {}")
+            self.assertEqual(len(archive.namelist()), 4)
+    
+    def test_open_binary(self):
+        for name in ["site.tar", "site.zip"]:
+            archive_path = os.path.join(self.root, name)
+            backend = ArchiveBackend(self.docs, archive_path)
+            with backend.open_binary(self.docs + "/sitemap.xml") as stream:
+                stream.write(b"<a>")
+                stream.write(b"</a>")
+            backend.close()
+            if name.endswith(".zip"):
+                with zipfile.ZipFile(archive_path) as archive:
+                    self.assertEqual(archive.read("sitemap.xml"), b"<a></a>")
+            else:
+                with tarfile.open(archive_path) as archive:
+                    data = archive.extractfile("sitemap.xml").read()
+                    self.assertEqual(data, b"<a></a>")
+        backend = DirectoryBackend(self.docs)
+        with backend.open_binary(self.docs + "/a/b.xml") as stream:
+            stream.write(b"<b/>")
+        with open(os.path.join(self.docs, "a/b.xml"), "rb") as f:
+            self.assertEqual(f.read(), b"<b/>")
+        backend = MemoryBackend(self.docs)
+        with backend.open_binary(self.docs + "/c.xml") as stream:
+            stream.write(b"<c/>")
+        self.assertEqual(backend.read_text("c.xml"), "<c/>")
+    
+    def test_unknown_archive(self):
+        with self.assertRaises(ValueError):
+            ArchiveBackend(self.docs, os.path.join(self.root, "site.rar"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import os, sys, tempfile, threading, time, unittest
+
+from blocknode import markdown_to_html_node
+from inlinenode import split_nodes_delimiter, split_nodes_image, text_to_textnodes
+from render import PageTimeout, render_page
+from textnode import TextNode, TextType
+
+# Worst-case inputs, each a function of a size n. Every one must render
+# (or raise SyntaxError) in time linear in n.
+CORPUS = {
+    "underscores": lambda n: "_" * (2 * n),
+    "unpaired_underscores": lambda n: "a " + "_" * (2 * n + 1),
+    "bold_runs": lambda n: "**x** " * n,
+    "code_runs": lambda n: "`a` " * n,
+    "open_brackets": lambda n: "[" * n + "](" + "x" * n,
+    "image_openers": lambda n: "![" * n,
+    "nested_brackets": lambda n: "[" * n + "a" + "]" * n + "(" * n + "u" + ")" * n,
+    "open_parens": lambda n: "[a](" + "(" * n,
+    "links": lambda n: "[a](/b) " * n,
+    "repeated_image": lambda n: "![a](/x.png) text " * n,
+    "long_line": lambda n: "word " * (10 * n),
+    "paragraph_lines": lambda n: "line\n" * n,
+    "quote_lines": lambda n: "> quote\n" * n,
+    "list_items": lambda n: "- item\n" * n,
+    "ordered_items": lambda n: "".join(f"{i + 1}. item\n" for i in range(n)),
+    "headings": lambda n: "# h\n\n" * n,
+    "code_fence": lambda n: "```\n" + "x = 1\n" * n + "```",
+    "code_fence_blank_lines": lambda n: "```\n" + "x = 1\n\n" * n + "```",
+    "unclosed_fences": lambda n: "```a\n\n" * n,
+    "blank_lines": lambda n: "\n" * n,
+}
+
+def render(markdown):
+    try:
+        markdown_to_html_node(markdown).to_html()
+    except SyntaxError:
+        pass
+
+def count_calls(markdown):
+    """
+    :returns: The number of Python and builtin function calls made
+    rendering markdown; unlike a timing, it does not depend on the
+    machine or its load
+    :rtype: int
+    """
+
+    calls = [0]
+
+    def profile(frame, event, arg):
+        if event in ("call", "c_call"):
+            calls[0] += 1
+
+    sys.setprofile(profile)
+    try:
+        render(markdown)
+    finally:
+        sys.setprofile(None)
+    return calls[0]
+
+class TestPathologicalInputs(unittest.TestCase):
+    def test_corpus_renders(self):
+        for name, make_input in CORPUS.items():
+            with self.subTest(name):
+                start = time.perf_counter()
+                render(make_input(5000))
+                self.assertLess(time.perf_counter() - start, 2)
+
+    def test_near_linear_scaling(self):
+        # 8x the input may make at most 1.5x the linear number of calls;
+        # quadratic behaviour would make 64x. Time spent inside one
+        # regex search is not counted; test_corpus_renders bounds that
+        for name, make_input in CORPUS.items():
+            with self.subTest(name):
+                small = count_calls(make_input(500))
+                large = count_calls(make_input(4000))
+                self.assertLessEqual(large, small * 12)
+
+    def test_many_pairs_do_not_recurse(self):
+        node = TextNode("_a_ " * 5000, TextType.NORMAL_TEXT)
+        nodes = split_nodes_delimiter([node], "_", TextType.ITALIC_TEXT)
+        self.assertEqual(len(nodes), 10000)
+
+    def test_pairs_ending_in_delimiter(self):
+        nodes = text_to_textnodes("a _b_ c _d_")
+        self.assertEqual(nodes, [
+            TextNode("a ", TextType.NORMAL_TEXT),
+            TextNode("b", TextType.ITALIC_TEXT),
+            TextNode(" c ", TextType.NORMAL_TEXT),
+            TextNode("d", TextType.ITALIC_TEXT),
+        ])
+
+    def test_unpaired_delimiter_offset(self):
+        with self.assertRaises(SyntaxError) as context:
+            text_to_textnodes("`a` b ` c")
+        self.assertEqual(context.exception.offset, 7)
+        self.assertEqual(context.exception.text, "`a` b ` c")
+
+    def test_repeated_image_keeps_text(self):
+        node = TextNode("![a](/x.png) one ![a](/x.png) two", TextType.NORMAL_TEXT)
+        self.assertEqual(split_nodes_image([node]), [
+            TextNode("a", TextType.IMAGE, "/x.png"),
+            TextNode(" one ", TextType.NORMAL_TEXT),
+            TextNode("a", TextType.IMAGE, "/x.png"),
+            TextNode(" two", TextType.NORMAL_TEXT),
+        ])
+
+    def test_empty_document(self):
+        self.assertEqual(markdown_to_html_node("\n\n").to_html(), "<div></div>")
+
+class TestPageTimeout(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.src_path = os.path.join(self.tmp_dir.name, "slow.md")
+        with open(self.src_path, "w") as f:
+            f.write("# Slow\n\n" + "- **item** _x_\n" * 100000)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_timeout_raises(self):
+        with self.assertRaises(PageTimeout):
+            render_page(
+                self.src_path, "{{ Content }}", "", self.tmp_dir.name,
+                timeout=0.01
+            )
+
+    def test_timeout_reported(self):
+        result = render_page(
+            self.src_path, "{{ Content }}", "", self.tmp_dir.name,
+            keep_going=True, timeout=0.01
+        )
+        self.assertIsNone(result.html)
+        self.assertIn("PageTimeout", result.diagnostics[0].message)
+
+    def test_unenforced_timeout_warns(self):
+        src_path = os.path.join(self.tmp_dir.name, "fast.md")
+        with open(src_path, "w") as f:
+            f.write("# Fast")
+        caught = []
+
+        def render_in_thread():
+            with self.assertWarns(RuntimeWarning) as context:
+                render_page(
+                    src_path, "{{ Content }}", "", self.tmp_dir.name,
+                    timeout=60
+                )
+            caught.append(str(context.warning))
+
+        thread = threading.Thread(target=render_in_thread)
+        thread.start()
+        thread.join()
+        self.assertEqual(len(caught), 1)
+        self.assertIn("outside the main thread", caught[0])
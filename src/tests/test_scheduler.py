@@ -0,0 +1,87 @@
+import threading, time, unittest
+
+from scheduler import Scheduler
+
+class TestScheduler(unittest.TestCase):
+    def test_runs_in_dependency_order(self):
+        scheduler = Scheduler()
+        order = []
+        first = scheduler.add("first", order.append, "first", pool="cpu")
+        second = scheduler.add("second", order.append, "second", deps=[first])
+        scheduler.add("third", order.append, "third", deps=[first, second], pool="cpu")
+        scheduler.run()
+        self.assertEqual(order, ["first", "second", "third"])
+
+    def test_io_overlaps_cpu(self):
+        scheduler = Scheduler()
+        copying = threading.Event()
+        seen = []
+
+        def copy():
+            copying.set()
+            time.sleep(0.05)
+
+        def render():
+            seen.append(copying.wait(1))
+
+        scheduler.add("copy", copy)
+        scheduler.add("render", render, pool="cpu")
+        scheduler.run()
+        self.assertEqual(seen, [True])
+
+    def test_cpu_tasks_run_in_calling_thread(self):
+        scheduler = Scheduler()
+        task = scheduler.add("render", threading.current_thread, pool="cpu")
+        scheduler.run()
+        self.assertIs(task.result, threading.current_thread())
+
+    def test_io_workers_bound(self):
+        scheduler = Scheduler(io_workers=2)
+        lock = threading.Lock()
+        running = [0]
+        most = [0]
+
+        def copy():
+            with lock:
+                running[0] += 1
+                most[0] = max(most[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+
+        for i in range(8):
+            scheduler.add(f"copy {i}", copy)
+        scheduler.run()
+        self.assertEqual(most[0], 2)
+
+    def test_failure_stops_dependents(self):
+        scheduler = Scheduler()
+        ran = []
+        failing = scheduler.add("fail", lambda: 1 / 0)
+        scheduler.add("after", ran.append, "after", deps=[failing], pool="cpu")
+        with self.assertRaises(ZeroDivisionError):
+            scheduler.run()
+        self.assertEqual(ran, [])
+
+    def test_unknown_dependency(self):
+        task = Scheduler().add("elsewhere", print)
+        with self.assertRaises(ValueError):
+            Scheduler().add("task", print, deps=[task])
+        with self.assertRaises(ValueError):
+            Scheduler().add("task", print, pool="gpu")
+
+    def test_critical_path(self):
+        scheduler = Scheduler()
+        discover = scheduler.add("discover", time.sleep, 0.01, pool="cpu")
+        slow = scheduler.add("slow copy", time.sleep, 0.1)
+        fast = scheduler.add("render", time.sleep, 0.01, deps=[discover], pool="cpu")
+        scheduler.add("write index", time.sleep, 0, deps=[slow, fast], pool="cpu")
+        scheduler.run()
+        self.assertEqual(
+            [task.name for task in scheduler.critical_path()],
+            ["slow copy", "write index"]
+        )
+        report = scheduler.report()
+        self.assertEqual(report["tasks"], 4)
+        self.assertEqual(report["critical_path"][0]["pool"], "io")
+        self.assertGreaterEqual(report["seconds"], 0.1)
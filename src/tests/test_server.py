@@ -0,0 +1,173 @@
+import http.client, os, tempfile, threading, unittest
+
+from render import new_registry
+from server import SiteRenderer, create_server
+
+class TestSiteRenderer(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        self.static = os.path.join(self.root, "static")
+        os.makedirs(self.static)
+        with open(os.path.join(self.static, "index.css"), "w") as f:
+            f.write("body {}")
+        self.content = os.path.join(self.root, "content")
+        os.makedirs(os.path.join(self.content, "blog/tom"))
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.content, "blog/tom/index.md"), "# Tom")
+        self.write(os.path.join(self.content, "about.md"), "# About")
+        self.template = os.path.join(self.root, "template.html")
+        self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+        self.site = SiteRenderer(self.static, self.content, self.template)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+        # Step the mtime explicitly; writes within one clock tick can
+        # otherwise leave it unchanged
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def test_resolve(self):
+        self.assertEqual(
+            self.site.resolve("/"),
+            ("page", os.path.join(self.content, "index.md"))
+        )
+        self.assertEqual(
+            self.site.resolve("/blog/tom/"),
+            ("page", os.path.join(self.content, "blog/tom/index.md"))
+        )
+        self.assertEqual(
+            self.site.resolve("/about.html"),
+            ("page", os.path.join(self.content, "about.md"))
+        )
+        self.assertEqual(
+            self.site.resolve("/index.css"),
+            ("static", os.path.join(self.static, "index.css"))
+        )
+        self.write(os.path.join(self.content, "blog/tom/photo.png"), "png")
+        self.assertEqual(
+            self.site.resolve("/blog/tom/photo.png"),
+            ("static", os.path.join(self.content, "blog/tom/photo.png"))
+        )
+        self.assertEqual(self.site.resolve("/about.md"), (None, None))
+        self.assertEqual(self.site.resolve("/missing"), (None, None))
+        self.assertEqual(self.site.resolve("/../template.html"), (None, None))
+
+    def test_resolve_stays_in_site(self):
+        for path in (
+            "../template.html", "..%2ftemplate.html",
+            "%2e%2e/template.html", "/..%2f..%2f..%2f..%2fetc%2fpasswd",
+            "..%2f..%2f..%2f..%2f..%2f..%2fetc%2fpasswd",
+        ):
+            self.assertEqual(self.site.resolve(path), (None, None), path)
+        self.assertEqual(
+            self.site.resolve("blog/../about.html"),
+            ("page", os.path.join(self.content, "about.md"))
+        )
+        os.symlink(self.template, os.path.join(self.static, "link.html"))
+        self.assertEqual(self.site.resolve("/link.html"), (None, None))
+
+    def test_cached_until_source_changes(self):
+        first = self.site.get("/about.html")
+        self.assertIn('<h1 id="about">About</h1>', first.body.decode())
+        self.assertIs(self.site.get("/about.html"), first)
+        self.assertEqual(self.site.renders, 1)
+        self.write(os.path.join(self.content, "about.md"), "# Changed")
+        second = self.site.get("/about.html")
+        self.assertIn('<h1 id="changed">Changed</h1>', second.body.decode())
+        self.assertNotEqual(first.etag, second.etag)
+        self.assertEqual(self.site.renders, 2)
+
+    def test_snippet_change_invalidates_dependents(self):
+        includes_dir = os.path.join(self.root, "includes")
+        os.makedirs(includes_dir)
+        self.write(os.path.join(includes_dir, "note.md"), "A note")
+        self.site.registry = new_registry([], include_root=includes_dir)
+        self.write(
+            os.path.join(self.content, "about.md"),
+            "# About\n\n{{ include note.md }}"
+        )
+        self.assertIn("<p>A note</p>", self.site.get("/about.html").body.decode())
+        home = self.site.get("/")
+        self.write(os.path.join(includes_dir, "note.md"), "A new note")
+        self.assertIn(
+            "<p>A new note</p>", self.site.get("/about.html").body.decode()
+        )
+        # Pages without the snippet stay cached
+        self.assertIs(self.site.get("/"), home)
+        self.assertEqual(self.site.renders, 3)
+
+    def test_template_change_invalidates(self):
+        first = self.site.get("/")
+        self.write(self.template, "<main>{{ Content }}</main>")
+        second = self.site.get("/")
+        self.assertIn("<main>", second.body.decode())
+        self.assertNotEqual(first.etag, second.etag)
+
+    def test_syntax_error_renders_fallback(self):
+        self.write(os.path.join(self.content, "about.md"), "# About\n\n**bold")
+        response = self.site.get("/about.html")
+        self.assertIn('class="parse-error"', response.body.decode())
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        root = self.tmp_dir.name
+        os.makedirs(os.path.join(root, "static"))
+        os.makedirs(os.path.join(root, "content"))
+        with open(os.path.join(root, "content/index.md"), "w") as f:
+            f.write("# Home")
+        with open(os.path.join(root, "template.html"), "w") as f:
+            f.write("{{ Content }}")
+        site = SiteRenderer(
+            os.path.join(root, "static"), os.path.join(root, "content"),
+            os.path.join(root, "template.html")
+        )
+        self.server = create_server(site, port=0)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.tmp_dir.cleanup()
+
+    def request(self, path, headers=None, method="GET"):
+        connection = http.client.HTTPConnection(
+            "127.0.0.1", self.server.server_address[1]
+        )
+        connection.request(method, path, headers=headers or {})
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+        return response, body
+
+    def test_conditional_get(self):
+        response, body = self.request("/")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b'<div><h1 id="home">Home</h1></div>')
+        etag = response.getheader("ETag")
+        self.assertTrue(etag.startswith('"'))
+        response, body = self.request("/", {"If-None-Match": etag})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b"")
+        response, body = self.request("/", {"If-None-Match": '"stale"'})
+        self.assertEqual(response.status, 200)
+
+    def test_head_and_missing(self):
+        response, body = self.request("/", method="HEAD")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"")
+        response, _ = self.request("/missing.html")
+        self.assertEqual(response.status, 404)
+
+    def test_traversal(self):
+        for path in ("..%2ftemplate.html", "%2e%2e/%2e%2e/etc/passwd"):
+            response, body = self.request(path)
+            self.assertEqual(response.status, 404, path)
+            self.assertNotIn(b"{{ Content }}", body)
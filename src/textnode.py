@@ -1,5 +1,6 @@
 from enum import Enum
 from htmlnode import LeafNode
+from images import srcset
 
 class TextType(Enum):
     """
@@ -40,16 +41,23 @@ class TextNode:
         )
     
     def __repr__(self):
-        repr_string = f"TextNode({self.text}, {self.text_type.value}, {self.url})"
+        # Text types added by extensions need not be TextType members
+        text_type = getattr(self.text_type, "value", self.text_type)
+        repr_string = f"TextNode({self.text}, {text_type}, {self.url})"
         return repr_string
 
-def text_node_to_html_node(text_node):
+def text_node_to_html_node(text_node, registry=None):
     """
     Converts a TextNode to a LeafNode.
 
     :param text_node: TextNode to be converted
     :type text_node: TextNode, required
 
+    :param registry: Registry to look up tags for text types added by
+    extensions, and the image variants for srcset; without it only the
+    built-in text types are known and images get no srcset
+    :type registry: ExtensionRegistry, optional
+
     :returns: A LeafNode
     :rtype: LeafNode
 
@@ -70,12 +78,22 @@ def text_node_to_html_node(text_node):
                 "a", text_node.text, props={"href": text_node.url}
             )
         case TextType.IMAGE:
-            leaf_node = LeafNode(
-                "img", "", props={
-                    "src": text_node.url,
-                    "alt": text_node.text,
-                }
+            props = {
+                "src": text_node.url,
+                "alt": text_node.text,
+            }
+            image_srcset = srcset(
+                text_node.url,
+                registry.image_variants if registry is not None else None
             )
+            if image_srcset:
+                props["srcset"] = image_srcset
+            leaf_node = LeafNode("img", "", props=props)
         case _:
-            raise Exception("not a TextNode")
-    return leaf_node
\ No newline at end of file
+            tag = None
+            if registry is not None:
+                tag = registry.text_type_tag(text_node.text_type)
+            if tag is None:
+                raise Exception("not a TextNode")
+            leaf_node = LeafNode(tag, text_node.text)
+    return leaf_node
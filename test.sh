@@ -1 +1 @@
-python3 -m unittest discover -s src/tests
+PYTHONPATH=src python3 -m unittest discover -s src/tests